@@ -0,0 +1,108 @@
+"""Measure memory per 100k components and the cost of PURL-keyed lookups.
+
+Builds components the way Dependency-Track listings and cache reads do,
+once with plain PackageURLs and freshly read source strings, and once
+with CanonicalPackageURL and interned sources.
+
+    python -m benchmarks.component_memory [--components 100000]
+"""
+
+import os
+
+os.environ.setdefault("DEPENDENCY_TRACK_API_URL", "http://dependency-track.invalid")
+os.environ.setdefault("DEPENDENCY_TRACK_API_KEY", "benchmark")
+os.environ.setdefault("DB_PATH", ":memory:")
+
+import argparse
+import gc
+import time
+import tracemalloc
+from packageurl import PackageURL
+from license_enrichment_processor.lib.sbom import (
+    CanonicalPackageURL,
+    Component,
+    ComponentLicenseDetails,
+    intern_source,
+)
+
+
+def fresh_string(value: str) -> str:
+    # A new object with the same value, as every row read from SQLite is
+    return "".join(list(value))
+
+
+def build_components(
+    purl_strings: list[str], purl_type: type[PackageURL], read_source
+) -> list[Component]:
+    return [
+        Component(
+            uuid=f"{i:08x}-0000-4000-8000-000000000000",
+            purl=purl_type.from_string(purl_string),
+            license_details=ComponentLicenseDetails(
+                license_expressions=[
+                    ("Apache-2.0", read_source("ClearlyDefined Declared"))
+                ],
+                attributions=[
+                    (f"Copyright {i} Example", read_source("ClearlyDefined Discovered"))
+                ],
+                source_urls=[
+                    (
+                        f"https://github.com/example/artifact-{i}",
+                        read_source("ClearlyDefined Discovered"),
+                    )
+                ],
+            ),
+        )
+        for i, purl_string in enumerate(purl_strings)
+    ]
+
+
+def measure(purl_strings: list[str], purl_type: type[PackageURL], read_source):
+    gc.collect()
+    tracemalloc.start()
+    components = build_components(purl_strings, purl_type, read_source)
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    by_purl = {component.purl: component for component in components}
+    started = time.perf_counter()
+    for component in components:
+        by_purl[component.purl]
+    lookup_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for component in components:
+        component.purl.to_string()
+    to_string_seconds = time.perf_counter() - started
+    return allocated, lookup_seconds, to_string_seconds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--components", type=int, default=100_000)
+    args = parser.parse_args()
+    count = args.components
+    purl_strings = [
+        f"pkg:maven/org.example.group{i % 200}/artifact-{i}@1.{i % 50}.{i}"
+        for i in range(count)
+    ]
+
+    print(f"{count} components")
+    print(
+        f"{'model':>10} {'MB':>8} {'bytes each':>11} {'lookup (us)':>12} {'to_string (us)':>15}"
+    )
+    for name, purl_type, read_source in [
+        ("plain", PackageURL, fresh_string),
+        ("lean", CanonicalPackageURL, intern_source),
+    ]:
+        allocated, lookup_seconds, to_string_seconds = measure(
+            purl_strings, purl_type, read_source
+        )
+        print(
+            f"{name:>10} {allocated / 1e6:>8.1f} {allocated / count:>11.0f}"
+            f" {lookup_seconds / count * 1e6:>12.2f} {to_string_seconds / count * 1e6:>15.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
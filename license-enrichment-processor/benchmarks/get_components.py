@@ -0,0 +1,139 @@
+"""Time SqliteDatabase.get_components against BOM size.
+
+Compares the chunked IN-query read path with one lookup per PURL, the way
+components were read before, on a scratch database where half the looked-up
+PURLs are cached.
+
+    python -m benchmarks.get_components [--sizes 100,1000,3000,10000]
+"""
+
+import os
+
+os.environ.setdefault("DEPENDENCY_TRACK_API_URL", "http://dependency-track.invalid")
+os.environ.setdefault("DEPENDENCY_TRACK_API_KEY", "benchmark")
+os.environ.setdefault("DB_PATH", ":memory:")
+
+import argparse
+import tempfile
+import time
+from alembic import command
+from alembic.config import Config
+from packageurl import PackageURL
+from license_enrichment_processor.lib.date import DatetimeProvider
+from license_enrichment_processor.lib.sbom import (
+    CanonicalPackageURL,
+    Component,
+    ComponentLicenseDetails,
+)
+from license_enrichment_processor.lib.sqlite import (
+    SqliteConnectionPool,
+    SqliteDatabase,
+)
+
+ALEMBIC_SCRIPT_LOCATION = os.path.join(
+    os.path.dirname(__file__), "..", "license_enrichment_processor", "alembic"
+)
+
+
+def migrate(path: str) -> None:
+    alembic_config = Config()
+    alembic_config.set_main_option("script_location", ALEMBIC_SCRIPT_LOCATION)
+    alembic_config.set_main_option("sqlalchemy.url", f"sqlite:///{path}")
+    command.upgrade(alembic_config, "head")
+
+
+# Canonical like the PURLs parsed from Dependency-Track, so serialising them
+# does not dominate the timings
+def purl(i: int) -> PackageURL:
+    return CanonicalPackageURL.from_string(
+        f"pkg:maven/org.example/artifact-{i}@1.{i}.0"
+    )
+
+
+def get_components_per_purl(
+    database: SqliteDatabase, purls: list[PackageURL]
+) -> dict[PackageURL, ComponentLicenseDetails]:
+    results = dict()
+    with database.connection_pool.reader() as connection:
+        for it in purls:
+            purl_string = it.to_string()
+            if (
+                connection.execute(
+                    "SELECT purl FROM component WHERE purl = ?", (purl_string,)
+                ).fetchone()
+                is None
+            ):
+                continue
+            results[it] = ComponentLicenseDetails(
+                license_expressions=connection.execute(
+                    "SELECT expression, source FROM component_license_expression WHERE componentPurl = ?",
+                    (purl_string,),
+                ).fetchall(),
+                attributions=connection.execute(
+                    "SELECT attribution, source FROM component_attribution WHERE componentPurl = ?",
+                    (purl_string,),
+                ).fetchall(),
+                source_urls=connection.execute(
+                    "SELECT sourceCodeUrl, source FROM component_source_code_url WHERE componentPurl = ?",
+                    (purl_string,),
+                ).fetchall(),
+            )
+    return results
+
+
+def best_of(repeats: int, run) -> float:
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="100,1000,3000,10000")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    sizes = [int(it) for it in args.sizes.split(",")]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "app.db")
+        migrate(path)
+        connection_pool = SqliteConnectionPool(path=path)
+        database = SqliteDatabase(connection_pool, DatetimeProvider.FromOffsetHours(7))
+        database.cache_components(
+            [
+                Component(
+                    uuid=str(i),
+                    purl=purl(i),
+                    license_details=ComponentLicenseDetails(
+                        license_expressions=[("Apache-2.0", "clearlydefined")],
+                        attributions=[(f"Copyright {i} Example", "clearlydefined")],
+                        source_urls=[(f"https://example.com/{i}", "clearlydefined")],
+                    ),
+                )
+                for i in range(0, 2 * max(sizes), 2)
+            ]
+        )
+
+        print(
+            f"{'components':>10} {'per PURL (ms)':>14} {'chunked (ms)':>13} {'speedup':>8}"
+        )
+        for size in sizes:
+            purls = [purl(i) for i in range(size)]
+            assert database.get_components(purls) == get_components_per_purl(
+                database, purls
+            )
+            per_purl = best_of(
+                args.repeats, lambda: get_components_per_purl(database, purls)
+            )
+            chunked = best_of(args.repeats, lambda: database.get_components(purls))
+            print(
+                f"{size:>10} {per_purl * 1000:>14.1f} {chunked * 1000:>13.1f} {per_purl / chunked:>7.1f}x"
+            )
+        connection_pool.close()
+
+
+if __name__ == "__main__":
+    main()
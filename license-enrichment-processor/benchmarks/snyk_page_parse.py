@@ -0,0 +1,86 @@
+"""Time reading the license off a Snyk package page.
+
+Compares the streaming parse, which stops at the license span, with parsing
+the whole page, and reports how many bytes each one reads. Defaults to the
+test fixture; pass a page saved from security.snyk.io to measure a real one.
+
+    python -m benchmarks.snyk_page_parse [--page page.html]
+"""
+
+import os
+
+os.environ.setdefault("DEPENDENCY_TRACK_API_URL", "http://dependency-track.invalid")
+os.environ.setdefault("DEPENDENCY_TRACK_API_KEY", "benchmark")
+os.environ.setdefault("DB_PATH", ":memory:")
+
+import argparse
+import asyncio
+import logging
+import time
+from lxml import html
+from license_enrichment_processor.lib.license_data_source import (
+    LicenseDataSourceSnyk,
+)
+
+FIXTURE = os.path.join(
+    os.path.dirname(__file__), "..", "tests", "fixtures", "snyk_package_page.html"
+)
+
+
+def best_of(repeats: int, run) -> float:
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+async def best_of_async(repeats: int, run) -> float:
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        await run()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--page", default=FIXTURE)
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+    with open(args.page, "rb") as f:
+        page = f.read()
+    source = LicenseDataSourceSnyk(http_client=None, logger=logging.getLogger(__name__))
+    chunk_size = LicenseDataSourceSnyk._READ_CHUNK_SIZE
+
+    async def chunks():
+        for i in range(0, len(page), chunk_size):
+            yield page[i : i + chunk_size]
+
+    def read_streaming():
+        return source._read_license_expression(chunks())
+
+    def read_whole_page():
+        span = html.fromstring(page).xpath(
+            f'//span[@data-snyk-test="{LicenseDataSourceSnyk._LICENSE_SPAN_MARKER}"]'
+        )[0]
+        return span.text_content(), len(page)
+
+    print(f"page: {len(page)} bytes")
+    print(f"{'parse':>10} {'license':>10} {'bytes read':>11} {'time (ms)':>10}")
+    license_expression, bytes_read = asyncio.run(read_streaming())
+    seconds = asyncio.run(best_of_async(args.repeats, read_streaming))
+    print(
+        f"{'streaming':>10} {license_expression:>10} {bytes_read:>11} {seconds * 1000:>10.2f}"
+    )
+    license_expression, bytes_read = read_whole_page()
+    seconds = best_of(args.repeats, read_whole_page)
+    print(
+        f"{'whole page':>10} {license_expression:>10} {bytes_read:>11} {seconds * 1000:>10.2f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,58 @@
+import atexit
+import threading
+import click
 from flask import Flask
 from flask_cors import CORS
 from .controller import create_blueprint
+from .config import (
+    EnrichmentService,
+    create_components_cache,
+    create_connection_pool,
+    create_datetime_provider,
+    create_definition_store,
+    create_enrichment_service,
+)
+from .lib.rederivation import rederive_clearly_defined_license_details
 
 API_PREFIX = "/api"
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}})
 
+_enrichment_service: EnrichmentService | None = None
+_enrichment_service_lock = threading.Lock()
 
-controller = create_blueprint()
+
+# Built on first request rather than at import, so CLI commands and anything
+# else importing the package don't start the job workers or cache refresher
+def get_enrichment_service() -> EnrichmentService:
+    global _enrichment_service
+    with _enrichment_service_lock:
+        if _enrichment_service is None:
+            _enrichment_service = create_enrichment_service(app.logger)
+            atexit.register(_enrichment_service.close)
+        return _enrichment_service
+
+
+controller = create_blueprint(get_enrichment_service)
 app.register_blueprint(controller)
+
+
+@app.cli.command("rederive-clearly-defined")
+@click.option("--batch-size", default=1000, show_default=True)
+def rederive_clearly_defined(batch_size: int) -> None:
+    """Rebuild cached ClearlyDefined license details from stored definitions."""
+    connection_pool = create_connection_pool()
+    datetime_provider = create_datetime_provider()
+    try:
+        rederived = rederive_clearly_defined_license_details(
+            definition_store=create_definition_store(
+                connection_pool, datetime_provider
+            ),
+            components_cache=create_components_cache(
+                connection_pool, datetime_provider
+            ),
+            batch_size=batch_size,
+        )
+    finally:
+        connection_pool.close()
+    click.echo(f"Re-derived license details of {rederived} components")
@@ -0,0 +1,45 @@
+"""compress clearly defined definitions
+
+Revision ID: 5763cd8e0ce5
+Revises: bba97d497360
+Create Date: 2026-10-18 09:30:12.418206+07:00
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5763cd8e0ce5"
+down_revision: Union[str, None] = "bba97d497360"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Nothing was ever written to the plain JSON table
+    op.drop_table("component_clearly_defined_full")
+    op.create_table(
+        "component_clearly_defined_full",
+        sa.Column("componentPurl", sa.Text, nullable=False, primary_key=True),
+        sa.Column("definition", sa.LargeBinary, nullable=False),
+        sa.Column("fetchedAt", sa.DateTime, nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("component_clearly_defined_full")
+    op.create_table(
+        "component_clearly_defined_full",
+        sa.Column(
+            "componentPurl",
+            sa.Text,
+            sa.ForeignKey("component.purl"),
+            nullable=False,
+            primary_key=True,
+        ),
+        sa.Column("jsonContent", sa.Text, nullable=False),
+    )
@@ -0,0 +1,29 @@
+"""index component updatedAt
+
+Revision ID: 8f2c41d7a9e3
+Revises: 5763cd8e0ce5
+Create Date: 2026-10-18 10:15:37.902114+07:00
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8f2c41d7a9e3"
+down_revision: Union[str, None] = "5763cd8e0ce5"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_component_updatedAt", "component", ["updatedAt", "purl"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_component_updatedAt", table_name="component")
@@ -0,0 +1,42 @@
+"""separate not found from retry
+
+Revision ID: 657e0fff20c1
+Revises: 8f2c41d7a9e3
+Create Date: 2026-10-18 11:05:44.271930+07:00
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "657e0fff20c1"
+down_revision: Union[str, None] = "8f2c41d7a9e3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "component_not_found",
+        sa.Column("componentPurl", sa.Text, nullable=False, primary_key=True),
+        sa.Column("source", sa.Text, nullable=False, primary_key=True),
+        sa.Column("checkedAt", sa.DateTime, nullable=False),
+    )
+    op.add_column(
+        "fetch_retry",
+        sa.Column("attemptCount", sa.Integer, nullable=False, server_default="1"),
+    )
+    op.add_column("fetch_retry", sa.Column("retryAfter", sa.DateTime, nullable=True))
+    # Earlier rows mixed misses with errors; let them be retried right away
+    op.execute("UPDATE fetch_retry SET retryAfter = lastAttemptAt")
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("fetch_retry") as batch_op:
+        batch_op.drop_column("retryAfter")
+        batch_op.drop_column("attemptCount")
+    op.drop_table("component_not_found")
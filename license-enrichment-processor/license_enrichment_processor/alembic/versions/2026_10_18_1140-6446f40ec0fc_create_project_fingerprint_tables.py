@@ -0,0 +1,48 @@
+"""create project fingerprint tables
+
+Revision ID: 6446f40ec0fc
+Revises: 657e0fff20c1
+Create Date: 2026-10-18 11:40:08.513377+07:00
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "6446f40ec0fc"
+down_revision: Union[str, None] = "657e0fff20c1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "project_fingerprint",
+        sa.Column("projectUuid", sa.Text, nullable=False, primary_key=True),
+        sa.Column("digest", sa.Text, nullable=False),
+        sa.Column("componentCount", sa.Integer, nullable=False),
+        sa.Column("updatedAt", sa.DateTime, nullable=False),
+    )
+
+    op.create_table(
+        "project_component",
+        sa.Column(
+            "projectUuid",
+            sa.Text,
+            sa.ForeignKey("project_fingerprint.projectUuid"),
+            nullable=False,
+            primary_key=True,
+        ),
+        sa.Column("componentUuid", sa.Text, nullable=False, primary_key=True),
+        sa.Column("componentPurl", sa.Text, nullable=False),
+        sa.Column("licenseExpression", sa.Text, nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("project_component")
+    op.drop_table("project_fingerprint")
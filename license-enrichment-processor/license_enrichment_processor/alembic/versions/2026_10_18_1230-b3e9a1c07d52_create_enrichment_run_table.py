@@ -0,0 +1,51 @@
+"""create enrichment run table
+
+Revision ID: b3e9a1c07d52
+Revises: 6446f40ec0fc
+Create Date: 2026-10-18 12:30:41.207163+07:00
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b3e9a1c07d52"
+down_revision: Union[str, None] = "6446f40ec0fc"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "enrichment_run",
+        sa.Column("id", sa.Text, nullable=False, primary_key=True),
+        sa.Column("projectUuid", sa.Text, nullable=False),
+        sa.Column("projectName", sa.Text, nullable=False),
+        sa.Column("projectVersion", sa.Text, nullable=False),
+        sa.Column("startedAt", sa.DateTime, nullable=False),
+        sa.Column("finishedAt", sa.DateTime, nullable=False),
+        sa.Column("status", sa.Text, nullable=False),
+        sa.Column("stats", sa.Text, nullable=False),
+        sa.Column("error", sa.Text, nullable=True),
+    )
+    op.create_index(
+        "ix_enrichment_run_startedAt", "enrichment_run", ["startedAt"], unique=False
+    )
+    op.create_index(
+        "ix_enrichment_run_projectUuid_startedAt",
+        "enrichment_run",
+        ["projectUuid", "startedAt"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_enrichment_run_projectUuid_startedAt", table_name="enrichment_run"
+    )
+    op.drop_index("ix_enrichment_run_startedAt", table_name="enrichment_run")
+    op.drop_table("enrichment_run")
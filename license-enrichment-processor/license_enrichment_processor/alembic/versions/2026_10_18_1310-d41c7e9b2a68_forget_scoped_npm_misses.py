@@ -0,0 +1,35 @@
+"""forget scoped npm misses
+
+Revision ID: d41c7e9b2a68
+Revises: b3e9a1c07d52
+Create Date: 2026-10-18 13:10:27.518204+07:00
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d41c7e9b2a68"
+down_revision: Union[str, None] = "b3e9a1c07d52"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Batch lookups sent npm scopes percent-encoded, which ClearlyDefined
+    # never matches; the misses recorded for them are not real
+    op.execute(
+        """
+        DELETE FROM component_not_found
+        WHERE componentPurl LIKE 'pkg:npm/\\%40%' ESCAPE '\\'
+        AND source LIKE '%CLEARLY_DEFINED%'
+        """
+    )
+
+
+def downgrade() -> None:
+    pass
@@ -0,0 +1,33 @@
+"""add project full run at
+
+Revision ID: e5a83f6c1b97
+Revises: d41c7e9b2a68
+Create Date: 2026-10-18 14:20:41.206937+07:00
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e5a83f6c1b97"
+down_revision: Union[str, None] = "d41c7e9b2a68"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Incremental runs move updatedAt too, so it cannot tell when the whole
+    # project was last processed; existing snapshots count from their last run
+    op.add_column(
+        "project_fingerprint", sa.Column("fullRunAt", sa.DateTime, nullable=True)
+    )
+    op.execute("UPDATE project_fingerprint SET fullRunAt = updatedAt")
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("project_fingerprint") as batch_op:
+        batch_op.drop_column("fullRunAt")
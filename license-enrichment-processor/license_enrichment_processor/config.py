@@ -1,48 +1,561 @@
 import os
-import sqlite3
+import dataclasses
 import datetime
-from aiohttp import ClientSession
-import logging
-from flask import current_app
+import functools
+from collections.abc import Coroutine
+from concurrent.futures import Future
+from logging import Logger
+from typing import Any, TypeVar
+from aiohttp import ClientSession, TCPConnector
 from .lib.date import DatetimeProvider
 from .lib.dependency_track import DependencyTrack
-from .lib.sqlite import SqliteDatabase
-from .lib.retry_memory import InMemoryRetryMemory
+from .lib.event_loop import BackgroundEventLoop
+from .lib.concurrency import AdaptiveConcurrencyLimiter
+from .lib.job_queue import EnrichmentJobQueue
+from .lib.cache_refresh import CacheFreshness, CacheRefresher
+from .lib.components_cache import LruComponentsCache, RefreshableComponentsCache
+from .lib.sqlite import (
+    SqliteDatabase,
+    SqliteConnectionPool,
+    SqliteDefinitionStore,
+    SqliteNegativeCache,
+    SqliteProjectStateStore,
+    SqliteRetryMemory,
+    SqliteRunReportStore,
+)
 from .lib.license_enrichment_processor import LicenseEnrichmentProcessor
-from .lib.license_data_source import LicenseDataSourceClearlyDefined
+from .lib.license_data_source import (
+    LicenseDataSource,
+    LicenseDataSourceClearlyDefined,
+    LicenseDataSourceComposite,
+    LicenseDataSourceSingleFlight,
+    LicenseDataSourceSnyk,
+)
+from .lib.http import HostCircuitBreakers, ResilientHttpClient, RetryPolicy
+from .lib.metrics import MetricsRegistry
+from .lib.rate_limit import BackgroundRateLimiter, HostRateLimiter
+from .lib.tracing import NoopTracer, OpenTelemetryTracer, Tracer
+
+T = TypeVar("T")
+
+# Same order as SOURCE_PRIORITY_ORDER, so a fallback never holds an answer
+# that would have outranked the one already found
+DEFAULT_LICENSE_DATA_SOURCES = "snyk,clearlydefined"
 
 config = {
     "DEPENDENCY_TRACK_API_URL": os.environ["DEPENDENCY_TRACK_API_URL"],
     "DEPENDENCY_TRACK_API_KEY": os.environ["DEPENDENCY_TRACK_API_KEY"],
+    "DEPENDENCY_TRACK_PAGE_SIZE": int(
+        os.environ.get("DEPENDENCY_TRACK_PAGE_SIZE", "100")
+    ),
+    "DEPENDENCY_TRACK_MAX_CONCURRENT_PAGES": int(
+        os.environ.get("DEPENDENCY_TRACK_MAX_CONCURRENT_PAGES", "4")
+    ),
+    "DEPENDENCY_TRACK_REUSE_COMPONENT_PAYLOADS": os.environ.get(
+        "DEPENDENCY_TRACK_REUSE_COMPONENT_PAYLOADS", "true"
+    ).lower()
+    == "true",
+    "DEPENDENCY_TRACK_LICENSE_CACHE_TTL_SECONDS": int(
+        os.environ.get("DEPENDENCY_TRACK_LICENSE_CACHE_TTL_SECONDS", "3600")
+    ),
+    "DEPENDENCY_TRACK_MAX_CONCURRENT_UPDATES": int(
+        os.environ.get("DEPENDENCY_TRACK_MAX_CONCURRENT_UPDATES", "16")
+    ),
+    "DEPENDENCY_TRACK_UPDATE_TARGET_LATENCY_SECONDS": float(
+        os.environ.get("DEPENDENCY_TRACK_UPDATE_TARGET_LATENCY_SECONDS", "2")
+    ),
     "DB_PATH": os.environ["DB_PATH"],
+    "DB_READER_CONNECTIONS": int(os.environ.get("DB_READER_CONNECTIONS", "4")),
+    "DB_BUSY_TIMEOUT_MS": int(os.environ.get("DB_BUSY_TIMEOUT_MS", "5000")),
+    "DB_CACHE_FLUSH_SIZE": int(os.environ.get("DB_CACHE_FLUSH_SIZE", "200")),
+    "COMPONENTS_CACHE_MAX_ENTRIES": int(
+        os.environ.get("COMPONENTS_CACHE_MAX_ENTRIES", "10000")
+    ),
+    "COMPONENTS_CACHE_MAX_BYTES": int(
+        os.environ.get("COMPONENTS_CACHE_MAX_BYTES", str(64 * 1024 * 1024))
+    ),
+    "COMPONENTS_CACHE_TTL_SECONDS": int(
+        os.environ.get("COMPONENTS_CACHE_TTL_SECONDS", "600")
+    ),
+    "HTTP_CONNECTION_LIMIT": int(os.environ.get("HTTP_CONNECTION_LIMIT", "100")),
+    "HTTP_CONNECTION_LIMIT_PER_HOST": int(
+        os.environ.get("HTTP_CONNECTION_LIMIT_PER_HOST", "10")
+    ),
+    "HTTP_DNS_CACHE_TTL_SECONDS": int(
+        os.environ.get("HTTP_DNS_CACHE_TTL_SECONDS", "300")
+    ),
+    "TRACING_EXPORTER": os.environ.get("TRACING_EXPORTER", "none").lower(),
+    "HTTP_TIMEOUT_SECONDS": float(os.environ.get("HTTP_TIMEOUT_SECONDS", "30")),
+    "HTTP_MAX_ATTEMPTS": int(os.environ.get("HTTP_MAX_ATTEMPTS", "3")),
+    "HTTP_RETRY_BASE_DELAY_SECONDS": float(
+        os.environ.get("HTTP_RETRY_BASE_DELAY_SECONDS", "0.5")
+    ),
+    "HTTP_RETRY_MAX_DELAY_SECONDS": float(
+        os.environ.get("HTTP_RETRY_MAX_DELAY_SECONDS", "10")
+    ),
+    "HTTP_CIRCUIT_BREAKER_FAILURE_THRESHOLD": int(
+        os.environ.get("HTTP_CIRCUIT_BREAKER_FAILURE_THRESHOLD", "5")
+    ),
+    "HTTP_CIRCUIT_BREAKER_RESET_SECONDS": float(
+        os.environ.get("HTTP_CIRCUIT_BREAKER_RESET_SECONDS", "30")
+    ),
+    "ENRICHMENT_WORKERS": int(os.environ.get("ENRICHMENT_WORKERS", "2")),
+    "ENRICHMENT_MAX_QUEUED_JOBS": int(
+        os.environ.get("ENRICHMENT_MAX_QUEUED_JOBS", "100")
+    ),
+    "CLEARLYDEFINED_REQUESTS_PER_SECOND": float(
+        os.environ.get("CLEARLYDEFINED_REQUESTS_PER_SECOND", "5")
+    ),
+    "CLEARLYDEFINED_REQUEST_BURST": float(
+        os.environ.get("CLEARLYDEFINED_REQUEST_BURST", "10")
+    ),
+    "SNYK_REQUESTS_PER_SECOND": float(os.environ.get("SNYK_REQUESTS_PER_SECOND", "1")),
+    "SNYK_REQUEST_BURST": float(os.environ.get("SNYK_REQUEST_BURST", "2")),
+    "NOT_FOUND_TTL_DAYS": float(os.environ.get("NOT_FOUND_TTL_DAYS", "90")),
+    "INCREMENTAL_ENRICHMENT_ENABLED": os.environ.get(
+        "INCREMENTAL_ENRICHMENT_ENABLED", "true"
+    ).lower()
+    == "true",
+    "PROJECT_SNAPSHOT_MAX_AGE_HOURS": float(
+        os.environ.get("PROJECT_SNAPSHOT_MAX_AGE_HOURS", "24")
+    ),
+    "RETRY_BASE_BACKOFF_SECONDS": int(
+        os.environ.get("RETRY_BASE_BACKOFF_SECONDS", "300")
+    ),
+    "RETRY_MAX_BACKOFF_SECONDS": int(
+        os.environ.get("RETRY_MAX_BACKOFF_SECONDS", "86400")
+    ),
+    "CLEARLYDEFINED_MAX_AGE_DAYS": float(
+        os.environ.get("CLEARLYDEFINED_MAX_AGE_DAYS", "30")
+    ),
+    "SNYK_MAX_AGE_DAYS": float(os.environ.get("SNYK_MAX_AGE_DAYS", "30")),
+    "CACHE_DEFAULT_MAX_AGE_DAYS": float(
+        os.environ.get("CACHE_DEFAULT_MAX_AGE_DAYS", "30")
+    ),
+    "CACHE_REFRESH_ENABLED": os.environ.get("CACHE_REFRESH_ENABLED", "true").lower()
+    == "true",
+    "CACHE_REFRESH_BATCH_SIZE": int(os.environ.get("CACHE_REFRESH_BATCH_SIZE", "100")),
+    "CACHE_REFRESH_IDLE_INTERVAL_SECONDS": int(
+        os.environ.get("CACHE_REFRESH_IDLE_INTERVAL_SECONDS", "300")
+    ),
+    "CACHE_REFRESH_CLEARLYDEFINED_REQUESTS_PER_SECOND": float(
+        os.environ.get("CACHE_REFRESH_CLEARLYDEFINED_REQUESTS_PER_SECOND", "0.5")
+    ),
+    "CACHE_REFRESH_SNYK_REQUESTS_PER_SECOND": float(
+        os.environ.get("CACHE_REFRESH_SNYK_REQUESTS_PER_SECOND", "0.2")
+    ),
+    # Highest priority first
+    "LICENSE_DATA_SOURCES": [
+        it.strip().lower()
+        for it in os.environ.get(
+            "LICENSE_DATA_SOURCES", DEFAULT_LICENSE_DATA_SOURCES
+        ).split(",")
+        if it.strip()
+    ],
 }
 
 
-def get_enrichment_processor() -> tuple[LicenseEnrichmentProcessor, ClientSession]:
-    logger = current_app.logger
-    datetime_provider = DatetimeProvider.FromOffsetHours(7)
-    client_session = ClientSession()
+class EnrichmentService:
+
+    event_loop: BackgroundEventLoop
+    client_session: ClientSession
+    connection_pool: SqliteConnectionPool
+    enrichment_processor: LicenseEnrichmentProcessor
+    job_queue: EnrichmentJobQueue
+    metrics: MetricsRegistry
+    cache_refresher: CacheRefresher | None
+
+    def __init__(
+        self,
+        event_loop: BackgroundEventLoop,
+        client_session: ClientSession,
+        connection_pool: SqliteConnectionPool,
+        enrichment_processor: LicenseEnrichmentProcessor,
+        job_queue: EnrichmentJobQueue,
+        metrics: MetricsRegistry,
+        cache_refresher: CacheRefresher | None = None,
+    ) -> None:
+        self.event_loop = event_loop
+        self.client_session = client_session
+        self.connection_pool = connection_pool
+        self.enrichment_processor = enrichment_processor
+        self.job_queue = job_queue
+        self.metrics = metrics
+        self.cache_refresher = cache_refresher
+
+    def submit(self, coroutine: Coroutine[Any, Any, T]) -> Future[T]:
+        return self.event_loop.submit(coroutine)
+
+    def close(self) -> None:
+        if self.cache_refresher is not None:
+            self.event_loop.run(self.cache_refresher.stop())
+        self.event_loop.run(self.job_queue.stop())
+        self.event_loop.run(self.client_session.close())
+        self.event_loop.stop()
+        self.connection_pool.close()
+
+
+def create_connection_pool() -> SqliteConnectionPool:
+    return SqliteConnectionPool(
+        path=config["DB_PATH"],
+        reader_count=config["DB_READER_CONNECTIONS"],
+        busy_timeout_ms=config["DB_BUSY_TIMEOUT_MS"],
+    )
+
+
+async def create_client_session() -> ClientSession:
+    return ClientSession(
+        connector=TCPConnector(
+            limit=config["HTTP_CONNECTION_LIMIT"],
+            limit_per_host=config["HTTP_CONNECTION_LIMIT_PER_HOST"],
+            ttl_dns_cache=config["HTTP_DNS_CACHE_TTL_SECONDS"],
+        )
+    )
+
+
+def create_datetime_provider() -> DatetimeProvider:
+    return DatetimeProvider.FromOffsetHours(7)
+
+
+def create_tracer() -> Tracer:
+    tracer_types = {"none": NoopTracer, "opentelemetry": OpenTelemetryTracer}
+    if config["TRACING_EXPORTER"] not in tracer_types:
+        raise ValueError(
+            f"TRACING_EXPORTER must be one of {', '.join(tracer_types)}, got {config['TRACING_EXPORTER']}"
+        )
+    return tracer_types[config["TRACING_EXPORTER"]]()
+
+
+def create_circuit_breakers() -> HostCircuitBreakers:
+    # Shared by every client so a host that is down fails fast everywhere
+    return HostCircuitBreakers(
+        failure_threshold=config["HTTP_CIRCUIT_BREAKER_FAILURE_THRESHOLD"],
+        reset_timeout_seconds=config["HTTP_CIRCUIT_BREAKER_RESET_SECONDS"],
+    )
+
+
+def create_http_client(
+    client_session: ClientSession,
+    circuit_breakers: HostCircuitBreakers,
+    metrics: MetricsRegistry,
+    logger: Logger,
+    rate_limiter: HostRateLimiter | None = None,
+) -> ResilientHttpClient:
+    return ResilientHttpClient(
+        session=client_session,
+        logger=logger,
+        retry_policy=RetryPolicy(
+            max_attempts=config["HTTP_MAX_ATTEMPTS"],
+            base_delay_seconds=config["HTTP_RETRY_BASE_DELAY_SECONDS"],
+            max_delay_seconds=config["HTTP_RETRY_MAX_DELAY_SECONDS"],
+        ),
+        circuit_breakers=circuit_breakers,
+        rate_limiter=rate_limiter,
+        timeout_seconds=config["HTTP_TIMEOUT_SECONDS"],
+        metrics=metrics,
+    )
+
+
+def create_rate_limiter() -> HostRateLimiter:
+    return HostRateLimiter(
+        {
+            "api.clearlydefined.io": (
+                config["CLEARLYDEFINED_REQUESTS_PER_SECOND"],
+                config["CLEARLYDEFINED_REQUEST_BURST"],
+            ),
+            "security.snyk.io": (
+                config["SNYK_REQUESTS_PER_SECOND"],
+                config["SNYK_REQUEST_BURST"],
+            ),
+        }
+    )
+
+
+def create_enrichment_service(logger: Logger) -> EnrichmentService:
+    event_loop = BackgroundEventLoop()
+    client_session = event_loop.run(create_client_session())
+    circuit_breakers = create_circuit_breakers()
+    # Shared by live enrichment and cache refresh, so together they stay
+    # within each upstream's budget
+    rate_limiter = create_rate_limiter()
+    metrics = MetricsRegistry()
+    connection_pool = create_connection_pool()
+    enrichment_processor = create_enrichment_processor(
+        client_session=client_session,
+        circuit_breakers=circuit_breakers,
+        rate_limiter=rate_limiter,
+        metrics=metrics,
+        connection_pool=connection_pool,
+        logger=logger,
+    )
+    job_queue = EnrichmentJobQueue(
+        processor=enrichment_processor,
+        datetime_provider=enrichment_processor.datetime_provider,
+        logger=logger,
+        worker_count=config["ENRICHMENT_WORKERS"],
+        max_queued_jobs=config["ENRICHMENT_MAX_QUEUED_JOBS"],
+    )
+    event_loop.run(job_queue.start())
+    cache_refresher = (
+        create_cache_refresher(
+            client_session=client_session,
+            circuit_breakers=circuit_breakers,
+            rate_limiter=rate_limiter,
+            metrics=metrics,
+            connection_pool=connection_pool,
+            datetime_provider=enrichment_processor.datetime_provider,
+            logger=logger,
+        )
+        if config["CACHE_REFRESH_ENABLED"]
+        else None
+    )
+    if cache_refresher is not None:
+        event_loop.run(cache_refresher.start())
+    register_service_metrics(metrics, enrichment_processor, job_queue)
+    return EnrichmentService(
+        event_loop=event_loop,
+        client_session=client_session,
+        connection_pool=connection_pool,
+        enrichment_processor=enrichment_processor,
+        job_queue=job_queue,
+        metrics=metrics,
+        cache_refresher=cache_refresher,
+    )
+
+
+# Values the service already tracks, sampled whenever metrics are scraped
+def register_service_metrics(
+    metrics: MetricsRegistry,
+    enrichment_processor: LicenseEnrichmentProcessor,
+    job_queue: EnrichmentJobQueue,
+) -> None:
+    queued_jobs = metrics.gauge(
+        "license_enrichment_jobs_queued", "Enrichment jobs waiting for a worker"
+    )
+    update_limit = metrics.gauge(
+        "license_enrichment_dependency_track_update_limit",
+        "Current cap on concurrent Dependency-Track updates",
+    )
+    updates_in_flight = metrics.gauge(
+        "license_enrichment_dependency_track_updates_in_flight",
+        "Dependency-Track updates currently in flight",
+    )
+    shared_lookups = metrics.gauge(
+        "license_enrichment_shared_lookups",
+        "License lookups answered by a lookup another run already had in flight",
+    )
+    lru_cache = metrics.gauge(
+        "license_enrichment_lru_cache",
+        "Counters and size of the in-memory components cache",
+        ["stat"],
+    )
+
+    def collect() -> None:
+        queued_jobs.set(job_queue.queue_depth())
+        update_limit.set(int(enrichment_processor.update_limiter.limit))
+        updates_in_flight.set(enrichment_processor.update_limiter.in_flight)
+        license_data_source = enrichment_processor.license_data_source
+        if isinstance(license_data_source, LicenseDataSourceSingleFlight):
+            shared_lookups.set(license_data_source.shared_lookups)
+        components_cache = enrichment_processor.components_cache
+        if isinstance(components_cache, LruComponentsCache):
+            for stat, value in dataclasses.asdict(components_cache.stats()).items():
+                lru_cache.labels(stat).set(value)
+
+    metrics.on_collect(collect)
+
+
+def create_components_cache(
+    connection_pool: SqliteConnectionPool, datetime_provider: DatetimeProvider
+) -> RefreshableComponentsCache:
+    database = SqliteDatabase(
+        connection_pool=connection_pool,
+        datetime_provider=datetime_provider,
+        tracer=create_tracer(),
+    )
+    if config["COMPONENTS_CACHE_MAX_ENTRIES"] <= 0:
+        return database
+    return LruComponentsCache(
+        inner=database,
+        max_entries=config["COMPONENTS_CACHE_MAX_ENTRIES"],
+        max_bytes=config["COMPONENTS_CACHE_MAX_BYTES"],
+        ttl=datetime.timedelta(seconds=config["COMPONENTS_CACHE_TTL_SECONDS"]),
+    )
+
+
+def create_definition_store(
+    connection_pool: SqliteConnectionPool, datetime_provider: DatetimeProvider
+) -> SqliteDefinitionStore:
+    return SqliteDefinitionStore(
+        connection_pool=connection_pool, datetime_provider=datetime_provider
+    )
+
+
+def create_license_data_source(
+    http_client: ResilientHttpClient,
+    definition_store: SqliteDefinitionStore,
+    logger: Logger,
+) -> LicenseDataSource:
+    source_types = {
+        "clearlydefined": functools.partial(
+            LicenseDataSourceClearlyDefined, definition_store=definition_store
+        ),
+        "snyk": LicenseDataSourceSnyk,
+    }
+    tracer = create_tracer()
+    unknown_sources = set(config["LICENSE_DATA_SOURCES"]) - source_types.keys()
+    if len(config["LICENSE_DATA_SOURCES"]) == 0 or len(unknown_sources) > 0:
+        raise ValueError(
+            f"LICENSE_DATA_SOURCES must list some of {', '.join(source_types)}, got {unknown_sources or 'none'}"
+        )
+    sources = [
+        source_types[name](http_client=http_client, logger=logger, tracer=tracer)
+        for name in config["LICENSE_DATA_SOURCES"]
+    ]
+    return sources[0] if len(sources) == 1 else LicenseDataSourceComposite(sources)
+
+
+def create_enrichment_processor(
+    client_session: ClientSession,
+    circuit_breakers: HostCircuitBreakers,
+    rate_limiter: HostRateLimiter,
+    metrics: MetricsRegistry,
+    connection_pool: SqliteConnectionPool,
+    logger: Logger,
+) -> LicenseEnrichmentProcessor:
+    datetime_provider = create_datetime_provider()
+    tracer = create_tracer()
     dependency_track = DependencyTrack(
-        client=client_session,
+        client=create_http_client(client_session, circuit_breakers, metrics, logger),
         api_url=config["DEPENDENCY_TRACK_API_URL"],
         api_key=config["DEPENDENCY_TRACK_API_KEY"],
+        page_size=config["DEPENDENCY_TRACK_PAGE_SIZE"],
+        max_concurrent_pages=config["DEPENDENCY_TRACK_MAX_CONCURRENT_PAGES"],
+        reuse_listed_payloads=config["DEPENDENCY_TRACK_REUSE_COMPONENT_PAYLOADS"],
+        license_cache_ttl=datetime.timedelta(
+            seconds=config["DEPENDENCY_TRACK_LICENSE_CACHE_TTL_SECONDS"]
+        ),
+        tracer=tracer,
     )
-    components_cache = SqliteDatabase(
-        connection_factory=lambda: sqlite3.connect(config["DB_PATH"]),
-        datetime_provider=datetime_provider,
+    components_cache = create_components_cache(connection_pool, datetime_provider)
+    license_data_source = LicenseDataSourceSingleFlight(
+        create_license_data_source(
+            http_client=create_http_client(
+                client_session,
+                circuit_breakers,
+                metrics,
+                logger,
+                rate_limiter=rate_limiter,
+            ),
+            definition_store=create_definition_store(
+                connection_pool, datetime_provider
+            ),
+            logger=logger,
+        )
+    )
+    retry_memory = SqliteRetryMemory(
+        connection_pool=connection_pool,
+        source=license_data_source.SOURCE_NAME,
+        base_backoff=datetime.timedelta(seconds=config["RETRY_BASE_BACKOFF_SECONDS"]),
+        max_backoff=datetime.timedelta(seconds=config["RETRY_MAX_BACKOFF_SECONDS"]),
     )
-    retry_memory = InMemoryRetryMemory()
-    license_data_source = LicenseDataSourceClearlyDefined(
-        clientSession=client_session, logger=logger, request_limit_per_second=5
+    negative_cache = SqliteNegativeCache(
+        connection_pool=connection_pool, source=license_data_source.SOURCE_NAME
     )
-    fetch_cooldown = datetime.timedelta(days=30)
-    enrichment_processor = LicenseEnrichmentProcessor(
+    return LicenseEnrichmentProcessor(
         dependency_track=dependency_track,
         components_cache=components_cache,
         retry_memory=retry_memory,
+        negative_cache=negative_cache,
+        license_data_source=license_data_source,
+        datetime_provider=datetime_provider,
+        not_found_ttl=datetime.timedelta(days=config["NOT_FOUND_TTL_DAYS"]),
+        project_state=(
+            SqliteProjectStateStore(connection_pool=connection_pool)
+            if config["INCREMENTAL_ENRICHMENT_ENABLED"]
+            else None
+        ),
+        project_state_max_age=datetime.timedelta(
+            hours=config["PROJECT_SNAPSHOT_MAX_AGE_HOURS"]
+        ),
+        run_reports=SqliteRunReportStore(connection_pool=connection_pool),
+        tracer=tracer,
+        logger=logger,
+        cache_flush_size=config["DB_CACHE_FLUSH_SIZE"],
+        metrics=metrics,
+        update_limiter=AdaptiveConcurrencyLimiter(
+            max_limit=config["DEPENDENCY_TRACK_MAX_CONCURRENT_UPDATES"],
+            target_latency_seconds=config[
+                "DEPENDENCY_TRACK_UPDATE_TARGET_LATENCY_SECONDS"
+            ],
+        ),
+    )
+
+
+def create_cache_refresher(
+    client_session: ClientSession,
+    circuit_breakers: HostCircuitBreakers,
+    rate_limiter: HostRateLimiter,
+    metrics: MetricsRegistry,
+    connection_pool: SqliteConnectionPool,
+    datetime_provider: DatetimeProvider,
+    logger: Logger,
+) -> CacheRefresher:
+    clearly_defined_max_age = datetime.timedelta(
+        days=config["CLEARLYDEFINED_MAX_AGE_DAYS"]
+    )
+    freshness = CacheFreshness(
+        max_age_by_source={
+            **{
+                source: clearly_defined_max_age
+                for source in LicenseDataSourceClearlyDefined.LICENSE_SOURCES
+            },
+            LicenseDataSourceSnyk.LICENSE_SOURCE: datetime.timedelta(
+                days=config["SNYK_MAX_AGE_DAYS"]
+            ),
+        },
+        default_max_age=datetime.timedelta(days=config["CACHE_DEFAULT_MAX_AGE_DAYS"]),
+    )
+    # Refreshing only uses budget live enrichment leaves spare, at a pace
+    # capped further by its own limits
+    license_data_source = create_license_data_source(
+        http_client=create_http_client(
+            client_session,
+            circuit_breakers,
+            metrics,
+            logger,
+            rate_limiter=BackgroundRateLimiter(
+                rate_limiter,
+                {
+                    "api.clearlydefined.io": (
+                        config["CACHE_REFRESH_CLEARLYDEFINED_REQUESTS_PER_SECOND"],
+                        1,
+                    ),
+                    "security.snyk.io": (
+                        config["CACHE_REFRESH_SNYK_REQUESTS_PER_SECOND"],
+                        1,
+                    ),
+                },
+            ),
+        ),
+        definition_store=create_definition_store(connection_pool, datetime_provider),
+        logger=logger,
+    )
+    return CacheRefresher(
+        # Straight to the database: background batches would evict the live
+        # pipeline's hot entries from the in-memory cache and skew its stats.
+        # Refreshed details reach live runs once their in-memory entry expires.
+        components_cache=SqliteDatabase(
+            connection_pool=connection_pool,
+            datetime_provider=datetime_provider,
+            tracer=create_tracer(),
+        ),
         license_data_source=license_data_source,
+        freshness=freshness,
         datetime_provider=datetime_provider,
-        fetch_cooldown=fetch_cooldown,
         logger=logger,
+        batch_size=config["CACHE_REFRESH_BATCH_SIZE"],
+        idle_interval=datetime.timedelta(
+            seconds=config["CACHE_REFRESH_IDLE_INTERVAL_SECONDS"]
+        ),
     )
-    return enrichment_processor, client_session
@@ -1,13 +1,18 @@
+from collections.abc import Callable
 from flask import Blueprint, request, abort
 import jsonschema
 import datetime
-from .config import get_enrichment_processor
+import asyncio
+from .config import EnrichmentService
+from .lib.components_cache import LruComponentsCache
+from .lib.job_queue import JobQueueFullError
 from .lib.license_enrichment_processor import (
     BomProcessedEvent,
 )
 
 
 def create_blueprint(
+    get_enrichment_service: Callable[[], EnrichmentService],
     url_prefix: str = "",
 ) -> Blueprint:
     blueprint = Blueprint("Router", __name__, url_prefix=url_prefix)
@@ -18,12 +23,73 @@ def create_blueprint(
         try:
             jsonschema.validate(instance=payload, schema=bom_processed_payload_schema)
             as_event = parse_bom_processed_payload(payload)
-            processor, client = get_enrichment_processor()
-            await processor.enrich_from_bom_processed_event(as_event)
-            await client.close()
-            return ""
+            enrichment_service = get_enrichment_service()
+            # The job queue lives on the service's event loop, not on the
+            # per-request loop Flask creates
+            job = await asyncio.wrap_future(
+                enrichment_service.submit(
+                    enrichment_service.job_queue.enqueue(as_event)
+                )
+            )
+            return (
+                {"jobId": job.id},
+                202,
+                {"Location": f"{url_prefix}/jobs/{job.id}"},
+            )
         except jsonschema.ValidationError as e:
             abort(400, e.message)
+        except JobQueueFullError:
+            abort(503, "Enrichment job queue is full")
+
+    @blueprint.get("/jobs/<job_id>")
+    async def get_job(job_id: str):
+        enrichment_service = get_enrichment_service()
+        job = await asyncio.wrap_future(
+            enrichment_service.submit(enrichment_service.job_queue.get_job(job_id))
+        )
+        if job is None:
+            abort(404)
+        return job
+
+    @blueprint.get("/metrics")
+    def get_metrics():
+        return (
+            get_enrichment_service().metrics.render(),
+            200,
+            {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+        )
+
+    @blueprint.get("/cache/stats")
+    def get_cache_stats():
+        components_cache = (
+            get_enrichment_service().enrichment_processor.components_cache
+        )
+        if not isinstance(components_cache, LruComponentsCache):
+            abort(404, "In-memory components cache is disabled")
+        return components_cache.stats().to_dict()
+
+    @blueprint.get("/runs")
+    def get_runs():
+        run_reports = get_enrichment_service().enrichment_processor.run_reports
+        if run_reports is None:
+            abort(404, "Run reports are disabled")
+        limit = request.args.get("limit", default=50, type=int)
+        if limit < 1 or limit > 1000:
+            abort(400, "limit must be between 1 and 1000")
+        return [
+            report.to_dict()
+            for report in run_reports.list_runs(
+                project_uuid=request.args.get("project"), limit=limit
+            )
+        ]
+
+    @blueprint.get("/runs/<run_id>")
+    def get_run(run_id: str):
+        run_reports = get_enrichment_service().enrichment_processor.run_reports
+        report = run_reports.get_run(run_id) if run_reports is not None else None
+        if report is None:
+            abort(404)
+        return report.to_dict()
 
     return blueprint
 
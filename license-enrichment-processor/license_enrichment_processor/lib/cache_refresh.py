@@ -0,0 +1,144 @@
+from logging import Logger
+import asyncio
+import datetime
+import functools
+from .components_cache import RefreshableComponentsCache
+from .date import DatetimeProvider
+from .license_data_source import LicenseDataSource
+from .sbom import CanonicalPackageURL, Component, ComponentLicenseDetails
+
+
+class CacheFreshness:
+
+    max_age_by_source: dict[str, datetime.timedelta]
+    default_max_age: datetime.timedelta
+
+    def __init__(
+        self,
+        max_age_by_source: dict[str, datetime.timedelta],
+        default_max_age: datetime.timedelta,
+    ) -> None:
+        self.max_age_by_source = max_age_by_source
+        self.default_max_age = default_max_age
+
+    # When each source's entries go stale, and when entries without one do
+    def stale_before(
+        self, now: datetime.datetime
+    ) -> tuple[dict[str, datetime.datetime], datetime.datetime]:
+        return (
+            {
+                source: now - max_age
+                for source, max_age in self.max_age_by_source.items()
+            },
+            now - self.default_max_age,
+        )
+
+
+# Re-fetches the oldest stale cache entries in the background. Live
+# enrichment keeps serving stale entries meanwhile; the license data source
+# given here should have its own rate limiter so the two never compete.
+class CacheRefresher:
+
+    components_cache: RefreshableComponentsCache
+    license_data_source: LicenseDataSource
+    freshness: CacheFreshness
+    datetime_provider: DatetimeProvider
+    logger: Logger
+    batch_size: int
+    idle_interval: datetime.timedelta
+
+    def __init__(
+        self,
+        components_cache: RefreshableComponentsCache,
+        license_data_source: LicenseDataSource,
+        freshness: CacheFreshness,
+        datetime_provider: DatetimeProvider,
+        logger: Logger,
+        batch_size: int = 100,
+        idle_interval: datetime.timedelta = datetime.timedelta(minutes=5),
+    ) -> None:
+        self.components_cache = components_cache
+        self.license_data_source = license_data_source
+        self.freshness = freshness
+        self.datetime_provider = datetime_provider
+        self.logger = logger
+        self.batch_size = batch_size
+        self.idle_interval = idle_interval
+        self._cursor: tuple[datetime.datetime, str] | None = None
+        self._task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run(), name="cache-refresher")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                examined = await self.refresh_once()
+            except Exception:
+                self.logger.error("Refreshing cached components failed", exc_info=True)
+                examined = 0
+            if examined == 0:
+                await asyncio.sleep(self.idle_interval.total_seconds())
+
+    # Returns how many stale cache entries were found, 0 once a sweep is done
+    async def refresh_once(self) -> int:
+        now = self.datetime_provider.now()
+        stale_before_by_source, default_stale_before = self.freshness.stale_before(now)
+        # Staleness is filtered in SQLite, which may walk many fresh entries,
+        # so the read stays off the event loop webhook jobs run on
+        candidates = await asyncio.get_running_loop().run_in_executor(
+            None,
+            functools.partial(
+                self.components_cache.get_stale_components,
+                stale_before_by_source,
+                default_stale_before,
+                after=self._cursor,
+                limit=self.batch_size,
+            ),
+        )
+        if len(candidates) == 0:
+            # Start the next sweep from the oldest entry again
+            self._cursor = None
+            return 0
+        self._cursor = (candidates[-1][1], candidates[-1][0])
+
+        purls = [CanonicalPackageURL.from_string(purl) for purl, _ in candidates]
+        cached_license_details = self.components_cache.get_components(purls)
+        stale_components = [
+            Component(uuid="", purl=purl, license_details=cached_license_details[purl])
+            for purl in purls
+            if purl in cached_license_details
+        ]
+        if len(stale_components) == 0:
+            return len(candidates)
+
+        results = await self.license_data_source.retrieve_many(stale_components)
+        refreshed_components = [
+            Component(
+                uuid="", purl=component.purl, license_details=results[component.purl]
+            )
+            for component in stale_components
+            if isinstance(results.get(component.purl), ComponentLicenseDetails)
+        ]
+        # Entries the source no longer knows keep their details, but are not
+        # tried again until they go stale again
+        unknown_purls = [
+            component.purl
+            for component in stale_components
+            if results.get(component.purl) is None
+        ]
+        if len(refreshed_components) > 0:
+            self.components_cache.cache_components(refreshed_components)
+        if len(unknown_purls) > 0:
+            self.components_cache.touch_components(unknown_purls, now)
+        self.logger.info(
+            f"Refreshed {len(refreshed_components)}/{len(stale_components)} stale cached components"
+        )
+        return len(candidates)
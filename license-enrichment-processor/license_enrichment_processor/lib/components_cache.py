@@ -1,6 +1,12 @@
 from .sbom import Component, ComponentLicenseDetails
+from .rate_limit import Clock, SystemClock
+from collections import OrderedDict
+from dataclasses import dataclass
 from packageurl import PackageURL
+from datetime import datetime, timedelta
 from typing import Protocol
+import dataclasses
+import threading
 
 
 class ComponentsCache(Protocol):
@@ -11,3 +17,167 @@ class ComponentsCache(Protocol):
 
     def cache_components(self, components: list[Component]) -> None:
         pass
+
+    # Like cache_components, but entries already cached keep their age
+    def replace_license_details(self, components: list[Component]) -> None:
+        pass
+
+
+class RefreshableComponentsCache(ComponentsCache, Protocol):
+    # Oldest first, after the (updatedAt, PURL) cursor
+    def get_stale_components(
+        self,
+        stale_before_by_source: dict[str, datetime],
+        default_stale_before: datetime,
+        after: tuple[datetime, str] | None,
+        limit: int,
+    ) -> list[tuple[str, datetime]]:
+        pass
+
+    def touch_components(self, purls: list[PackageURL], timestamp: datetime) -> None:
+        pass
+
+
+@dataclass
+class ComponentsCacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    entries: int = 0
+    size_bytes: int = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "entries": self.entries,
+            "sizeBytes": self.size_bytes,
+        }
+
+
+# Keeps recently used entries in memory in front of another cache. Writes
+# go through to the inner cache. Cached details are shared between callers
+# and must not be mutated.
+class LruComponentsCache:
+
+    # Rough per-entry overhead of the dict slot, tuples and list objects
+    _ENTRY_OVERHEAD_BYTES = 400
+
+    inner: RefreshableComponentsCache
+    max_entries: int
+    max_bytes: int
+    ttl: timedelta
+    clock: Clock
+
+    def __init__(
+        self,
+        inner: RefreshableComponentsCache,
+        max_entries: int = 10000,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl: timedelta = timedelta(minutes=10),
+        clock: Clock = SystemClock(),
+    ) -> None:
+        self.inner = inner
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.clock = clock
+        # Keyed by PURL string, since hashing a PackageURL serialises it
+        self._entries: OrderedDict[str, tuple[float, int, ComponentLicenseDetails]] = (
+            OrderedDict()
+        )
+        self._stats = ComponentsCacheStats()
+        self._lock = threading.Lock()
+
+    def get_components(
+        self, purls: list[PackageURL]
+    ) -> dict[PackageURL, ComponentLicenseDetails]:
+        results: dict[PackageURL, ComponentLicenseDetails] = dict()
+        missing: list[PackageURL] = []
+        with self._lock:
+            now = self.clock.monotonic()
+            for purl in purls:
+                key = purl.to_string()
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] <= now:
+                    self._remove(key)
+                    self._stats.expirations += 1
+                    entry = None
+                if entry is None:
+                    self._stats.misses += 1
+                    missing.append(purl)
+                    continue
+                self._stats.hits += 1
+                self._entries.move_to_end(key)
+                results[purl] = entry[2]
+
+        if len(missing) > 0:
+            loaded = self.inner.get_components(missing)
+            with self._lock:
+                for purl, license_details in loaded.items():
+                    self._put(purl.to_string(), license_details)
+            results.update(loaded)
+        return results
+
+    def cache_components(self, components: list[Component]) -> None:
+        self.inner.cache_components(components)
+        with self._lock:
+            for component in components:
+                self._put(component.purl.to_string(), component.license_details)
+
+    def replace_license_details(self, components: list[Component]) -> None:
+        self.inner.replace_license_details(components)
+        with self._lock:
+            for component in components:
+                self._put(component.purl.to_string(), component.license_details)
+
+    def get_stale_components(
+        self,
+        stale_before_by_source: dict[str, datetime],
+        default_stale_before: datetime,
+        after: tuple[datetime, str] | None,
+        limit: int,
+    ) -> list[tuple[str, datetime]]:
+        return self.inner.get_stale_components(
+            stale_before_by_source, default_stale_before, after, limit
+        )
+
+    def touch_components(self, purls: list[PackageURL], timestamp: datetime) -> None:
+        self.inner.touch_components(purls, timestamp)
+
+    def stats(self) -> ComponentsCacheStats:
+        with self._lock:
+            return dataclasses.replace(self._stats, entries=len(self._entries))
+
+    def _put(self, key: str, license_details: ComponentLicenseDetails) -> None:
+        self._remove(key)
+        size = self._estimate_size(license_details)
+        self._entries[key] = (
+            self.clock.monotonic() + self.ttl.total_seconds(),
+            size,
+            license_details,
+        )
+        self._stats.size_bytes += size
+        while len(self._entries) > self.max_entries or (
+            self._stats.size_bytes > self.max_bytes and len(self._entries) > 1
+        ):
+            self._remove(next(iter(self._entries)))
+            self._stats.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._stats.size_bytes -= entry[1]
+
+    def _estimate_size(self, license_details: ComponentLicenseDetails) -> int:
+        return self._ENTRY_OVERHEAD_BYTES + sum(
+            len(value) + len(source)
+            for value, source in [
+                *license_details.license_expressions,
+                *license_details.attributions,
+                *license_details.source_urls,
+            ]
+        )
@@ -0,0 +1,68 @@
+from collections import deque
+import asyncio
+
+
+# Grows the cap by about one slot per round of fast successes and shrinks
+# it multiplicatively on errors or on latency above the target
+class AdaptiveConcurrencyLimiter:
+
+    min_limit: int
+    max_limit: int
+    target_latency_seconds: float
+    backoff_factor: float
+    limit: float
+
+    def __init__(
+        self,
+        max_limit: int,
+        min_limit: int = 1,
+        initial_limit: int | None = None,
+        target_latency_seconds: float = 1.0,
+        backoff_factor: float = 0.7,
+    ) -> None:
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency_seconds = target_latency_seconds
+        self.backoff_factor = backoff_factor
+        self.limit = float(initial_limit if initial_limit is not None else max_limit)
+        self._in_flight = 0
+        self._waiters: deque[asyncio.Future[None]] = deque()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    async def acquire(self) -> None:
+        while self._in_flight >= int(self.limit):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                # Hand on a slot this waiter may already have been woken for
+                self._wake_waiters()
+                raise
+        self._in_flight += 1
+
+    def release(self, latency_seconds: float, failed: bool) -> None:
+        self._in_flight -= 1
+        if failed or latency_seconds > self.target_latency_seconds:
+            self.limit = max(self.min_limit, self.limit * self.backoff_factor)
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        self._wake_waiters()
+
+    # Returns a slot that was acquired but never used, leaving the limit as is
+    def give_back(self) -> None:
+        self._in_flight -= 1
+        self._wake_waiters()
+
+    def _wake_waiters(self) -> None:
+        free_slots = int(self.limit) - self._in_flight
+        while free_slots > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free_slots -= 1
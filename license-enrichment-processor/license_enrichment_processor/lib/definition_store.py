@@ -0,0 +1,11 @@
+from collections.abc import Iterator
+from packageurl import PackageURL
+from typing import Protocol
+
+
+class DefinitionStore(Protocol):
+    def store_definitions(self, definitions: dict[PackageURL, dict]) -> None:
+        pass
+
+    def iter_definitions(self, batch_size: int) -> Iterator[list[tuple[str, dict]]]:
+        pass
@@ -1,89 +1,222 @@
-from .sbom import Component, ComponentLicenseDetails
-from aiohttp import ClientSession
+from .sbom import CanonicalPackageURL, Component, ComponentLicenseDetails
+from .http import ResilientHttpClient
+from .tracing import NoopTracer, Tracer, traced
+from aiohttp import ClientResponse
+from collections.abc import AsyncIterator
 import yarl
+import asyncio
+import datetime
 import itertools
-from packageurl import PackageURL
+import math
+import time
 
 
 class DependencyTrack:
 
-    client: ClientSession
+    SOURCE_NAME = "DependencyTrack"
+
+    client: ResilientHttpClient
     api_url: str
     api_key: str
+    page_size: int
+    max_concurrent_pages: int
+    reuse_listed_payloads: bool
+    license_cache_ttl: datetime.timedelta
+    license_negative_cache_ttl: datetime.timedelta
+    tracer: Tracer
 
     json_headers = {"Content-Type": "application/json"}
 
-    def __init__(self, client: ClientSession, api_url: str, api_key: str):
+    def __init__(
+        self,
+        client: ResilientHttpClient,
+        api_url: str,
+        api_key: str,
+        page_size: int = 100,
+        max_concurrent_pages: int = 4,
+        reuse_listed_payloads: bool = False,
+        license_cache_ttl: datetime.timedelta = datetime.timedelta(hours=1),
+        license_negative_cache_ttl: datetime.timedelta = datetime.timedelta(minutes=5),
+        tracer: Tracer = NoopTracer(),
+    ):
         self.client = client
         self.api_url = api_url
         self.api_key = api_key
+        self.page_size = page_size
+        self.max_concurrent_pages = max_concurrent_pages
+        self.reuse_listed_payloads = reuse_listed_payloads
+        self.license_cache_ttl = license_cache_ttl
+        self.license_negative_cache_ttl = license_negative_cache_ttl
+        self.tracer = tracer
+        self._resolved_licenses: dict[
+            str, tuple[float, asyncio.Future[dict | None]]
+        ] = dict()
 
     async def get_components(self, project_uuid: str) -> list[Component]:
-        def parse_component(data: dict) -> Component:
-            existing_license_expression: str | None = (
-                data["resolvedLicense"]["licenseId"]
-                if "resolvedLicense" in data
-                else data["licenseExpression"] if "licenseExpression" in data else None
-            )
-            return Component(
-                uuid=data["uuid"],
-                purl=PackageURL.from_string(data["purl"]) if "purl" in data else None,
-                license_details=ComponentLicenseDetails(
-                    license_expressions=(
-                        [(existing_license_expression, "DependencyTrack")]
-                        if existing_license_expression
-                        else []
-                    )
-                ),
-            )
-
-        url = yarl.URL(f"{self.api_url}/api/v1/component/project/{project_uuid}")
         result: list[Component] = []
-        for pageNumber in itertools.count(start=1):
-            response = await self.client.get(
-                url,
-                headers=self._auth_headers(),
-                params={"pageSize": 100, "pageNumber": pageNumber},
-            )
-            data = await response.json()
-            if len(data) == 0:
-                break
-            result = result + [parse_component(it) for it in data]
+        async for page in self.iter_components(project_uuid):
+            result.extend(page)
         return result
 
+    async def iter_components(
+        self, project_uuid: str
+    ) -> AsyncIterator[list[Component]]:
+        url = yarl.URL(f"{self.api_url}/api/v1/component/project/{project_uuid}")
+        first_page, total_count = await self._get_components_page(url, 1)
+        if len(first_page) == 0:
+            return
+        yield first_page
+
+        if total_count is None:
+            for page_number in itertools.count(start=2):
+                page, _ = await self._get_components_page(url, page_number)
+                if len(page) == 0:
+                    return
+                yield page
+
+        page_count = math.ceil(total_count / self.page_size)
+        semaphore = asyncio.Semaphore(self.max_concurrent_pages)
+
+        async def get_page(page_number: int) -> list[Component]:
+            async with semaphore:
+                page, _ = await self._get_components_page(url, page_number)
+                return page
+
+        tasks = [
+            asyncio.ensure_future(get_page(page_number))
+            for page_number in range(2, page_count + 1)
+        ]
+        try:
+            for next_page in asyncio.as_completed(tasks):
+                yield await next_page
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    @traced("dependency_track.get_components_page")
+    async def _get_components_page(
+        self, url: yarl.URL, page_number: int
+    ) -> tuple[list[Component], int | None]:
+        async def read(response: ClientResponse) -> tuple[list[dict], str | None]:
+            return await response.json(), response.headers.get("X-Total-Count")
+
+        data, total_count = await self.client.get(
+            url,
+            read,
+            headers=self._auth_headers(),
+            params={"pageSize": self.page_size, "pageNumber": page_number},
+        )
+        return (
+            [self._parse_component(it) for it in data],
+            int(total_count) if total_count is not None else None,
+        )
+
+    def _parse_component(self, data: dict) -> Component:
+        existing_license_expression: str | None = (
+            data["resolvedLicense"]["licenseId"]
+            if "resolvedLicense" in data
+            else data["licenseExpression"] if "licenseExpression" in data else None
+        )
+        return Component(
+            uuid=data["uuid"],
+            purl=(
+                CanonicalPackageURL.from_string(data["purl"])
+                if "purl" in data
+                else None
+            ),
+            license_details=ComponentLicenseDetails(
+                license_expressions=(
+                    [(existing_license_expression, self.SOURCE_NAME)]
+                    if existing_license_expression
+                    else []
+                )
+            ),
+            payload=data if self.reuse_listed_payloads else None,
+        )
+
+    @traced("dependency_track.update_component_license_expression")
     async def update_component_license_expression(
-        self, component_uuid: str, license_expression: str
+        self,
+        component_uuid: str,
+        license_expression: str,
+        component_payload: dict | None = None,
     ) -> None:
-        get_url = yarl.URL(f"{self.api_url}/api/v1/component/{component_uuid}")
-        get_license_url = yarl.URL(
-            f"{self.api_url}/api/v1/license/{license_expression}"
-        )
         post_url = yarl.URL(f"{self.api_url}/api/v1/component")
 
-        get_response = await self.client.get(get_url, headers=self._auth_headers())
-        component_payload: dict = await get_response.json()
+        if component_payload is None:
+            get_url = yarl.URL(f"{self.api_url}/api/v1/component/{component_uuid}")
+            component_payload = await self.client.get(
+                get_url, self._read_json, headers=self._auth_headers()
+            )
+        else:
+            component_payload = dict(component_payload)
 
         component_payload.pop("licenseExpression", None)
         component_payload.pop("licenseUrl", None)
         component_payload.pop("resolvedLicense", None)
 
-        get_license_response = await self.client.get(
-            get_license_url, headers=self._auth_headers()
-        )
-        resolved_license: dict | None = (
-            (await get_license_response.json())
-            if get_license_response.status == 200
-            else None
-        )
+        resolved_license = await self._resolve_license(license_expression)
         if resolved_license:
             component_payload["license"] = resolved_license["licenseId"]
         else:
             component_payload["licenseExpression"] = license_expression
+        # The payload sets the component's full state, so sending it twice
+        # leaves the same result and the POST is safe to retry
         await self.client.post(
             post_url,
+            self._read_nothing,
+            idempotent=True,
             headers=self._auth_headers() | self.json_headers,
             json=component_payload,
         )
 
+    async def _resolve_license(self, license_expression: str) -> dict | None:
+        cached = self._resolved_licenses.get(license_expression)
+        if cached is not None and cached[0] > time.monotonic():
+            return await asyncio.shield(cached[1])
+
+        # Concurrent updates sharing an expression wait on the same lookup
+        lookup = asyncio.ensure_future(self._get_license(license_expression))
+        self._resolved_licenses[license_expression] = (math.inf, lookup)
+        try:
+            resolved_license = await asyncio.shield(lookup)
+        except Exception:
+            self._resolved_licenses.pop(license_expression, None)
+            raise
+        ttl = (
+            self.license_cache_ttl
+            if resolved_license is not None
+            else self.license_negative_cache_ttl
+        )
+        self._resolved_licenses[license_expression] = (
+            time.monotonic() + ttl.total_seconds(),
+            lookup,
+        )
+        return resolved_license
+
+    @traced("dependency_track.get_license")
+    async def _get_license(self, license_expression: str) -> dict | None:
+        get_license_url = yarl.URL(
+            f"{self.api_url}/api/v1/license/{license_expression}"
+        )
+        return await self.client.get(
+            get_license_url,
+            self._read_license,
+            accept_statuses=(200, 404),
+            headers=self._auth_headers(),
+        )
+
+    @staticmethod
+    async def _read_json(response: ClientResponse) -> dict:
+        return await response.json()
+
+    @staticmethod
+    async def _read_license(response: ClientResponse) -> dict | None:
+        return await response.json() if response.status == 200 else None
+
+    @staticmethod
+    async def _read_nothing(response: ClientResponse) -> None:
+        return None
+
     def _auth_headers(self) -> dict[str, str]:
         return {"X-API-Key": self.api_key}
@@ -0,0 +1,345 @@
+from collections.abc import Awaitable, Callable, Collection
+from logging import Logger
+from typing import TypeVar
+from aiohttp import ClientConnectorError, ClientError, ClientResponse, ClientSession
+from aiohttp import ClientTimeout
+from .metrics import MetricsRegistry
+from .rate_limit import Clock, HostRateLimiter, SystemClock, parse_retry_after
+import asyncio
+import random
+import yarl
+
+T = TypeVar("T")
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+SUCCESS_STATUSES = range(200, 300)
+
+
+class HttpStatusError(Exception):
+    method: str
+    url: str
+    status: int
+    retry_after_seconds: float | None
+
+    def __init__(
+        self,
+        method: str,
+        url: str,
+        status: int,
+        retry_after_seconds: float | None = None,
+    ) -> None:
+        super().__init__(f"{method} {url} responded with status {status}")
+        self.method = method
+        self.url = url
+        self.status = status
+        self.retry_after_seconds = retry_after_seconds
+
+
+class CircuitOpenError(Exception):
+    host: str
+
+    def __init__(self, host: str) -> None:
+        super().__init__(f"Circuit breaker for {host} is open")
+        self.host = host
+
+
+# Opens after a run of consecutive failures and fails calls fast until the
+# reset timeout passes. A single probe call is then let through; it closes
+# the circuit on success and opens it again on failure.
+class CircuitBreaker:
+
+    failure_threshold: int
+    reset_timeout_seconds: float
+    clock: Clock
+
+    def __init__(
+        self,
+        failure_threshold: int,
+        reset_timeout_seconds: float,
+        clock: Clock = SystemClock(),
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self.clock = clock
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        return "half-open" if self._probing else "open"
+
+    def allow(self) -> bool:
+        if self._opened_at is None:
+            return True
+        if not self._reset_timeout_passed():
+            return False
+        # Restarting the timeout means a probe that never reports back, e.g.
+        # because it was cancelled, only holds the circuit for one more period
+        self._opened_at = self.clock.monotonic()
+        self._probing = True
+        return True
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._probing or self._failures >= self.failure_threshold:
+            self._opened_at = self.clock.monotonic()
+        self._probing = False
+
+    def _reset_timeout_passed(self) -> bool:
+        return self.clock.monotonic() - self._opened_at >= self.reset_timeout_seconds
+
+
+class HostCircuitBreakers:
+
+    failure_threshold: int
+    reset_timeout_seconds: float
+    clock: Clock
+    breakers: dict[str, CircuitBreaker]
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout_seconds: float = 30.0,
+        clock: Clock = SystemClock(),
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self.clock = clock
+        self.breakers = dict()
+
+    def get(self, url: str | yarl.URL) -> CircuitBreaker:
+        host = yarl.URL(url).host
+        breaker = self.breakers.get(host)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                self.failure_threshold, self.reset_timeout_seconds, self.clock
+            )
+            self.breakers[host] = breaker
+        return breaker
+
+
+class RetryPolicy:
+
+    max_attempts: int
+    base_delay_seconds: float
+    max_delay_seconds: float
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay_seconds: float = 0.5,
+        max_delay_seconds: float = 10.0,
+    ) -> None:
+        self.max_attempts = max_attempts
+        self.base_delay_seconds = base_delay_seconds
+        self.max_delay_seconds = max_delay_seconds
+
+    def delay(self, attempt: int) -> float:
+        # Full jitter keeps callers that failed together from retrying together
+        return random.uniform(
+            0,
+            min(
+                self.max_delay_seconds,
+                self.base_delay_seconds * 2 ** (attempt - 1),
+            ),
+        )
+
+
+class _RetryableError(Exception):
+    cause: Exception
+    retry_after_seconds: float | None
+
+    def __init__(self, cause: Exception, retry_after_seconds: float | None = None):
+        super().__init__(str(cause))
+        self.cause = cause
+        self.retry_after_seconds = retry_after_seconds
+
+
+# Wraps a ClientSession with the retry, timeout, rate limit and circuit
+# breaker rules shared by every upstream. Requests that are not idempotent
+# are only retried when the upstream cannot have acted on them: the
+# connection was never made, or the request was rejected with a 429.
+class ResilientHttpClient:
+
+    session: ClientSession
+    logger: Logger
+    retry_policy: RetryPolicy
+    circuit_breakers: HostCircuitBreakers
+    rate_limiter: HostRateLimiter | None
+    timeout: ClientTimeout
+    clock: Clock
+
+    def __init__(
+        self,
+        session: ClientSession,
+        logger: Logger,
+        retry_policy: RetryPolicy = RetryPolicy(),
+        circuit_breakers: HostCircuitBreakers | None = None,
+        rate_limiter: HostRateLimiter | None = None,
+        timeout_seconds: float = 30.0,
+        clock: Clock = SystemClock(),
+        metrics: MetricsRegistry | None = None,
+    ) -> None:
+        self.session = session
+        self.logger = logger
+        self.retry_policy = retry_policy
+        self.circuit_breakers = (
+            circuit_breakers
+            if circuit_breakers is not None
+            else HostCircuitBreakers(clock=clock)
+        )
+        self.rate_limiter = rate_limiter
+        self.timeout = ClientTimeout(total=timeout_seconds)
+        self.clock = clock
+        metrics = metrics if metrics is not None else MetricsRegistry()
+        self._request_duration = metrics.histogram(
+            "license_enrichment_http_request_duration_seconds",
+            "Time taken by upstream HTTP requests, one sample per attempt",
+            ["host", "method", "status"],
+        )
+        self._retries = metrics.counter(
+            "license_enrichment_http_retries_total",
+            "Upstream HTTP requests retried after a failed attempt",
+            ["host"],
+        )
+        self._circuit_rejections = metrics.counter(
+            "license_enrichment_http_circuit_open_rejections_total",
+            "Upstream HTTP requests failed fast by an open circuit breaker",
+            ["host"],
+        )
+        self._rate_limit_wait = metrics.histogram(
+            "license_enrichment_rate_limiter_wait_seconds",
+            "Time requests waited for the host's rate limiter",
+            ["host"],
+        )
+        circuit_open = metrics.gauge(
+            "license_enrichment_http_circuit_open",
+            "Whether the host's circuit breaker is open or half-open",
+            ["host"],
+        )
+
+        def collect_circuit_states() -> None:
+            for host, breaker in list(self.circuit_breakers.breakers.items()):
+                circuit_open.labels(host).set(int(breaker.state != "closed"))
+
+        metrics.on_collect(collect_circuit_states)
+
+    async def get(
+        self,
+        url: str | yarl.URL,
+        read: Callable[[ClientResponse], Awaitable[T]],
+        **kwargs,
+    ) -> T:
+        return await self.request("GET", url, read, **kwargs)
+
+    async def post(
+        self,
+        url: str | yarl.URL,
+        read: Callable[[ClientResponse], Awaitable[T]],
+        **kwargs,
+    ) -> T:
+        return await self.request("POST", url, read, **kwargs)
+
+    # Responses with a status in accept_statuses are handed to read; other
+    # statuses raise HttpStatusError once retries, if any, are used up
+    async def request(
+        self,
+        method: str,
+        url: str | yarl.URL,
+        read: Callable[[ClientResponse], Awaitable[T]],
+        accept_statuses: Collection[int] = SUCCESS_STATUSES,
+        idempotent: bool | None = None,
+        **kwargs,
+    ) -> T:
+        idempotent = method in IDEMPOTENT_METHODS if idempotent is None else idempotent
+        host = yarl.URL(url).host
+        breaker = self.circuit_breakers.get(url)
+        for attempt in range(1, self.retry_policy.max_attempts + 1):
+            if not breaker.allow():
+                self._circuit_rejections.labels(host).inc()
+                raise CircuitOpenError(host)
+            if self.rate_limiter is not None and self.rate_limiter.limits(url):
+                self._rate_limit_wait.labels(host).observe(
+                    await self.rate_limiter.acquire(url)
+                )
+            try:
+                return await self._attempt(
+                    method, url, read, accept_statuses, idempotent, breaker, **kwargs
+                )
+            except _RetryableError as e:
+                if attempt == self.retry_policy.max_attempts:
+                    raise e.cause from None
+                self._retries.labels(host).inc()
+                delay = self.retry_policy.delay(attempt)
+                if e.retry_after_seconds is not None:
+                    delay = max(delay, e.retry_after_seconds)
+                self.logger.warning(
+                    f"{method} {url} failed on attempt {attempt}/{self.retry_policy.max_attempts}, retrying in {delay:.2f}s: {e}"
+                )
+                await self.clock.sleep(delay)
+
+    async def _attempt(
+        self,
+        method: str,
+        url: str | yarl.URL,
+        read: Callable[[ClientResponse], Awaitable[T]],
+        accept_statuses: Collection[int],
+        idempotent: bool,
+        breaker: CircuitBreaker,
+        **kwargs,
+    ) -> T:
+        started = self.clock.monotonic()
+        status = "error"
+        try:
+            async with self.session.request(
+                method, url, timeout=self.timeout, **kwargs
+            ) as response:
+                status = str(response.status)
+                if response.status in accept_statuses:
+                    breaker.record_success()
+                    return await read(response)
+                error = HttpStatusError(
+                    method,
+                    str(url),
+                    response.status,
+                    parse_retry_after(response.headers.get("Retry-After")),
+                )
+        except ClientConnectorError as e:
+            breaker.record_failure()
+            raise _RetryableError(e)
+        except (ClientError, asyncio.TimeoutError) as e:
+            breaker.record_failure()
+            if idempotent:
+                raise _RetryableError(e)
+            raise
+        except asyncio.CancelledError:
+            status = "cancelled"
+            raise
+        finally:
+            self._request_duration.labels(yarl.URL(url).host, method, status).observe(
+                self.clock.monotonic() - started
+            )
+
+        if error.status == 429:
+            # The host is up, just busy; the rate limiter carries the wait
+            breaker.record_success()
+            if self.rate_limiter is not None and self.rate_limiter.limits(url):
+                self.rate_limiter.block_for(url, error.retry_after_seconds)
+                raise _RetryableError(error)
+            raise _RetryableError(error, error.retry_after_seconds)
+        if error.status >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        if idempotent and error.status in RETRYABLE_STATUSES:
+            raise _RetryableError(error, error.retry_after_seconds)
+        raise error
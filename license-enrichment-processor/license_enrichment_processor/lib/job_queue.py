@@ -0,0 +1,178 @@
+from dataclasses import dataclass
+from collections import OrderedDict
+from enum import Enum
+from logging import Logger
+import asyncio
+import datetime
+import uuid
+from .date import DatetimeProvider
+from .license_enrichment_processor import (
+    BomProcessedEvent,
+    EnrichmentRunStats,
+    LicenseEnrichmentProcessor,
+)
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+@dataclass
+class EnrichmentJob:
+    id: str
+    event: BomProcessedEvent
+    status: JobStatus
+    enqueued_at: datetime.datetime
+    coalesced_events: int = 0
+    started_at: datetime.datetime | None = None
+    finished_at: datetime.datetime | None = None
+    error: str | None = None
+    stats: EnrichmentRunStats | None = None
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "status": self.status.value,
+            "project": {
+                "uuid": self.event.project.uuid,
+                "name": self.event.project.name,
+                "version": self.event.project.version,
+            },
+            "coalescedEvents": self.coalesced_events,
+            "enqueuedAt": self.enqueued_at.isoformat(),
+            "startedAt": self.started_at.isoformat() if self.started_at else None,
+            "finishedAt": self.finished_at.isoformat() if self.finished_at else None,
+            "error": self.error,
+            "stats": self.stats.to_dict() if self.stats else None,
+        }
+
+
+class JobQueueFullError(Exception):
+    pass
+
+
+# Not thread-safe: only use from the event loop the workers were started on
+class EnrichmentJobQueue:
+
+    processor: LicenseEnrichmentProcessor
+    datetime_provider: DatetimeProvider
+    logger: Logger
+    worker_count: int
+    max_queued_jobs: int
+    max_finished_jobs: int
+
+    def __init__(
+        self,
+        processor: LicenseEnrichmentProcessor,
+        datetime_provider: DatetimeProvider,
+        logger: Logger,
+        worker_count: int = 2,
+        max_queued_jobs: int = 100,
+        max_finished_jobs: int = 1000,
+    ) -> None:
+        self.processor = processor
+        self.datetime_provider = datetime_provider
+        self.logger = logger
+        self.worker_count = worker_count
+        self.max_queued_jobs = max_queued_jobs
+        self.max_finished_jobs = max_finished_jobs
+        self._queue: asyncio.Queue[EnrichmentJob] = asyncio.Queue()
+        self._jobs: OrderedDict[str, EnrichmentJob] = OrderedDict()
+        self._queued_by_project: dict[str, EnrichmentJob] = dict()
+        self._running_projects: set[str] = set()
+        self._waiting_by_project: dict[str, EnrichmentJob] = dict()
+        self._workers: list[asyncio.Task] = []
+
+    async def start(self) -> None:
+        self._workers = [
+            asyncio.create_task(self._work(), name=f"enrichment-worker-{i}")
+            for i in range(self.worker_count)
+        ]
+
+    async def stop(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def enqueue(self, event: BomProcessedEvent) -> EnrichmentJob:
+        queued_job = self._queued_by_project.get(event.project.uuid)
+        if queued_job is not None:
+            # A run that has not started yet picks up the latest event instead
+            queued_job.event = event
+            queued_job.coalesced_events += 1
+            return queued_job
+
+        if self.queue_depth() >= self.max_queued_jobs:
+            raise JobQueueFullError()
+
+        job = EnrichmentJob(
+            id=str(uuid.uuid4()),
+            event=event,
+            status=JobStatus.QUEUED,
+            enqueued_at=self.datetime_provider.now(),
+        )
+        self._jobs[job.id] = job
+        self._queued_by_project[event.project.uuid] = job
+        self._queue.put_nowait(job)
+        return job
+
+    async def get_job(self, job_id: str) -> dict | None:
+        job = self._jobs.get(job_id)
+        return job.to_dict() if job else None
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize() + len(self._waiting_by_project)
+
+    async def _work(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                while job is not None:
+                    job = await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    # Returns the job set aside for the same project while this one ran, which
+    # the worker runs next
+    async def _run(self, job: EnrichmentJob) -> EnrichmentJob | None:
+        project_uuid = job.event.project.uuid
+        # Runs of the same project never overlap. A newer upload is set aside
+        # rather than holding a worker while it waits its turn; it stays the
+        # project's queued job, so later events still coalesce into it.
+        if project_uuid in self._running_projects:
+            self._waiting_by_project[project_uuid] = job
+            return None
+
+        self._running_projects.add(project_uuid)
+        if self._queued_by_project.get(project_uuid) is job:
+            del self._queued_by_project[project_uuid]
+        job.status = JobStatus.RUNNING
+        job.started_at = self.datetime_provider.now()
+        try:
+            job.stats = await self.processor.enrich_from_bom_processed_event(job.event)
+            job.status = JobStatus.SUCCEEDED
+        except Exception as e:
+            self.logger.error(
+                f"Enrichment job {job.id} for project '{job.event.project.name}' failed",
+                exc_info=True,
+            )
+            job.status = JobStatus.FAILED
+            job.error = repr(e)
+        finally:
+            job.finished_at = self.datetime_provider.now()
+            self._running_projects.discard(project_uuid)
+        self._evict_finished_jobs()
+        return self._waiting_by_project.pop(project_uuid, None)
+
+    def _evict_finished_jobs(self) -> None:
+        finished_job_ids = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.status in (JobStatus.SUCCEEDED, JobStatus.FAILED)
+        ]
+        for job_id in finished_job_ids[: -self.max_finished_jobs or None]:
+            del self._jobs[job_id]
@@ -1,13 +1,17 @@
 from abc import ABC, abstractmethod
-from lxml import html
-from collections.abc import Awaitable
+from lxml import etree
+from collections.abc import AsyncIterator, Awaitable
 from logging import Logger
+import functools
 import urllib
 import yarl
 import asyncio
 import aiohttp
+from packageurl import PackageURL
 from .sbom import ComponentLicenseDetails, Component
-
+from .definition_store import DefinitionStore
+from .http import ResilientHttpClient
+from .tracing import NoopTracer, Tracer, traced
 
 RetrieveLicenseError = Exception
 RetrieveLicenseResult = ComponentLicenseDetails | None | RetrieveLicenseError
@@ -21,84 +25,265 @@ class LicenseDataSource(ABC):
     def retrieve(self, component: Component) -> Awaitable[RetrieveLicenseResult]:
         pass
 
+    async def retrieve_many(
+        self, components: list[Component]
+    ) -> dict[PackageURL, RetrieveLicenseResult]:
+        results = await asyncio.gather(
+            *[self.retrieve(component) for component in components]
+        )
+        return {
+            component.purl: result for component, result in zip(components, results)
+        }
+
+
+class LicenseDataSourceComposite(LicenseDataSource):
+
+    # Sources are listed from highest to lowest priority. A lower source is
+    # only asked about components that every higher source returned without
+    # a license expression, so fallbacks spend no rate budget on answered
+    # components.
+    sources: list[LicenseDataSource]
+
+    def __init__(self, sources: list[LicenseDataSource]) -> None:
+        self.sources = sources
+        self.SOURCE_NAME = "+".join(source.SOURCE_NAME for source in sources)
+
+    async def retrieve(self, component: Component) -> RetrieveLicenseResult:
+        return (await self.retrieve_many([component]))[component.purl]
+
+    async def retrieve_many(
+        self, components: list[Component]
+    ) -> dict[PackageURL, RetrieveLicenseResult]:
+        results_by_purl: dict[PackageURL, list[RetrieveLicenseResult]] = {
+            component.purl: [] for component in components
+        }
+        unanswered = list(
+            {component.purl: component for component in components}.values()
+        )
+        for source in self.sources:
+            if len(unanswered) == 0:
+                break
+            try:
+                source_results = await source.retrieve_many(unanswered)
+            except Exception as e:
+                source_results = {component.purl: e for component in unanswered}
+            for component in unanswered:
+                results_by_purl[component.purl].append(
+                    source_results.get(component.purl)
+                )
+            unanswered = [
+                component
+                for component in unanswered
+                if not self._has_license_expression(source_results.get(component.purl))
+            ]
+        return {
+            purl: self._merge_by_priority(results)
+            for purl, results in results_by_purl.items()
+        }
+
+    @staticmethod
+    def _has_license_expression(result: RetrieveLicenseResult) -> bool:
+        return (
+            isinstance(result, ComponentLicenseDetails)
+            and len(result.license_expressions) > 0
+        )
+
+    @staticmethod
+    def _merge_by_priority(
+        results: list[RetrieveLicenseResult],
+    ) -> RetrieveLicenseResult:
+        license_details = [
+            it for it in results if isinstance(it, ComponentLicenseDetails)
+        ]
+        if len(license_details) > 0:
+            return functools.reduce(ComponentLicenseDetails.merge, license_details)
+        return next((it for it in results if isinstance(it, Exception)), None)
+
+
+# Shares lookups already in flight for the same PURL, so concurrent runs
+# with overlapping dependencies cost one upstream call per package
+class LicenseDataSourceSingleFlight(LicenseDataSource):
+
+    inner: LicenseDataSource
+    shared_lookups: int
+
+    def __init__(self, inner: LicenseDataSource) -> None:
+        self.inner = inner
+        self.SOURCE_NAME = inner.SOURCE_NAME
+        self.shared_lookups = 0
+        self._in_flight: dict[str, asyncio.Future[RetrieveLicenseResult]] = dict()
+        self._fetches: set[asyncio.Task] = set()
+
+    async def retrieve(self, component: Component) -> RetrieveLicenseResult:
+        return (await self.retrieve_many([component]))[component.purl]
+
+    async def retrieve_many(
+        self, components: list[Component]
+    ) -> dict[PackageURL, RetrieveLicenseResult]:
+        lookups: dict[PackageURL, asyncio.Future[RetrieveLicenseResult]] = dict()
+        components_to_fetch: dict[str, Component] = dict()
+        for component in components:
+            key = component.purl.to_string()
+            lookup = self._in_flight.get(key)
+            if lookup is None:
+                lookup = asyncio.get_running_loop().create_future()
+                self._in_flight[key] = lookup
+                components_to_fetch[key] = component
+            elif key not in components_to_fetch:
+                self.shared_lookups += 1
+            lookups[component.purl] = lookup
+
+        if len(components_to_fetch) > 0:
+            # Runs apart from this caller, so a cancelled caller does not
+            # fail the other runs waiting on the same lookups
+            fetch = asyncio.ensure_future(self._fetch(components_to_fetch))
+            self._fetches.add(fetch)
+            fetch.add_done_callback(self._fetches.discard)
+        return {purl: await asyncio.shield(lookup) for purl, lookup in lookups.items()}
+
+    async def _fetch(self, components: dict[str, Component]) -> None:
+        results: dict[PackageURL, RetrieveLicenseResult] = dict()
+        error: Exception | None = None
+        try:
+            results = await self.inner.retrieve_many(list(components.values()))
+        except Exception as e:
+            error = e
+        finally:
+            for key, component in components.items():
+                lookup = self._in_flight.pop(key)
+                if not lookup.done():
+                    lookup.set_result(
+                        error if error is not None else results.get(component.purl)
+                    )
+
 
 class LicenseDataSourceSnyk(LicenseDataSource):
 
     _FETCH_HEADERS = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36"
     }
+    _LICENSE_SPAN_MARKER = "license item list: spdx license expression"
+    _READ_CHUNK_SIZE = 16 * 1024
+
     SOURCE_NAME: str = "SNYK"
+    LICENSE_SOURCE: str = "Snyk"
+    PACKAGE_MANAGERS: dict[str, str] = {
+        "maven": "maven",
+        "npm": "npm",
+        "pypi": "pip",
+        "nuget": "nuget",
+        "golang": "golang",
+        "composer": "composer",
+        "gem": "rubygems",
+        "cargo": "cargo",
+    }
 
-    clientSession: aiohttp.ClientSession
-    request_semaphore: asyncio.Semaphore
+    http_client: ResilientHttpClient
     logger: Logger
+    api_url: str
+    tracer: Tracer
 
     def __init__(
         self,
-        clientSession: aiohttp.ClientSession,
+        http_client: ResilientHttpClient,
         logger: Logger,
-        request_limit_per_second: int = 1,
+        api_url: str = "https://security.snyk.io",
+        tracer: Tracer = NoopTracer(),
     ) -> None:
-        self.clientSession = clientSession
+        self.http_client = http_client
         self.logger = logger
-        self.request_semaphore = asyncio.Semaphore(request_limit_per_second)
+        self.api_url = api_url
+        self.tracer = tracer
 
+    @traced("snyk.retrieve")
     async def retrieve(self, component: Component) -> RetrieveLicenseResult:
-        async with self.request_semaphore:
-            url = self._create_snyk_url(component)
-            self.logger.info(
-                f"Retrieving license details from Snyk: {url}", extra={"url": url}
+        url = self._create_snyk_url(component)
+        if url is None:
+            return None
+        self.logger.info(
+            f"Retrieving license details from Snyk: {url}", extra={"url": url}
+        )
+        try:
+            return await self.http_client.get(
+                url,
+                lambda response: self._read(url, response),
+                accept_statuses=(200, 404),
+                headers=self._FETCH_HEADERS,
             )
-            try:
-                result = await self._fetch(url)
-            except Exception as e:
-                self.logger.error(
-                    f"Retrieving license details from Snyk failed: {url}",
-                    exc_info=True,
-                    extra={"url": url},
-                )
-                return e
-            await asyncio.sleep(1)
-            return result
-
-    async def _fetch(self, url: yarl.URL) -> ComponentLicenseDetails | None:
-        async with self.clientSession.get(url, headers=self._FETCH_HEADERS) as response:
-            if response.status == 404:
-                return None
-
-            if response.status != 200:
-                raise Exception()
-
-            content = await response.text()
-            tree = html.fromstring(content)
-            license_expr = tree.xpath(
-                '//span[@data-snyk-test="license item list: spdx license expression"]'
-            )[0].text_content()
-            if license_expr[0] == "(":
-                license_expr = license_expr[1:]
-            if license_expr[-1] == ")":
-                license_expr = license_expr[:-1]
-
-            return (
-                None
-                if license_expr == "Unknown"
-                else ComponentLicenseDetails(
-                    license_expressions=[(license_expr, self.SOURCE_NAME)]
-                )
+        except Exception as e:
+            self.logger.error(
+                f"Retrieving license details from Snyk failed: {url}",
+                exc_info=True,
+                extra={"url": url},
             )
+            return e
+
+    async def _read(
+        self, url: yarl.URL, response: aiohttp.ClientResponse
+    ) -> ComponentLicenseDetails | None:
+        if response.status == 404:
+            return None
+        license_expr, bytes_read = await self._read_license_expression(
+            response.content.iter_chunked(self._READ_CHUNK_SIZE)
+        )
+        # Leaving the rest of the page unread drops the connection
+        # instead of downloading it just to keep it alive
+        response.close()
+        self.logger.debug(
+            f"Read {bytes_read} bytes of Snyk page: {url}", extra={"url": url}
+        )
+        if license_expr is None:
+            raise Exception("License expression not found on Snyk page")
+        license_expr = license_expr.strip()
+        if license_expr[:1] == "(":
+            license_expr = license_expr[1:]
+        if license_expr[-1:] == ")":
+            license_expr = license_expr[:-1]
 
-    def _create_snyk_url(self, component: Component) -> yarl.URL:
-        identifier = (
-            f"{component.org}%3A{component.name}"
-            if component.package_manager == "maven"
-            else (
-                f"{component.org.replace('@', '%40')}%2F{component.name}"
-                if component.package_manager and component.org != ""
-                else component.name
+        return (
+            None
+            if license_expr in ("", "Unknown")
+            else ComponentLicenseDetails(
+                license_expressions=[(license_expr, self.LICENSE_SOURCE)]
             )
         )
+
+    async def _read_license_expression(
+        self, chunks: AsyncIterator[bytes]
+    ) -> tuple[str | None, int]:
+        # Feeds the page to the parser as it arrives and stops at the first
+        # license span, so the rest of the page is neither read nor parsed
+        parser = etree.HTMLPullParser(events=("end",), tag="span")
+        bytes_read = 0
+        async for chunk in chunks:
+            bytes_read += len(chunk)
+            parser.feed(chunk)
+            for _, element in parser.read_events():
+                if element.get("data-snyk-test") == self._LICENSE_SPAN_MARKER:
+                    return "".join(element.itertext()), bytes_read
+        return None, bytes_read
+
+    def _create_snyk_url(self, component: Component) -> yarl.URL | None:
+        purl = component.purl
+        package_manager = self.PACKAGE_MANAGERS.get(purl.type)
+        if package_manager is None or not purl.version:
+            return None
+        if not purl.namespace:
+            identifier = purl.name
+        elif package_manager == "maven":
+            identifier = f"{purl.namespace}:{purl.name}"
+        else:
+            identifier = f"{purl.namespace}/{purl.name}"
         return yarl.URL(
-            f"https://security.snyk.io/package/{component.package_manager}/{identifier}/{component.version}",
+            "/".join(
+                [
+                    self.api_url,
+                    "package",
+                    package_manager,
+                    urllib.parse.quote(identifier, safe=[]),
+                    urllib.parse.quote(purl.version, safe=[]),
+                ]
+            ),
             encoded=True,
         )
 
@@ -106,116 +291,241 @@ class LicenseDataSourceSnyk(LicenseDataSource):
 class LicenseDataSourceClearlyDefined(LicenseDataSource):
 
     SOURCE_NAME: str = "CLEARLY_DEFINED"
-    clientSession: aiohttp.ClientSession
-    request_semaphore: asyncio.Semaphore
+    PROVIDERS: dict[str, str] = {"maven": "mavencentral", "npm": "npmjs"}
+
+    LICENSE_SOURCES: set[str] = {
+        "ClearlyDefined Declared",
+        "ClearlyDefined Discovered",
+    }
+
+    http_client: ResilientHttpClient
     logger: Logger
+    definition_store: DefinitionStore | None
+    api_url: str
+    batch_size: int
+    tracer: Tracer
 
     def __init__(
         self,
-        clientSession: aiohttp.ClientSession,
+        http_client: ResilientHttpClient,
         logger: Logger,
-        request_limit_per_second: int = 4,
+        definition_store: DefinitionStore | None = None,
+        api_url: str = "https://api.clearlydefined.io",
+        batch_size: int = 100,
+        tracer: Tracer = NoopTracer(),
     ) -> None:
-        self.clientSession = clientSession
+        self.http_client = http_client
         self.logger = logger
-        self.request_semaphore = asyncio.Semaphore(request_limit_per_second)
+        self.definition_store = definition_store
+        self.api_url = api_url
+        self.batch_size = batch_size
+        self.tracer = tracer
 
+    @traced("clearly_defined.retrieve")
     async def retrieve(self, component: Component) -> RetrieveLicenseResult:
-        async with self.request_semaphore:
-            url = self._create_clearlydefined_url(component)
-            self.logger.info(
-                f"Retrieving license details from ClearlyDefined: {url}",
+        url = self._create_definition_url(component)
+        if url is None:
+            return None
+        self.logger.info(
+            f"Retrieving license details from ClearlyDefined: {url}",
+            extra={"url": url},
+        )
+        try:
+            definition = await self.http_client.get(
+                url, self._read_definition, accept_statuses=(200, 404)
+            )
+        except Exception as e:
+            self.logger.error(
+                f"Retrieving license details from ClearlyDefined failed: {url}",
+                exc_info=True,
                 extra={"url": url},
             )
-            try:
-                result = await self._fetch(url)
-            except Exception as e:
-                self.logger.error(
-                    f"Retrieving license details from ClearlyDefined failed: {url}",
-                    exc_info=True,
-                    extra={"url": url},
+            return e
+        if definition is None:
+            return None
+        self._store_definitions({component.purl: definition})
+        return self.parse_definition(definition)
+
+    async def retrieve_many(
+        self, components: list[Component]
+    ) -> dict[PackageURL, RetrieveLicenseResult]:
+        results: dict[PackageURL, RetrieveLicenseResult] = dict()
+        coordinates_by_purl: dict[PackageURL, str] = dict()
+        for component in components:
+            coordinates = self._create_coordinates(component)
+            if coordinates is None:
+                results[component.purl] = None
+            else:
+                coordinates_by_purl[component.purl] = coordinates
+
+        purls = list(coordinates_by_purl.keys())
+        batches = [
+            purls[i : i + self.batch_size]
+            for i in range(0, len(purls), self.batch_size)
+        ]
+        batch_results = await asyncio.gather(
+            *[
+                self._retrieve_batch(
+                    list(dict.fromkeys(coordinates_by_purl[purl] for purl in batch))
                 )
-                return e
-            await asyncio.sleep(1)
-            return result
-
-    async def _fetch(self, url: str) -> ComponentLicenseDetails | None:
-        async with self.clientSession.get(url) as response:
-            if response.status == 404:
-                return None
-            if response.status != 200:
-                raise Exception()
-
-            content = await response.json()
-            declared_license, license_expressions, attributions, source_url = (
-                self.try_index_key(content, "licensed", "declared"),
-                self.try_index_key(
-                    content, "licensed", "facets", "core", "discovered", "expressions"
-                ),
-                self.try_index_key(
-                    content, "licensed", "facets", "core", "attribution", "parties"
-                ),
-                self.try_index_key(content, "described", "sourceLocation", "url"),
+                for batch in batches
+            ]
+        )
+        definitions: dict[PackageURL, dict] = dict()
+        for batch, batch_result in zip(batches, batch_results):
+            for purl in batch:
+                if isinstance(batch_result, Exception):
+                    results[purl] = batch_result
+                    continue
+                definition = batch_result.get(coordinates_by_purl[purl])
+                if definition:
+                    definitions[purl] = definition
+                results[purl] = self.parse_definition(definition or {})
+        self._store_definitions(definitions)
+        return results
+
+    @traced("clearly_defined.retrieve_batch")
+    async def _retrieve_batch(
+        self, coordinates: list[str]
+    ) -> dict[str, dict] | RetrieveLicenseError:
+        url = f"{self.api_url}/definitions"
+        self.logger.info(
+            f"Retrieving license details for {len(coordinates)} components from ClearlyDefined: {url}",
+            extra={"url": url},
+        )
+        try:
+            # Looking definitions up changes nothing, so the POST is safe to retry
+            return await self.http_client.post(
+                url,
+                lambda response: self._read_definitions(response, coordinates),
+                idempotent=True,
+                json=coordinates,
             )
-            license_expressions = (
-                [(declared_license, "ClearlyDefined Declared")]
-                if type(declared_license) == str
-                else []
-            ) + (
-                [(expr, "ClearlyDefined Discovered") for expr in license_expressions]
-                if type(license_expressions) == list
-                else []
+        except Exception as e:
+            self.logger.error(
+                f"Retrieving license details for {len(coordinates)} components from ClearlyDefined failed: {url}",
+                exc_info=True,
+                extra={"url": url},
             )
-            attributions = (
-                []
-                if not type(attributions) == list
-                else [(attr, "ClearlyDefined Discovered") for attr in attributions]
+            return e
+
+    async def _read_definition(self, response: aiohttp.ClientResponse) -> dict | None:
+        if response.status == 404:
+            return None
+        return await response.json()
+
+    async def _read_definitions(
+        self, response: aiohttp.ClientResponse, coordinates: list[str]
+    ) -> dict[str, dict]:
+        content: dict = await response.json()
+        # ClearlyDefined may echo coordinates back in normalised casing
+        definitions_by_lowercase = {
+            key.lower(): definition for key, definition in content.items()
+        }
+        return {
+            it: (
+                content[it]
+                if it in content
+                else definitions_by_lowercase.get(it.lower(), {})
             )
-            source_urls = (
-                []
-                if not type(source_url) == str
-                else [(source_url, "ClearlyDefined Discovered")]
+            for it in coordinates
+        }
+
+    def _store_definitions(self, definitions: dict[PackageURL, dict]) -> None:
+        if self.definition_store is None or len(definitions) == 0:
+            return
+        try:
+            self.definition_store.store_definitions(definitions)
+        except Exception:
+            # The parsed details are still usable without the raw copy
+            self.logger.warning(
+                f"Storing {len(definitions)} ClearlyDefined definitions failed",
+                exc_info=True,
             )
 
-            return (
-                None
-                if all(
-                    [
-                        len(license_expressions) == 0,
-                        len(attributions) == 0,
-                        len(source_urls) == 0,
-                    ]
-                )
-                else ComponentLicenseDetails(
-                    license_expressions=license_expressions,
-                    attributions=attributions,
-                    source_urls=source_urls,
-                )
+    # Needs no network access, so stored definitions can be parsed offline
+    @classmethod
+    def parse_definition(cls, content: dict) -> ComponentLicenseDetails | None:
+        declared_license, license_expressions, attributions, source_url = (
+            cls.try_index_key(content, "licensed", "declared"),
+            cls.try_index_key(
+                content, "licensed", "facets", "core", "discovered", "expressions"
+            ),
+            cls.try_index_key(
+                content, "licensed", "facets", "core", "attribution", "parties"
+            ),
+            cls.try_index_key(content, "described", "sourceLocation", "url"),
+        )
+        license_expressions = (
+            [(declared_license, "ClearlyDefined Declared")]
+            if type(declared_license) == str
+            else []
+        ) + (
+            [(expr, "ClearlyDefined Discovered") for expr in license_expressions]
+            if type(license_expressions) == list
+            else []
+        )
+        attributions = (
+            []
+            if not type(attributions) == list
+            else [(attr, "ClearlyDefined Discovered") for attr in attributions]
+        )
+        source_urls = (
+            []
+            if not type(source_url) == str
+            else [(source_url, "ClearlyDefined Discovered")]
+        )
+
+        return (
+            None
+            if all(
+                [
+                    len(license_expressions) == 0,
+                    len(attributions) == 0,
+                    len(source_urls) == 0,
+                ]
+            )
+            else ComponentLicenseDetails(
+                license_expressions=license_expressions,
+                attributions=attributions,
+                source_urls=source_urls,
             )
+        )
 
-    def _create_clearlydefined_url(self, component: Component):
-        providers: dict[str, str] = {"maven": "mavencentral", "npm": "npmjs"}
-        return "/".join(
-            [
-                "https://api.clearlydefined.io/definitions",
-                *[
-                    urllib.parse.quote(it, safe=[])
-                    for it in [
-                        component.purl.type,
-                        providers[component.purl.type],
-                        (
-                            component.purl.namespace
-                            if component.purl.namespace != ""
-                            else "-"
-                        ),
-                        component.purl.name,
-                        component.purl.version,
-                    ]
-                ],
-            ]
+    # Coordinates in a batch body are read literally, e.g. an npm scope stays
+    # "@babel"; only the single-definition URL percent-encodes them
+    def _create_coordinates(self, component: Component) -> str | None:
+        coordinate_parts = self._create_coordinate_parts(component)
+        return None if coordinate_parts is None else "/".join(coordinate_parts)
+
+    def _create_definition_url(self, component: Component) -> yarl.URL | None:
+        coordinate_parts = self._create_coordinate_parts(component)
+        if coordinate_parts is None:
+            return None
+        return yarl.URL(
+            "/".join(
+                [
+                    self.api_url,
+                    "definitions",
+                    *[urllib.parse.quote(it, safe=[]) for it in coordinate_parts],
+                ]
+            ),
+            encoded=True,
         )
 
-    def try_index_key(self, obj, *path, default=None):
+    def _create_coordinate_parts(self, component: Component) -> list[str] | None:
+        if component.purl.type not in self.PROVIDERS or not component.purl.version:
+            return None
+        return [
+            component.purl.type,
+            self.PROVIDERS[component.purl.type],
+            (component.purl.namespace if component.purl.namespace else "-"),
+            component.purl.name,
+            component.purl.version,
+        ]
+
+    @staticmethod
+    def try_index_key(obj, *path, default=None):
         res = obj
         for key in path:
             if key in res:
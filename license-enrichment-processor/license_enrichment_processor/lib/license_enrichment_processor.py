@@ -1,16 +1,33 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from collections.abc import Awaitable, Callable, Coroutine
+from typing import Any, TypeVar
 import dataclasses
 import datetime
 import asyncio
+import time
+import uuid
 from logging import Logger
 from .dependency_track import DependencyTrack
 from .components_cache import ComponentsCache
 from .retry_memory import RetryMemory
+from .negative_cache import NegativeCache
 from .sbom import Component, ComponentLicenseDetails
 from .date import DatetimeProvider
 from .license_data_source import LicenseDataSource
+from .concurrency import AdaptiveConcurrencyLimiter
+from .metrics import BoundMetric, MetricsRegistry
+from .project_state import (
+    ProjectComponentRows,
+    ProjectFingerprint,
+    ProjectStateStore,
+    project_digest,
+)
+from .run_report import EnrichmentRunReport, RunReportStore
+from .tracing import NoopTracer, Tracer
 from packageurl import PackageURL
 
+T = TypeVar("T")
+
 
 @dataclass
 class BomProcessedEvent:
@@ -26,138 +43,646 @@ class BomProcessedEvent:
     project: Project
 
 
+@dataclass
+class EnrichmentRunStats:
+    components: int = 0
+    components_with_purl: int = 0
+    unchanged: int = 0
+    cache_hits: int = 0
+    known_not_found: int = 0
+    on_cooldown: int = 0
+    fetched: int = 0
+    not_found: int = 0
+    fetch_failed: int = 0
+    updated: int = 0
+    update_skipped: int = 0
+    update_failed: int = 0
+    update_errors: list[tuple[str, str]] = field(default_factory=list)
+    stage_seconds: dict[str, float] = field(default_factory=dict)
+
+    MAX_RECORDED_ERRORS = 100
+
+    def record_update_failure(self, component_uuid: str, error: Exception) -> None:
+        self.update_failed += 1
+        if len(self.update_errors) < self.MAX_RECORDED_ERRORS:
+            self.update_errors.append((component_uuid, repr(error)))
+
+    def to_dict(self) -> dict:
+        return {
+            "components": self.components,
+            "componentsWithPurl": self.components_with_purl,
+            "unchanged": self.unchanged,
+            "cacheHits": self.cache_hits,
+            "knownNotFound": self.known_not_found,
+            "onCooldown": self.on_cooldown,
+            "fetched": self.fetched,
+            "notFound": self.not_found,
+            "fetchFailed": self.fetch_failed,
+            "updated": self.updated,
+            "updateSkipped": self.update_skipped,
+            "updateFailed": self.update_failed,
+            "updateErrors": [
+                {"component": component_uuid, "error": error}
+                for component_uuid, error in self.update_errors
+            ],
+            "stageSeconds": self.stage_seconds,
+        }
+
+
+# Marks the end of a stage's output on the queue it feeds
+_END_OF_STREAM = None
+
+LicensedComponent = tuple[Component, ComponentLicenseDetails]
+
+_LONG_DURATION_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+
+# Keeps a gauge in step with the number of batches waiting in the queue
+class _MeteredQueue(asyncio.Queue):
+    def __init__(self, maxsize: int, depth: BoundMetric) -> None:
+        super().__init__(maxsize)
+        self._depth = depth
+
+    def _put(self, item) -> None:
+        super()._put(item)
+        self._depth.inc()
+
+    def _get(self):
+        self._depth.dec()
+        return super()._get()
+
+    def discard(self) -> None:
+        while not self.empty():
+            self.get_nowait()
+
+
 class LicenseEnrichmentProcessor:
     dependency_track: DependencyTrack
     components_cache: ComponentsCache
     retry_memory: RetryMemory
+    negative_cache: NegativeCache
     datetime_provider: DatetimeProvider
     license_data_source: LicenseDataSource
-    fetch_cooldown: datetime.timedelta
+    not_found_ttl: datetime.timedelta
     logger: Logger
+    update_limiter: AdaptiveConcurrencyLimiter
+    project_state: ProjectStateStore | None
+    project_state_max_age: datetime.timedelta
+    run_reports: RunReportStore | None
+    tracer: Tracer
+    pipeline_queue_size: int
+    fetch_workers: int
+    cache_flush_size: int
 
     def __init__(
         self,
         dependency_track: DependencyTrack,
         components_cache: ComponentsCache,
         retry_memory: RetryMemory,
+        negative_cache: NegativeCache,
         license_data_source: LicenseDataSource,
         datetime_provider: DatetimeProvider,
-        fetch_cooldown: datetime.timedelta,
+        not_found_ttl: datetime.timedelta,
         logger: Logger,
+        update_limiter: AdaptiveConcurrencyLimiter,
+        project_state: ProjectStateStore | None = None,
+        project_state_max_age: datetime.timedelta = datetime.timedelta(days=1),
+        run_reports: RunReportStore | None = None,
+        tracer: Tracer = NoopTracer(),
+        pipeline_queue_size: int = 4,
+        fetch_workers: int = 2,
+        cache_flush_size: int = 200,
+        metrics: MetricsRegistry | None = None,
     ):
         self.dependency_track = dependency_track
         self.components_cache = components_cache
         self.retry_memory = retry_memory
+        self.negative_cache = negative_cache
         self.datetime_provider = datetime_provider
-        self.fetch_cooldown = fetch_cooldown
+        self.not_found_ttl = not_found_ttl
         self.license_data_source = license_data_source
         self.logger = logger
-
-    async def enrich_from_bom_processed_event(self, event: BomProcessedEvent):
-        datetime_enrichment_started = self.datetime_provider.now()
-        self.logger.info(f"Enriching from event: {event.content}")
-        project_components = await self.dependency_track.get_components(
-            event.project.uuid
+        self.update_limiter = update_limiter
+        self.project_state = project_state
+        self.project_state_max_age = project_state_max_age
+        self.run_reports = run_reports
+        self.tracer = tracer
+        self.pipeline_queue_size = pipeline_queue_size
+        self.fetch_workers = fetch_workers
+        self.cache_flush_size = cache_flush_size
+        metrics = metrics if metrics is not None else MetricsRegistry()
+        self._cache_lookups = metrics.counter(
+            "license_enrichment_cache_lookups_total",
+            "Components looked up in the license cache, by result",
+            ["result"],
         )
-        self.logger.info(
-            f"Found {len(project_components)} components for project '{event.project.name}'"
+        self._components_processed = metrics.counter(
+            "license_enrichment_components_total",
+            "Components handled by enrichment runs, by outcome",
+            ["outcome"],
         )
-        project_components_with_purl = [
-            component for component in project_components if component.purl
-        ]
-        self.logger.info(
-            f"{len(project_components_with_purl)}/{len(project_components)} have PURLs and can be processed"
+        self._run_components = metrics.histogram(
+            "license_enrichment_run_components",
+            "Components with PURLs per enrichment run",
+            buckets=(10, 50, 100, 250, 500, 1000, 2500, 5000, 10000),
         )
-        project_components_with_purl_by_purl = {
-            component.purl: component
-            for component in project_components
-            if component.purl
-        }
-        cached_license_details = self.components_cache.get_components(
-            [component.purl for component in project_components_with_purl]
+        self._run_duration = metrics.histogram(
+            "license_enrichment_run_duration_seconds",
+            "Time taken by enrichment runs",
+            buckets=_LONG_DURATION_BUCKETS,
         )
-        self.logger.info(
-            f"Using cache for {len(cached_license_details)}/{len(project_components_with_purl)} components"
-        )
-        components_not_in_cache = [
-            component
-            for component in project_components_with_purl
-            if component.purl not in cached_license_details
-        ]
-        retry_memories: dict[PackageURL, datetime.datetime | None] = {
-            component.purl: self.retry_memory.recall(component.purl)
-            for component in components_not_in_cache
-        }
-
-        components_to_fetch = [
-            component
-            for component in components_not_in_cache
-            if retry_memories[component.purl] is None
-            or retry_memories[component.purl] - datetime_enrichment_started
-            > self.fetch_cooldown
-        ]
-        self.logger.info(
-            f"{len(components_to_fetch)}/{len(components_not_in_cache)} missing components are not on cooldown and will be fetched"
+        self._stage_duration = metrics.histogram(
+            "license_enrichment_stage_duration_seconds",
+            "Time each pipeline stage of an enrichment run was active",
+            ["stage"],
+            buckets=_LONG_DURATION_BUCKETS,
+        )
+        self._update_duration = metrics.histogram(
+            "license_enrichment_dependency_track_update_duration_seconds",
+            "Time taken to update a component's license in Dependency-Track",
+            ["outcome"],
+        )
+        self._queue_depth = metrics.gauge(
+            "license_enrichment_pipeline_queue_depth",
+            "Batches waiting between pipeline stages, over all running enrichments",
+            ["queue"],
         )
 
-        async def fetch_component(component: Component):
-            result = await self.license_data_source.retrieve(component)
-            return component.purl, result
+    async def enrich_from_bom_processed_event(
+        self, event: BomProcessedEvent
+    ) -> EnrichmentRunStats:
+        stats = EnrichmentRunStats()
+        datetime_enrichment_started = self.datetime_provider.now()
+        error: Exception | None = None
+        with self.tracer.span(
+            "enrichment.run",
+            {"project.uuid": event.project.uuid, "project.name": event.project.name},
+        ) as span:
+            try:
+                await self._enrich(event, stats, datetime_enrichment_started)
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                for key, value in stats.to_dict().items():
+                    if isinstance(value, int):
+                        span.set_attribute(f"enrichment.{key}", value)
+                self._save_run_report(event, stats, datetime_enrichment_started, error)
+        return stats
 
-        fetch_components_result = await asyncio.gather(
-            *[fetch_component(component) for component in components_to_fetch]
+    async def _enrich(
+        self,
+        event: BomProcessedEvent,
+        stats: EnrichmentRunStats,
+        datetime_enrichment_started: datetime.datetime,
+    ) -> None:
+        started = time.monotonic()
+        self.logger.info(f"Enriching from event: {event.content}")
+        fingerprint = self._load_fingerprint(
+            event.project.uuid, datetime_enrichment_started
         )
+        # What Dependency-Track holds after this run, for components that
+        # need no more work until the next full run: updated, already right,
+        # or settled as having no data. Failed and backing-off components are
+        # left out so the next run retries them.
+        project_rows: ProjectComponentRows = dict()
 
-        failed_results: list[PackageURL] = [
-            purl
-            for purl, result in fetch_components_result
-            if not isinstance(result, ComponentLicenseDetails)
-        ]
-        for purl in failed_results:
-            self.retry_memory.remember(purl, datetime_enrichment_started)
+        def settle(component: Component) -> None:
+            project_rows[component.uuid] = (
+                component.purl.to_string(),
+                self._existing_license_expression(component),
+            )
 
-        successful_results: list[tuple[PackageURL, ComponentLicenseDetails]] = [
-            (purl, result)
-            for purl, result in fetch_components_result
-            if isinstance(result, ComponentLicenseDetails)
-        ]
-        self.logger.info(
-            f"License data for {len(successful_results)}/{len(components_to_fetch)} components successfully fetched"
+        # Batches flow list -> look up -> fetch -> persist -> update; cache
+        # hits skip straight from look up to update. Bounded queues make a
+        # fast stage wait for a slow one instead of buffering the project.
+        lookup_queue: _MeteredQueue[list[Component] | None] = self._queue("look_up")
+        fetch_queue: _MeteredQueue[list[Component] | None] = self._queue("fetch")
+        persist_queue: _MeteredQueue[list[LicensedComponent] | None] = self._queue(
+            "persist"
+        )
+        update_queue: _MeteredQueue[list[LicensedComponent] | None] = self._queue(
+            "update"
         )
 
-        enriched_components = [
-            dataclasses.replace(
-                project_components_with_purl_by_purl[purl],
-                license_details=license_details_result,
+        async def compare_and_queue(
+            components: list[Component],
+            listed_rows: ProjectComponentRows,
+            previous_rows: ProjectComponentRows,
+        ) -> None:
+            changed_components = []
+            for component in components:
+                row = listed_rows[component.uuid]
+                if previous_rows.get(component.uuid) == row:
+                    project_rows[component.uuid] = row
+                else:
+                    changed_components.append(component)
+            stats.unchanged += len(components) - len(changed_components)
+            if len(changed_components) > 0:
+                await lookup_queue.put(changed_components)
+
+        async def list_components() -> None:
+            # Pages are held back while a fresh fingerprint may still show the
+            # whole project unchanged, and go straight on otherwise
+            held_pages: list[list[Component]] | None = (
+                None if fingerprint is None else []
             )
-            for purl, license_details_result in successful_results
-        ]
-        self.components_cache.cache_components(enriched_components)
+            listed_rows: ProjectComponentRows = dict()
+            previous_rows: ProjectComponentRows = dict()
+
+            async def release_held_pages() -> None:
+                nonlocal held_pages, previous_rows
+                previous_rows = self.project_state.get_components(event.project.uuid)
+                for components in held_pages:
+                    await compare_and_queue(components, listed_rows, previous_rows)
+                held_pages = None
+
+            async for page in self.dependency_track.iter_components(event.project.uuid):
+                components_with_purl = [
+                    component for component in page if component.purl
+                ]
+                for component in components_with_purl:
+                    listed_rows[component.uuid] = (
+                        component.purl.to_string(),
+                        self._existing_license_expression(component),
+                    )
+                stats.components += len(page)
+                stats.components_with_purl += len(components_with_purl)
+                if held_pages is None:
+                    await compare_and_queue(
+                        components_with_purl, listed_rows, previous_rows
+                    )
+                    continue
+                held_pages.append(components_with_purl)
+                # More components than the snapshot holds, so no digest match
+                if len(listed_rows) > fingerprint.component_count:
+                    await release_held_pages()
+            if held_pages is None:
+                return
+            if project_digest(listed_rows) == fingerprint.digest:
+                project_rows.update(listed_rows)
+                stats.unchanged += len(listed_rows)
+                return
+            await release_held_pages()
 
-        components_to_update = [
-            *[
-                dataclasses.replace(
-                    project_components_with_purl_by_purl[purl],
-                    license_details=license_details,
+        async def look_up(components: list[Component]) -> None:
+            cached_license_details = self.components_cache.get_components(
+                [component.purl for component in components]
+            )
+            cached_components = [
+                (component, cached_license_details[component.purl])
+                for component in components
+                if component.purl in cached_license_details
+            ]
+            components_not_in_cache = [
+                component
+                for component in components
+                if component.purl not in cached_license_details
+            ]
+            components_not_found = self.negative_cache.recall_many(
+                [component.purl for component in components_not_in_cache],
+                since=datetime_enrichment_started - self.not_found_ttl,
+            )
+            components_not_known_missing = []
+            for component in components_not_in_cache:
+                if component.purl in components_not_found:
+                    settle(component)
+                else:
+                    components_not_known_missing.append(component)
+            components_on_cooldown = self.retry_memory.recall_many(
+                [component.purl for component in components_not_known_missing],
+                now=datetime_enrichment_started,
+            )
+            components_to_fetch = [
+                component
+                for component in components_not_known_missing
+                if component.purl not in components_on_cooldown
+            ]
+            stats.cache_hits += len(cached_components)
+            self._cache_lookups.labels("hit").inc(len(cached_components))
+            self._cache_lookups.labels("miss").inc(len(components_not_in_cache))
+            stats.known_not_found += len(components_not_in_cache) - len(
+                components_not_known_missing
+            )
+            stats.on_cooldown += len(components_not_known_missing) - len(
+                components_to_fetch
+            )
+            if len(cached_components) > 0:
+                await update_queue.put(cached_components)
+            if len(components_to_fetch) > 0:
+                await fetch_queue.put(components_to_fetch)
+
+        async def fetch(components: list[Component]) -> None:
+            results = await self.license_data_source.retrieve_many(components)
+            # A missing result counts as an error: nothing definitive was said
+            failed_purls: list[PackageURL] = [
+                component.purl
+                for component in components
+                if component.purl not in results
+                or isinstance(results[component.purl], Exception)
+            ]
+            not_found_components = [
+                component
+                for component in components
+                if component.purl in results and results[component.purl] is None
+            ]
+            not_found_purls: list[PackageURL] = [
+                component.purl for component in not_found_components
+            ]
+            for component in not_found_components:
+                settle(component)
+            fetched_components = [
+                (component, results[component.purl])
+                for component in components
+                if isinstance(results.get(component.purl), ComponentLicenseDetails)
+            ]
+            self.retry_memory.remember_many(failed_purls, datetime_enrichment_started)
+            self.negative_cache.remember_many(
+                not_found_purls, datetime_enrichment_started
+            )
+            self.retry_memory.forget_many(
+                not_found_purls
+                + [component.purl for component, _ in fetched_components]
+            )
+            stats.fetched += len(fetched_components)
+            stats.not_found += len(not_found_purls)
+            stats.fetch_failed += len(failed_purls)
+            if len(fetched_components) > 0:
+                await persist_queue.put(fetched_components)
+
+        unflushed_components: list[Component] = []
+
+        def flush(minimum: int) -> None:
+            while len(unflushed_components) >= max(minimum, 1):
+                chunk = unflushed_components[: self.cache_flush_size]
+                del unflushed_components[: self.cache_flush_size]
+                self.components_cache.cache_components(chunk)
+
+        async def persist(fetched_components: list[LicensedComponent]) -> None:
+            unflushed_components.extend(
+                dataclasses.replace(component, license_details=license_details)
+                for component, license_details in fetched_components
+            )
+            flush(minimum=self.cache_flush_size)
+            await update_queue.put(fetched_components)
+
+        async def persist_all() -> None:
+            await self._consume(persist_queue, persist)
+            flush(minimum=1)
+
+        update_tasks: set[asyncio.Task] = set()
+
+        # Runs an update in a slot already taken from update_limiter
+        def start_update(component: Component, license_expression: str) -> None:
+            started = False
+
+            async def update_and_record() -> None:
+                nonlocal started
+                started = True
+                if await self._update_component(component, license_expression, stats):
+                    project_rows[component.uuid] = (
+                        component.purl.to_string(),
+                        license_expression,
+                    )
+
+            def finish(task: asyncio.Task) -> None:
+                update_tasks.discard(task)
+                # Cancelled before it ran, the task never reached the release
+                # in _update_component
+                if not started:
+                    self.update_limiter.give_back()
+
+            task = asyncio.ensure_future(update_and_record())
+            update_tasks.add(task)
+            task.add_done_callback(finish)
+
+        async def update(licensed_components: list[LicensedComponent]) -> None:
+            pending_updates = []
+            for component, license_details in licensed_components:
+                existing_license_expression = self._existing_license_expression(
+                    component
                 )
-                for purl, license_details in cached_license_details.items()
-            ],
-            *enriched_components,
-        ]
-
-        await asyncio.gather(
-            *[
-                self.dependency_track.update_component_license_expression(
-                    component.uuid,
-                    self._select_license_expression(component.license_details),
+                license_expression = (
+                    self._select_license_expression(license_details)
+                    if len(license_details.license_expressions) > 0
+                    else None
                 )
-                for component in components_to_update
-                if len(component.license_details.license_expressions) > 0
-            ]
+                if license_expression is None:
+                    pass
+                elif license_expression == existing_license_expression:
+                    stats.update_skipped += 1
+                else:
+                    pending_updates.append((component, license_expression))
+                    continue
+                settle(component)
+            for component, license_expression in pending_updates:
+                # Waiting for a slot here holds back the stages feeding this one
+                await self.update_limiter.acquire()
+                start_update(component, license_expression)
+
+        async def write_back() -> None:
+            try:
+                await self._consume(update_queue, update, producers=2)
+                await asyncio.gather(*update_tasks)
+            finally:
+                for task in update_tasks:
+                    task.cancel()
+
+        try:
+            await self._run_pipeline(
+                self._stage("list", list_components(), [lookup_queue], stats),
+                self._stage(
+                    "look_up",
+                    self._consume(lookup_queue, look_up),
+                    [fetch_queue, update_queue],
+                    stats,
+                ),
+                self._stage(
+                    "fetch",
+                    self._consume(fetch_queue, fetch, workers=self.fetch_workers),
+                    [persist_queue],
+                    stats,
+                ),
+                self._stage("persist", persist_all(), [update_queue], stats),
+                self._stage("update", write_back(), [], stats),
+            )
+        finally:
+            # Batches left behind by a failed run no longer count as waiting
+            for queue in (lookup_queue, fetch_queue, persist_queue, update_queue):
+                queue.discard()
+        if self.project_state is not None:
+            self.project_state.save_snapshot(
+                event.project.uuid,
+                project_rows,
+                datetime_enrichment_started,
+                full_run_at=(
+                    datetime_enrichment_started
+                    if fingerprint is None
+                    else fingerprint.full_run_at
+                ),
+            )
+
+        self.logger.info(
+            f"Found {stats.components} components for project '{event.project.name}', {stats.components_with_purl} have PURLs and can be processed, {stats.unchanged} unchanged since the last run"
         )
         self.logger.info(
-            f"Updated {len(components_to_update)} components in project '{event.project.name}'"
+            f"Used cache for {stats.cache_hits}/{stats.components_with_purl} components, {stats.known_not_found} missing components are known to have no data, {stats.on_cooldown} are backing off after errors"
         )
+        self.logger.info(
+            f"License data for {stats.fetched}/{stats.fetched + stats.not_found + stats.fetch_failed} components successfully fetched, {stats.not_found} not found, {stats.fetch_failed} failed"
+        )
+        self.logger.info(
+            f"Updated {stats.updated} components in project '{event.project.name}', {stats.update_skipped} already had the selected license, {stats.update_failed} failed"
+        )
+        self._record_run_metrics(stats, time.monotonic() - started)
+
+    def _save_run_report(
+        self,
+        event: BomProcessedEvent,
+        stats: EnrichmentRunStats,
+        started_at: datetime.datetime,
+        error: Exception | None,
+    ) -> None:
+        if self.run_reports is None:
+            return
+        report = EnrichmentRunReport(
+            id=str(uuid.uuid4()),
+            project_uuid=event.project.uuid,
+            project_name=event.project.name,
+            project_version=event.project.version,
+            started_at=started_at,
+            finished_at=self.datetime_provider.now(),
+            succeeded=error is None,
+            stats=stats.to_dict(),
+            error=repr(error) if error is not None else None,
+        )
+        try:
+            self.run_reports.save_run(report)
+        except Exception:
+            # The run's own outcome matters more than its report
+            self.logger.warning(
+                f"Saving report of enrichment run {report.id} failed", exc_info=True
+            )
+
+    async def _update_component(
+        self,
+        component: Component,
+        license_expression: str,
+        stats: EnrichmentRunStats,
+    ) -> bool:
+        started = time.monotonic()
+        failed = False
+        try:
+            await self.dependency_track.update_component_license_expression(
+                component.uuid, license_expression, component.payload
+            )
+            stats.updated += 1
+            return True
+        except Exception as e:
+            failed = True
+            stats.record_update_failure(component.uuid, e)
+            self.logger.warning(
+                f"Updating license of component {component.uuid} failed",
+                exc_info=True,
+            )
+            return False
+        finally:
+            duration = time.monotonic() - started
+            self.update_limiter.release(duration, failed)
+            self._update_duration.labels("failure" if failed else "success").observe(
+                duration
+            )
+
+    def _record_run_metrics(
+        self, stats: EnrichmentRunStats, duration_seconds: float
+    ) -> None:
+        for outcome, count in (
+            ("unchanged", stats.unchanged),
+            ("cache_hit", stats.cache_hits),
+            ("known_not_found", stats.known_not_found),
+            ("on_cooldown", stats.on_cooldown),
+            ("fetched", stats.fetched),
+            ("not_found", stats.not_found),
+            ("fetch_failed", stats.fetch_failed),
+            ("updated", stats.updated),
+            ("update_skipped", stats.update_skipped),
+            ("update_failed", stats.update_failed),
+        ):
+            self._components_processed.labels(outcome).inc(count)
+        self._run_components.observe(stats.components_with_purl)
+        self._run_duration.observe(duration_seconds)
+
+    def _queue(self, name: str) -> _MeteredQueue:
+        return _MeteredQueue(self.pipeline_queue_size, self._queue_depth.labels(name))
+
+    def _load_fingerprint(
+        self, project_uuid: str, now: datetime.datetime
+    ) -> ProjectFingerprint | None:
+        if self.project_state is None:
+            return None
+        fingerprint = self.project_state.get_fingerprint(project_uuid)
+        # An old snapshot may hide license data that changed in the cache
+        # since, so the whole project is processed again. Only full runs
+        # count: incremental ones skip exactly those components.
+        if (
+            fingerprint is None
+            or now - fingerprint.full_run_at > self.project_state_max_age
+        ):
+            return None
+        return fingerprint
+
+    async def _run_pipeline(self, *stages: Coroutine[Any, Any, None]) -> None:
+        tasks = [asyncio.ensure_future(stage) for stage in stages]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # A failed stage would leave its neighbours blocked on a queue
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    async def _stage(
+        self,
+        name: str,
+        work: Coroutine[Any, Any, None],
+        outboxes: list[asyncio.Queue],
+        stats: EnrichmentRunStats,
+    ) -> None:
+        started = time.monotonic()
+        try:
+            with self.tracer.span(f"enrichment.stage.{name}"):
+                await work
+        finally:
+            duration = time.monotonic() - started
+            stats.stage_seconds[name] = round(duration, 3)
+            self._stage_duration.labels(name).observe(duration)
+        for outbox in outboxes:
+            await outbox.put(_END_OF_STREAM)
+
+    async def _consume(
+        self,
+        inbox: asyncio.Queue[T | None],
+        handle: Callable[[T], Awaitable[None]],
+        producers: int = 1,
+        workers: int = 1,
+    ) -> None:
+        remaining_producers = producers
+
+        async def work() -> None:
+            nonlocal remaining_producers
+            while True:
+                batch = await inbox.get()
+                if batch is not _END_OF_STREAM:
+                    await handle(batch)
+                    continue
+                remaining_producers -= 1
+                if remaining_producers <= 0:
+                    # Pass the end marker on so sibling workers stop as well
+                    await inbox.put(_END_OF_STREAM)
+                    return
+
+        await asyncio.gather(*[work() for _ in range(workers)])
 
     SOURCE_PRIORITY_ORDER = {
         source_name: i
@@ -181,3 +706,13 @@ class LicenseEnrichmentProcessor:
             )
 
         return max(license_details.license_expressions, key=sort_key, default=None)[0]
+
+    def _existing_license_expression(self, component: Component) -> str | None:
+        return next(
+            (
+                expr
+                for expr, source in component.license_details.license_expressions
+                if source == DependencyTrack.SOURCE_NAME
+            ),
+            None,
+        )
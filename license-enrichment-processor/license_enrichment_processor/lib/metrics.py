@@ -0,0 +1,231 @@
+from collections.abc import Callable, Iterator, Sequence
+import bisect
+import math
+import threading
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class _CounterChild:
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        yield "", {}, self.value
+
+
+class _GaugeChild:
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.value -= amount
+
+    def samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        yield "", {}, self.value
+
+
+class _HistogramChild:
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self) -> Iterator[tuple[str, dict[str, str], float]]:
+        cumulative = 0
+        for bound, count in zip([*self.buckets, math.inf], self.bucket_counts):
+            cumulative += count
+            yield "_bucket", {"le": _format_value(bound)}, cumulative
+        yield "_sum", {}, self.sum
+        yield "_count", {}, self.count
+
+
+# A metric family. Children are keyed by label values and created on first
+# use; updates happen on the event loop while scrapes come from Flask's
+# threads, so both go through the family's lock.
+class Metric:
+
+    type: str
+    name: str
+    help: str
+    label_names: tuple[str, ...]
+
+    def __init__(
+        self,
+        type: str,
+        name: str,
+        help: str,
+        label_names: Sequence[str],
+        create_child: Callable[[], object],
+    ) -> None:
+        self.type = type
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self._create_child = create_child
+        self._children: dict[tuple[str, ...], object] = dict()
+        self._lock = threading.Lock()
+
+    def labels(self, *label_values: object) -> "BoundMetric":
+        if len(label_values) != len(self.label_names):
+            raise ValueError(
+                f"{self.name} takes labels {self.label_names}, got {label_values}"
+            )
+        return BoundMetric(self, tuple(str(it) for it in label_values))
+
+    def inc(self, amount: float = 1) -> None:
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1) -> None:
+        self.labels().dec(amount)
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {_escape_help(self.help)}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        with self._lock:
+            for label_values, child in sorted(self._children.items()):
+                for suffix, extra_labels, value in child.samples():
+                    labels = dict(zip(self.label_names, label_values)) | extra_labels
+                    lines.append(
+                        f"{self.name}{suffix}{_format_labels(labels)} {_format_value(value)}"
+                    )
+        return lines
+
+    def _update(self, label_values: tuple[str, ...], method: str, value: float):
+        with self._lock:
+            child = self._children.get(label_values)
+            if child is None:
+                child = self._create_child()
+                self._children[label_values] = child
+            getattr(child, method)(value)
+
+
+class BoundMetric:
+    def __init__(self, metric: Metric, label_values: tuple[str, ...]) -> None:
+        self._metric = metric
+        self._label_values = label_values
+
+    def inc(self, amount: float = 1) -> None:
+        self._metric._update(self._label_values, "inc", amount)
+
+    def dec(self, amount: float = 1) -> None:
+        self._metric._update(self._label_values, "dec", amount)
+
+    def set(self, value: float) -> None:
+        self._metric._update(self._label_values, "set", value)
+
+    def observe(self, value: float) -> None:
+        self._metric._update(self._label_values, "observe", value)
+
+
+# Renders the Prometheus text exposition format. Asking for a metric that is
+# already registered returns the existing one, so components sharing a
+# registry share their metrics.
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric] = dict()
+        self._collectors: list[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help: str, label_names: Sequence[str] = ()) -> Metric:
+        return self._register("counter", name, help, label_names, _CounterChild)
+
+    def gauge(self, name: str, help: str, label_names: Sequence[str] = ()) -> Metric:
+        return self._register("gauge", name, help, label_names, _GaugeChild)
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Metric:
+        buckets = sorted(buckets)
+        return self._register(
+            "histogram",
+            name,
+            help,
+            label_names,
+            lambda: _HistogramChild(buckets),
+        )
+
+    # Collectors run before every render, to sample values that are cheaper
+    # to read on demand than to track, e.g. queue sizes
+    def on_collect(self, collector: Callable[[], None]) -> None:
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        with self._lock:
+            collectors = list(self._collectors)
+            metrics = list(self._metrics.values())
+        for collector in collectors:
+            collector()
+        return "".join(f"{line}\n" for metric in metrics for line in metric.render())
+
+    def _register(
+        self,
+        type: str,
+        name: str,
+        help: str,
+        label_names: Sequence[str],
+        create_child: Callable[[], object],
+    ) -> Metric:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = Metric(type, name, help, label_names, create_child)
+                self._metrics[name] = metric
+            elif metric.type != type or metric.label_names != tuple(label_names):
+                raise ValueError(f"Metric {name} is already registered differently")
+            return metric
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if len(labels) == 0:
+        return ""
+    escaped = ",".join(
+        f'{name}="{_escape_label_value(value)}"' for name, value in labels.items()
+    )
+    return f"{{{escaped}}}"
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _escape_help(help: str) -> str:
+    return help.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
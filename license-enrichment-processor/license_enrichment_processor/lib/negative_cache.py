@@ -0,0 +1,32 @@
+from packageurl import PackageURL
+from datetime import datetime
+from typing import Protocol
+
+
+# Remembers components a source answered definitively that it does not know
+class NegativeCache(Protocol):
+    def recall_many(self, purls: list[PackageURL], since: datetime) -> set[PackageURL]:
+        pass
+
+    def remember_many(self, purls: list[PackageURL], timestamp: datetime) -> None:
+        pass
+
+
+class InMemoryNegativeCache:
+
+    memory: dict[str, datetime]
+
+    def __init__(self):
+        self.memory = dict()
+
+    def recall_many(self, purls: list[PackageURL], since: datetime) -> set[PackageURL]:
+        return {
+            purl
+            for purl in purls
+            if purl.to_string() in self.memory
+            and self.memory[purl.to_string()] >= since
+        }
+
+    def remember_many(self, purls: list[PackageURL], timestamp: datetime) -> None:
+        for purl in purls:
+            self.memory[purl.to_string()] = timestamp
@@ -0,0 +1,42 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Protocol
+import hashlib
+
+# Component UUID -> (PURL, license expression Dependency-Track holds)
+ProjectComponentRows = dict[str, tuple[str, str | None]]
+
+
+@dataclass
+class ProjectFingerprint:
+    digest: str
+    component_count: int
+    updated_at: datetime
+    # When every component was last processed, as opposed to any run
+    full_run_at: datetime
+
+
+def project_digest(components: ProjectComponentRows) -> str:
+    digest = hashlib.sha256()
+    for component_uuid, (purl, license_expression) in sorted(components.items()):
+        digest.update(
+            f"{component_uuid}\t{purl}\t{license_expression or ''}\n".encode()
+        )
+    return digest.hexdigest()
+
+
+class ProjectStateStore(Protocol):
+    def get_fingerprint(self, project_uuid: str) -> ProjectFingerprint | None:
+        pass
+
+    def get_components(self, project_uuid: str) -> ProjectComponentRows:
+        pass
+
+    def save_snapshot(
+        self,
+        project_uuid: str,
+        components: ProjectComponentRows,
+        timestamp: datetime,
+        full_run_at: datetime,
+    ) -> None:
+        pass
@@ -0,0 +1,182 @@
+from typing import Protocol
+from email.utils import parsedate_to_datetime
+import asyncio
+import datetime
+import time
+import yarl
+
+
+class Clock(Protocol):
+    def monotonic(self) -> float:
+        pass
+
+    async def sleep(self, seconds: float) -> None:
+        pass
+
+
+class SystemClock:
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    async def sleep(self, seconds: float) -> None:
+        await asyncio.sleep(seconds)
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(
+        0.0,
+        (retry_at - datetime.datetime.now(datetime.timezone.utc)).total_seconds(),
+    )
+
+
+class TokenBucket:
+
+    # Absorbs float rounding so a wait that lands just short of its target
+    # does not trigger an endless series of tiny sleeps
+    _EPSILON = 1e-9
+
+    rate: float
+    capacity: float
+    clock: Clock
+
+    def __init__(
+        self, rate: float, capacity: float, clock: Clock = SystemClock()
+    ) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self._tokens = capacity
+        self._updated_at = clock.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> float:
+        waited = 0.0
+        # Waiters queue on the lock so tokens are handed out in arrival order
+        async with self._lock:
+            while True:
+                now = self.clock.monotonic()
+                self._refill(now)
+                if now < self._blocked_until - self._EPSILON:
+                    wait = self._blocked_until - now
+                elif self._tokens >= 1 - self._EPSILON:
+                    self._tokens = max(0.0, self._tokens - 1)
+                    return waited
+                else:
+                    wait = (1 - self._tokens) / self.rate
+                await self.clock.sleep(wait)
+                waited += wait
+
+    # For background callers: takes a token only while no acquire() caller is
+    # waiting and more than `reserve` tokens would be left, so it never
+    # delays or eats into the burst of regular traffic
+    async def acquire_spare(self, reserve: float = 0.0) -> float:
+        waited = 0.0
+        while True:
+            now = self.clock.monotonic()
+            self._refill(now)
+            if self._lock.locked():
+                wait = 1 / self.rate
+            elif now < self._blocked_until - self._EPSILON:
+                wait = self._blocked_until - now
+            elif self._tokens >= 1 + reserve - self._EPSILON:
+                self._tokens = max(0.0, self._tokens - 1)
+                return waited
+            else:
+                wait = (1 + reserve - self._tokens) / self.rate
+            await self.clock.sleep(wait)
+            waited += wait
+
+    def block_for(self, seconds: float) -> None:
+        now = self.clock.monotonic()
+        self._refill(now)
+        self._tokens = 0
+        self._blocked_until = max(self._blocked_until, now + seconds)
+
+    def _refill(self, now: float) -> None:
+        # No tokens accrue while the upstream has told us to back off
+        accrual_start = max(self._updated_at, self._blocked_until)
+        if now > accrual_start:
+            self._tokens = min(
+                self.capacity, self._tokens + (now - accrual_start) * self.rate
+            )
+        self._updated_at = now
+
+
+class HostRateLimiter:
+
+    DEFAULT_RETRY_AFTER_SECONDS = 5.0
+
+    buckets: dict[str, TokenBucket]
+
+    def __init__(
+        self,
+        limits: dict[str, tuple[float, float]],
+        clock: Clock = SystemClock(),
+    ) -> None:
+        self.buckets = {
+            host: TokenBucket(rate=rate, capacity=burst, clock=clock)
+            for host, (rate, burst) in limits.items()
+        }
+
+    def limits(self, url: str | yarl.URL) -> bool:
+        return yarl.URL(url).host in self.buckets
+
+    async def acquire(self, url: str | yarl.URL) -> float:
+        bucket = self.buckets.get(yarl.URL(url).host)
+        return 0.0 if bucket is None else await bucket.acquire()
+
+    def block_for(self, url: str | yarl.URL, seconds: float | None) -> None:
+        bucket = self.buckets.get(yarl.URL(url).host)
+        if bucket is not None:
+            bucket.block_for(
+                self.DEFAULT_RETRY_AFTER_SECONDS if seconds is None else seconds
+            )
+
+
+# Lets background work share another limiter's per-host budget without
+# competing with it: requests take only spare tokens from the shared
+# buckets, leaving reserve_fraction of each burst untouched, and are
+# further paced by limits of their own. A Retry-After seen by background
+# work blocks the shared bucket as well.
+class BackgroundRateLimiter(HostRateLimiter):
+
+    shared: HostRateLimiter
+    reserve_fraction: float
+
+    def __init__(
+        self,
+        shared: HostRateLimiter,
+        limits: dict[str, tuple[float, float]],
+        reserve_fraction: float = 0.5,
+        clock: Clock = SystemClock(),
+    ) -> None:
+        super().__init__(limits, clock)
+        self.shared = shared
+        self.reserve_fraction = reserve_fraction
+
+    def limits(self, url: str | yarl.URL) -> bool:
+        return super().limits(url) or self.shared.limits(url)
+
+    async def acquire(self, url: str | yarl.URL) -> float:
+        waited = await super().acquire(url)
+        shared_bucket = self.shared.buckets.get(yarl.URL(url).host)
+        if shared_bucket is not None:
+            waited += await shared_bucket.acquire_spare(
+                shared_bucket.capacity * self.reserve_fraction
+            )
+        return waited
+
+    def block_for(self, url: str | yarl.URL, seconds: float | None) -> None:
+        super().block_for(url, seconds)
+        self.shared.block_for(url, seconds)
@@ -0,0 +1,49 @@
+from .components_cache import ComponentsCache
+from .definition_store import DefinitionStore
+from .license_data_source import LicenseDataSourceClearlyDefined
+from .sbom import CanonicalPackageURL, Component, ComponentLicenseDetails
+
+
+def rederive_clearly_defined_license_details(
+    definition_store: DefinitionStore,
+    components_cache: ComponentsCache,
+    batch_size: int = 1000,
+) -> int:
+    rederived = 0
+    for definitions in definition_store.iter_definitions(batch_size):
+        purls = [CanonicalPackageURL.from_string(purl) for purl, _ in definitions]
+        cached_license_details = components_cache.get_components(purls)
+        components: list[Component] = []
+        for purl, (_, definition) in zip(purls, definitions):
+            cached = cached_license_details.get(purl, ComponentLicenseDetails())
+            # Details from other sources are kept as they are
+            other_sources = ComponentLicenseDetails(
+                license_expressions=[
+                    it
+                    for it in cached.license_expressions
+                    if it[1] not in LicenseDataSourceClearlyDefined.LICENSE_SOURCES
+                ],
+                attributions=[
+                    it
+                    for it in cached.attributions
+                    if it[1] not in LicenseDataSourceClearlyDefined.LICENSE_SOURCES
+                ],
+                source_urls=[
+                    it
+                    for it in cached.source_urls
+                    if it[1] not in LicenseDataSourceClearlyDefined.LICENSE_SOURCES
+                ],
+            )
+            derived = LicenseDataSourceClearlyDefined.parse_definition(definition)
+            license_details = (
+                other_sources if derived is None else other_sources.merge(derived)
+            )
+            if license_details.is_empty() or license_details == cached:
+                continue
+            components.append(
+                Component(uuid="", purl=purl, license_details=license_details)
+            )
+        if len(components) > 0:
+            components_cache.replace_license_details(components)
+        rederived += len(components)
+    return rederived
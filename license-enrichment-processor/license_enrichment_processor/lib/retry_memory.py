@@ -1,5 +1,5 @@
 from packageurl import PackageURL
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Protocol
 
 
@@ -10,18 +10,74 @@ class RetryMemory(Protocol):
     def remember(self, purl: PackageURL, timestamp: datetime):
         pass
 
+    # Returns when each PURL that is still backing off may be tried again
+    def recall_many(
+        self, purls: list[PackageURL], now: datetime
+    ) -> dict[PackageURL, datetime]:
+        pass
+
+    def remember_many(self, purls: list[PackageURL], timestamp: datetime):
+        pass
+
+    def forget_many(self, purls: list[PackageURL]):
+        pass
+
+
+def backoff_delay(
+    attempt_count: int, base_backoff: timedelta, max_backoff: timedelta
+) -> timedelta:
+    # Capping the exponent first keeps the multiplication from overflowing
+    return min(base_backoff * 2 ** min(attempt_count - 1, 32), max_backoff)
+
 
 class InMemoryRetryMemory:
 
-    memory: dict[str, datetime]
+    memory: dict[str, tuple[datetime, int]]
+    base_backoff: timedelta
+    max_backoff: timedelta
 
-    def __init__(self):
+    def __init__(
+        self,
+        base_backoff: timedelta = timedelta(minutes=5),
+        max_backoff: timedelta = timedelta(days=1),
+    ):
         self.memory = dict()
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
 
     def recall(self, purl: PackageURL) -> datetime | None:
         return (
-            self.memory[purl.to_string()] if purl.to_string() in self.memory else None
+            self.memory[purl.to_string()][0]
+            if purl.to_string() in self.memory
+            else None
         )
 
     def remember(self, purl: PackageURL, timestamp: datetime):
-        self.memory[purl.to_string()] = timestamp
+        _, attempt_count = self.memory.get(purl.to_string(), (timestamp, 0))
+        self.memory[purl.to_string()] = (timestamp, attempt_count + 1)
+
+    def recall_many(
+        self, purls: list[PackageURL], now: datetime
+    ) -> dict[PackageURL, datetime]:
+        retry_afters = {purl: self._retry_after(purl) for purl in purls}
+        return {
+            purl: retry_after
+            for purl, retry_after in retry_afters.items()
+            if retry_after is not None and retry_after > now
+        }
+
+    def remember_many(self, purls: list[PackageURL], timestamp: datetime):
+        for purl in purls:
+            self.remember(purl, timestamp)
+
+    def forget_many(self, purls: list[PackageURL]):
+        for purl in purls:
+            self.memory.pop(purl.to_string(), None)
+
+    def _retry_after(self, purl: PackageURL) -> datetime | None:
+        if purl.to_string() not in self.memory:
+            return None
+        last_attempt_at, attempt_count = self.memory[purl.to_string()]
+        return last_attempt_at + backoff_delay(
+            attempt_count, self.base_backoff, self.max_backoff
+        )
@@ -0,0 +1,46 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Protocol
+
+
+@dataclass
+class EnrichmentRunReport:
+    id: str
+    project_uuid: str
+    project_name: str
+    project_version: str
+    started_at: datetime
+    finished_at: datetime
+    succeeded: bool
+    stats: dict
+    error: str | None = None
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "project": {
+                "uuid": self.project_uuid,
+                "name": self.project_name,
+                "version": self.project_version,
+            },
+            "startedAt": self.started_at.isoformat(),
+            "finishedAt": self.finished_at.isoformat(),
+            "durationSeconds": (self.finished_at - self.started_at).total_seconds(),
+            "status": "succeeded" if self.succeeded else "failed",
+            "stats": self.stats,
+            "error": self.error,
+        }
+
+
+class RunReportStore(Protocol):
+    def save_run(self, report: EnrichmentRunReport) -> None:
+        pass
+
+    def get_run(self, run_id: str) -> EnrichmentRunReport | None:
+        pass
+
+    # Most recent first
+    def list_runs(
+        self, project_uuid: str | None = None, limit: int = 50
+    ) -> list[EnrichmentRunReport]:
+        pass
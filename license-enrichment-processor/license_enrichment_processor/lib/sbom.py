@@ -3,13 +3,98 @@ from enum import Enum
 from datetime import datetime
 from packageurl import PackageURL
 import copy
+import sys
 
 LicenseExpressionWithSource = tuple[str, str]
 AttributionWithSource = tuple[str, str]
 SourceUrlWithSource = tuple[str, str]
 
+# Source names repeat in every row; interning them shares one string object
+intern_source = sys.intern
 
-@dataclass
+
+# A PackageURL that serialises itself once. PackageURL hashes by calling
+# to_string(), so plain instances re-serialise on every dict lookup. The
+# string is kept as a seventh tuple item, hidden from iteration, len() and
+# repr(); an instance attribute would give every PURL a __dict__. Types and
+# namespaces repeat across a BOM and are interned.
+class CanonicalPackageURL(PackageURL):
+
+    __slots__ = ()
+
+    def __new__(cls, *args, **kwargs) -> "CanonicalPackageURL":
+        normalized = PackageURL(*args, **kwargs)
+        return tuple.__new__(
+            cls,
+            (
+                sys.intern(normalized.type),
+                sys.intern(normalized.namespace) if normalized.namespace else None,
+                normalized.name,
+                normalized.version,
+                normalized.qualifiers,
+                normalized.subpath,
+                normalized.to_string(),
+            ),
+        )
+
+    # Also what _replace() builds through
+    @classmethod
+    def _make(cls, iterable) -> "CanonicalPackageURL":
+        return cls(*iterable)
+
+    def __getnewargs__(self) -> tuple:
+        return self[:6]
+
+    def __iter__(self):
+        return iter(self[:6])
+
+    def __len__(self) -> int:
+        return 6
+
+    def __repr__(self) -> str:
+        fields = ", ".join(
+            f"{name}={value!r}" for name, value in zip(self._fields, self)
+        )
+        return f"{self.__class__.__name__}({fields})"
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, CanonicalPackageURL):
+            return self[6] == other[6]
+        return isinstance(other, tuple) and self[:6] == other
+
+    def __ne__(self, other) -> bool:
+        return not self == other
+
+    def to_string(self, encode: bool | None = True) -> str:
+        return self[6] if encode else super().to_string(encode)
+
+    def __hash__(self) -> int:
+        return hash(self[6])
+
+
+def _same_items(left: list[tuple[str, str]], right: list[tuple[str, str]]) -> bool:
+    # Same result as comparing sets, without building them; lists are short
+    for item in left:
+        if item not in right:
+            return False
+    for item in right:
+        if item not in left:
+            return False
+    return True
+
+
+def _merge_unique(
+    left: list[tuple[str, str]], right: list[tuple[str, str]]
+) -> list[tuple[str, str]]:
+    merged: list[tuple[str, str]] = []
+    for items in (left, right):
+        for item in items:
+            if item not in merged:
+                merged.append(item)
+    return merged
+
+
+@dataclass(slots=True)
 class ComponentLicenseDetails:
     license_expressions: list[LicenseExpressionWithSource] = field(default_factory=list)
     attributions: list[AttributionWithSource] = field(default_factory=list)
@@ -20,9 +105,9 @@ class ComponentLicenseDetails:
 
     def equals(self, other: "ComponentLicenseDetails") -> bool:
         return (
-            set(self.license_expressions) == set(other.license_expressions)
-            and set(self.attributions) == set(other.attributions)
-            and set(self.source_urls) == set(other.source_urls)
+            _same_items(self.license_expressions, other.license_expressions)
+            and _same_items(self.attributions, other.attributions)
+            and _same_items(self.source_urls, other.source_urls)
         )
 
     def to_dict(self) -> dict:
@@ -44,12 +129,16 @@ class ComponentLicenseDetails:
     def from_dict(dict: dict) -> "ComponentLicenseDetails":
         return ComponentLicenseDetails(
             license_expressions=[
-                (it["expression"], it["source"]) for it in dict["licenseExpressions"]
+                (it["expression"], intern_source(it["source"]))
+                for it in dict["licenseExpressions"]
             ],
             attributions=[
-                (it["attribution"], it["source"]) for it in dict["attributions"]
+                (it["attribution"], intern_source(it["source"]))
+                for it in dict["attributions"]
+            ],
+            source_urls=[
+                (it["url"], intern_source(it["source"])) for it in dict["sourceUrls"]
             ],
-            source_urls=[(it["url"], it["source"]) for it in dict["sourceUrls"]],
         )
 
     def present_sources(self) -> set[str]:
@@ -71,32 +160,17 @@ class ComponentLicenseDetails:
 
     def merge(self, other: "ComponentLicenseDetails") -> "ComponentLicenseDetails":
         return ComponentLicenseDetails(
-            license_expressions=list(
-                {
-                    f"{exp}{source}": (exp, source)
-                    for exp, source in [
-                        *self.license_expressions,
-                        *other.license_expressions,
-                    ]
-                }.values()
-            ),
-            attributions=list(
-                {
-                    f"{attr}{source}": (attr, source)
-                    for attr, source in [*self.attributions, *other.attributions]
-                }.values()
-            ),
-            source_urls=list(
-                {
-                    f"{url}{source}": (url, source)
-                    for url, source in [*self.source_urls, *other.source_urls]
-                }.values()
+            license_expressions=_merge_unique(
+                self.license_expressions, other.license_expressions
             ),
+            attributions=_merge_unique(self.attributions, other.attributions),
+            source_urls=_merge_unique(self.source_urls, other.source_urls),
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class Component:
     uuid: str
     purl: PackageURL | None
     license_details: ComponentLicenseDetails
+    payload: dict | None = field(default=None, repr=False, compare=False)
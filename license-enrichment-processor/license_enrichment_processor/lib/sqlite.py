@@ -1,129 +1,728 @@
+import sqlite3
+import json
+import queue
+import zlib
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import TypeVar
 from sqlite3 import Connection, Cursor
-from typing import Callable
 from packageurl import PackageURL
-from .sbom import Component, ComponentLicenseDetails
+from .sbom import Component, ComponentLicenseDetails, intern_source
 from .date import DatetimeProvider
+from .retry_memory import backoff_delay
+from .project_state import ProjectComponentRows, ProjectFingerprint, project_digest
+from .run_report import EnrichmentRunReport
+from .tracing import NoopTracer, Tracer, traced
 
-ConnectionFactory = Callable[[], Connection]
+T = TypeVar("T")
+
+
+# Stays below SQLITE_MAX_VARIABLE_NUMBER on older SQLite builds (999)
+_QUERY_CHUNK_SIZE = 500
+
+
+def _chunked(items: list[T], size: int = _QUERY_CHUNK_SIZE) -> Iterator[list[T]]:
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+class SqliteConnectionPool:
+
+    path: str
+    busy_timeout_ms: int
+    readers: queue.Queue[Connection]
+    writer_connection: Connection
+    writer_lock: threading.Lock
+
+    def __init__(
+        self, path: str, reader_count: int = 4, busy_timeout_ms: int = 5000
+    ) -> None:
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.writer_lock = threading.Lock()
+        self.writer_connection = self._connect()
+        self.writer_connection.execute("PRAGMA journal_mode = WAL")
+        self.readers = queue.Queue()
+        for _ in range(reader_count):
+            reader = self._connect()
+            reader.execute("PRAGMA query_only = ON")
+            self.readers.put(reader)
+
+    @contextmanager
+    def reader(self) -> Iterator[Connection]:
+        connection = self.readers.get()
+        try:
+            yield connection
+        finally:
+            self.readers.put(connection)
+
+    @contextmanager
+    def writer(self) -> Iterator[Connection]:
+        with self.writer_lock:
+            try:
+                yield self.writer_connection
+            except BaseException:
+                self.writer_connection.rollback()
+                raise
+            self.writer_connection.commit()
+
+    def close(self) -> None:
+        with self.writer_lock:
+            self.writer_connection.close()
+        while not self.readers.empty():
+            self.readers.get_nowait().close()
+
+    def _connect(self) -> Connection:
+        # Connections are handed between request threads, but only ever used
+        # by one thread at a time through reader() and writer()
+        connection = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout_ms / 1000,
+            check_same_thread=False,
+        )
+        connection.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        connection.execute("PRAGMA synchronous = NORMAL")
+        connection.execute("PRAGMA temp_store = MEMORY")
+        connection.execute("PRAGMA cache_size = -16000")
+        connection.execute("PRAGMA mmap_size = 134217728")
+        return connection
 
 
 class SqliteDatabase:
 
-    connection_factory: ConnectionFactory
+    connection_pool: SqliteConnectionPool
     datetime_provider: DatetimeProvider
+    tracer: Tracer
 
     def __init__(
-        self, connection_factory: ConnectionFactory, datetime_provider: DatetimeProvider
+        self,
+        connection_pool: SqliteConnectionPool,
+        datetime_provider: DatetimeProvider,
+        tracer: Tracer = NoopTracer(),
     ):
-        self.connection_factory = connection_factory
+        self.connection_pool = connection_pool
         self.datetime_provider = datetime_provider
+        self.tracer = tracer
 
+    @traced("sqlite.get_components")
     def get_components(
         self, purls: list[PackageURL]
     ) -> dict[PackageURL, ComponentLicenseDetails]:
-        cursor = self.connection_factory().cursor()
-        results = [
-            (purl, self._get_component(purl.to_string(), cursor)) for purl in purls
-        ]
-        return {purl: result for purl, result in results if result is not None}
+        purl_strings = {purl: purl.to_string() for purl in purls}
+        unique_purl_strings = list(dict.fromkeys(purl_strings.values()))
+        results: dict[str, ComponentLicenseDetails] = {}
+        with self.connection_pool.reader() as connection:
+            cursor = connection.cursor()
+            for chunk in _chunked(unique_purl_strings):
+                results.update(self._get_components(chunk, cursor))
+        return {
+            purl: results[purl_string]
+            for purl, purl_string in purl_strings.items()
+            if purl_string in results
+        }
 
+    @traced("sqlite.cache_components")
     def cache_components(self, components: list[Component]) -> None:
-        now = self.datetime_provider.now()
-        cursor = self.connection_factory().cursor()
+        self._write_components(components, "INSERT OR REPLACE")
 
-        for component in components:
-            cursor.execute(
-                """
-                INSERT OR REPLACE INTO component (purl, updatedAt)
+    # For details derived again from data already held: updatedAt says when
+    # the data was fetched, so entries already cached keep theirs
+    @traced("sqlite.replace_license_details")
+    def replace_license_details(self, components: list[Component]) -> None:
+        self._write_components(components, "INSERT OR IGNORE")
+
+    def _write_components(
+        self, components: list[Component], insert_component: str
+    ) -> None:
+        now = self.datetime_provider.now().isoformat()
+        # Later entries for the same PURL win, as they would with one write each
+        components_by_purl = {
+            component.purl.to_string(): component for component in components
+        }
+        purls = list(components_by_purl.keys())
+        license_expression_rows = []
+        attribution_rows = []
+        source_url_rows = []
+        for purl, component in components_by_purl.items():
+            license_details = component.license_details
+            license_expression_rows += [
+                (purl, expression, source)
+                for expression, source in license_details.license_expressions
+            ]
+            attribution_rows += [
+                (purl, attribution, source)
+                for attribution, source in license_details.attributions
+            ]
+            source_url_rows += [
+                (purl, url, source) for url, source in license_details.source_urls
+            ]
+
+        with self.connection_pool.writer() as connection:
+            cursor = connection.cursor()
+            cursor.executemany(
+                f"""
+                {insert_component} INTO component (purl, updatedAt)
                 VALUES (?, ?)
                 """,
-                (
-                    component.purl.to_string(),
-                    now.isoformat(),
-                ),
+                [(purl, now) for purl in purls],
             )
+            # Child rows are replaced, not added to, so stale details go away
+            for table in [
+                "component_license_expression",
+                "component_attribution",
+                "component_source_code_url",
+            ]:
+                for chunk in _chunked(purls):
+                    placeholders = ", ".join("?" * len(chunk))
+                    cursor.execute(
+                        f"DELETE FROM {table} WHERE componentPurl IN ({placeholders})",
+                        chunk,
+                    )
             cursor.executemany(
                 """
                 INSERT OR REPLACE INTO component_license_expression (componentPurl, expression, source)
                 VALUES (?, ?, ?)
                 """,
-                [
-                    (component.purl.to_string(), expression, source)
-                    for expression, source in component.license_details.license_expressions
-                ],
+                license_expression_rows,
             )
-
             cursor.executemany(
                 """
                 INSERT OR REPLACE INTO component_attribution (componentPurl, attribution, source)
                 VALUES (?, ?, ?)
                 """,
-                [
-                    (component.purl.to_string(), attribution, source)
-                    for attribution, source in component.license_details.attributions
-                ],
+                attribution_rows,
             )
-
             cursor.executemany(
                 """
                 INSERT OR REPLACE INTO component_source_code_url (componentPurl, sourceCodeUrl, source)
                 VALUES (?, ?, ?)
                 """,
-                [
-                    (component.purl.to_string(), url, source)
-                    for url, source in component.license_details.source_urls
-                ],
+                source_url_rows,
             )
 
-        cursor.connection.commit()
+    @traced("sqlite.get_stale_components")
+    def get_stale_components(
+        self,
+        stale_before_by_source: dict[str, datetime],
+        default_stale_before: datetime,
+        after: tuple[datetime, str] | None,
+        limit: int,
+    ) -> list[tuple[str, datetime]]:
+        after_updated_at, after_purl = after if after else (None, "")
+        latest_stale_before = max(
+            [default_stale_before, *stale_before_by_source.values()]
+        )
+        source_cases = " ".join("WHEN ? THEN ?" for _ in stale_before_by_source)
+        with self.connection_pool.reader() as connection:
+            # An entry goes stale as soon as any of its sources does; one
+            # without sources goes stale at the default age
+            rows = connection.execute(
+                f"""
+                SELECT purl, updatedAt
+                FROM component
+                WHERE updatedAt <= ?
+                AND (? IS NULL OR (updatedAt, purl) > (?, ?))
+                AND updatedAt <= COALESCE(
+                    (
+                        SELECT MAX(CASE source {source_cases} ELSE ? END)
+                        FROM (
+                            SELECT source FROM component_license_expression WHERE componentPurl = component.purl
+                            UNION SELECT source FROM component_attribution WHERE componentPurl = component.purl
+                            UNION SELECT source FROM component_source_code_url WHERE componentPurl = component.purl
+                        )
+                    ),
+                    ?
+                )
+                ORDER BY updatedAt, purl
+                LIMIT ?
+                """,
+                (
+                    latest_stale_before.isoformat(),
+                    after_updated_at and after_updated_at.isoformat(),
+                    after_updated_at and after_updated_at.isoformat(),
+                    after_purl,
+                    *[
+                        value
+                        for source, stale_before in stale_before_by_source.items()
+                        for value in (source, stale_before.isoformat())
+                    ],
+                    default_stale_before.isoformat(),
+                    default_stale_before.isoformat(),
+                    limit,
+                ),
+            ).fetchall()
+        return [(purl, datetime.fromisoformat(updated_at)) for purl, updated_at in rows]
+
+    @traced("sqlite.touch_components")
+    def touch_components(self, purls: list[PackageURL], timestamp: datetime) -> None:
+        with self.connection_pool.writer() as connection:
+            connection.executemany(
+                "UPDATE component SET updatedAt = ? WHERE purl = ?",
+                [(timestamp.isoformat(), purl.to_string()) for purl in purls],
+            )
 
-    def _get_component(
-        self, purl: str, cursor: Cursor
-    ) -> ComponentLicenseDetails | None:
+    def _get_components(
+        self, purls: list[str], cursor: Cursor
+    ) -> dict[str, ComponentLicenseDetails]:
+        placeholders = ", ".join("?" * len(purls))
         cursor.execute(
-            """
+            f"""
             SELECT purl
             FROM component
-            WHERE purl = ?
+            WHERE purl IN ({placeholders})
             """,
-            (purl,),
+            purls,
         )
-        result = cursor.fetchone()
-        if result is None:
-            return None
+        results = {purl: ComponentLicenseDetails() for (purl,) in cursor.fetchall()}
+        if len(results) == 0:
+            return results
 
         cursor.execute(
-            """
-            SELECT expression, source
+            f"""
+            SELECT componentPurl, expression, source
             FROM component_license_expression
-            WHERE componentPurl = ?
+            WHERE componentPurl IN ({placeholders})
             """,
-            (purl,),
+            purls,
         )
-        expressions = cursor.fetchall()
+        for purl, expression, source in cursor.fetchall():
+            if purl in results:
+                results[purl].license_expressions.append(
+                    (expression, intern_source(source))
+                )
 
         cursor.execute(
-            """
-            SELECT attribution, source
+            f"""
+            SELECT componentPurl, attribution, source
             FROM component_attribution
-            WHERE componentPurl = ?
+            WHERE componentPurl IN ({placeholders})
             """,
-            (purl,),
+            purls,
         )
-        attributions = cursor.fetchall()
+        for purl, attribution, source in cursor.fetchall():
+            if purl in results:
+                results[purl].attributions.append((attribution, intern_source(source)))
 
         cursor.execute(
-            """
-            SELECT sourceCodeUrl, source
+            f"""
+            SELECT componentPurl, sourceCodeUrl, source
             FROM component_source_code_url
-            WHERE componentPurl = ?
+            WHERE componentPurl IN ({placeholders})
             """,
-            (purl,),
+            purls,
+        )
+        for purl, url, source in cursor.fetchall():
+            if purl in results:
+                results[purl].source_urls.append((url, intern_source(source)))
+
+        return results
+
+
+class SqliteDefinitionStore:
+
+    COMPRESSION_LEVEL = 6
+
+    connection_pool: SqliteConnectionPool
+    datetime_provider: DatetimeProvider
+
+    def __init__(
+        self,
+        connection_pool: SqliteConnectionPool,
+        datetime_provider: DatetimeProvider,
+    ):
+        self.connection_pool = connection_pool
+        self.datetime_provider = datetime_provider
+
+    def store_definitions(self, definitions: dict[PackageURL, dict]) -> None:
+        if len(definitions) == 0:
+            return
+        now = self.datetime_provider.now().isoformat()
+        rows = [
+            (
+                purl.to_string(),
+                zlib.compress(
+                    json.dumps(definition, separators=(",", ":")).encode(),
+                    self.COMPRESSION_LEVEL,
+                ),
+                now,
+            )
+            for purl, definition in definitions.items()
+        ]
+        with self.connection_pool.writer() as connection:
+            connection.executemany(
+                """
+                INSERT OR REPLACE INTO component_clearly_defined_full (componentPurl, definition, fetchedAt)
+                VALUES (?, ?, ?)
+                """,
+                rows,
+            )
+
+    def iter_definitions(self, batch_size: int) -> Iterator[list[tuple[str, dict]]]:
+        last_purl = ""
+        while True:
+            # Keyset pagination keeps each read short so writers are not held up
+            with self.connection_pool.reader() as connection:
+                rows = connection.execute(
+                    """
+                    SELECT componentPurl, definition
+                    FROM component_clearly_defined_full
+                    WHERE componentPurl > ?
+                    ORDER BY componentPurl
+                    LIMIT ?
+                    """,
+                    (last_purl, batch_size),
+                ).fetchall()
+            if len(rows) == 0:
+                return
+            last_purl = rows[-1][0]
+            yield [
+                (purl, json.loads(zlib.decompress(definition)))
+                for purl, definition in rows
+            ]
+
+
+class SqliteRetryMemory:
+
+    connection_pool: SqliteConnectionPool
+    source: str
+    base_backoff: timedelta
+    max_backoff: timedelta
+
+    def __init__(
+        self,
+        connection_pool: SqliteConnectionPool,
+        source: str,
+        base_backoff: timedelta = timedelta(minutes=5),
+        max_backoff: timedelta = timedelta(days=1),
+    ):
+        self.connection_pool = connection_pool
+        self.source = source
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+    def recall(self, purl: PackageURL) -> datetime | None:
+        with self.connection_pool.reader() as connection:
+            row = connection.execute(
+                """
+                SELECT lastAttemptAt
+                FROM fetch_retry
+                WHERE componentPurl = ? AND source = ?
+                """,
+                (purl.to_string(), self.source),
+            ).fetchone()
+        return datetime.fromisoformat(row[0]) if row else None
+
+    def remember(self, purl: PackageURL, timestamp: datetime):
+        self.remember_many([purl], timestamp)
+
+    def recall_many(
+        self, purls: list[PackageURL], now: datetime
+    ) -> dict[PackageURL, datetime]:
+        purl_strings = {purl: purl.to_string() for purl in purls}
+        unique_purl_strings = list(dict.fromkeys(purl_strings.values()))
+        retry_afters: dict[str, datetime] = {}
+        with self.connection_pool.reader() as connection:
+            for chunk in _chunked(unique_purl_strings):
+                placeholders = ", ".join("?" * len(chunk))
+                rows = connection.execute(
+                    f"""
+                    SELECT componentPurl, retryAfter
+                    FROM fetch_retry
+                    WHERE source = ?
+                    AND retryAfter > ?
+                    AND componentPurl IN ({placeholders})
+                    """,
+                    [self.source, now.isoformat(), *chunk],
+                ).fetchall()
+                retry_afters.update(
+                    (purl, datetime.fromisoformat(retry_after))
+                    for purl, retry_after in rows
+                )
+        return {
+            purl: retry_afters[purl_string]
+            for purl, purl_string in purl_strings.items()
+            if purl_string in retry_afters
+        }
+
+    def remember_many(self, purls: list[PackageURL], timestamp: datetime):
+        purl_strings = list(dict.fromkeys(purl.to_string() for purl in purls))
+        if len(purl_strings) == 0:
+            return
+        with self.connection_pool.writer() as connection:
+            attempt_counts: dict[str, int] = {}
+            for chunk in _chunked(purl_strings):
+                placeholders = ", ".join("?" * len(chunk))
+                attempt_counts.update(
+                    connection.execute(
+                        f"""
+                        SELECT componentPurl, attemptCount
+                        FROM fetch_retry
+                        WHERE source = ?
+                        AND componentPurl IN ({placeholders})
+                        """,
+                        [self.source, *chunk],
+                    ).fetchall()
+                )
+            rows = []
+            for purl in purl_strings:
+                attempt_count = attempt_counts.get(purl, 0) + 1
+                retry_after = timestamp + backoff_delay(
+                    attempt_count, self.base_backoff, self.max_backoff
+                )
+                rows.append(
+                    (
+                        purl,
+                        self.source,
+                        timestamp.isoformat(),
+                        attempt_count,
+                        retry_after.isoformat(),
+                    )
+                )
+            connection.executemany(
+                """
+                INSERT OR REPLACE INTO fetch_retry (componentPurl, source, lastAttemptAt, attemptCount, retryAfter)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                rows,
+            )
+
+    def forget_many(self, purls: list[PackageURL]):
+        purl_strings = list(dict.fromkeys(purl.to_string() for purl in purls))
+        if len(purl_strings) == 0:
+            return
+        with self.connection_pool.writer() as connection:
+            for chunk in _chunked(purl_strings):
+                placeholders = ", ".join("?" * len(chunk))
+                connection.execute(
+                    f"""
+                    DELETE FROM fetch_retry
+                    WHERE source = ? AND componentPurl IN ({placeholders})
+                    """,
+                    [self.source, *chunk],
+                )
+
+
+class SqliteNegativeCache:
+
+    connection_pool: SqliteConnectionPool
+    source: str
+
+    def __init__(self, connection_pool: SqliteConnectionPool, source: str):
+        self.connection_pool = connection_pool
+        self.source = source
+
+    def recall_many(self, purls: list[PackageURL], since: datetime) -> set[PackageURL]:
+        purl_strings = {purl: purl.to_string() for purl in purls}
+        unique_purl_strings = list(dict.fromkeys(purl_strings.values()))
+        not_found: set[str] = set()
+        with self.connection_pool.reader() as connection:
+            for chunk in _chunked(unique_purl_strings):
+                placeholders = ", ".join("?" * len(chunk))
+                rows = connection.execute(
+                    f"""
+                    SELECT componentPurl
+                    FROM component_not_found
+                    WHERE source = ?
+                    AND checkedAt >= ?
+                    AND componentPurl IN ({placeholders})
+                    """,
+                    [self.source, since.isoformat(), *chunk],
+                ).fetchall()
+                not_found.update(purl for (purl,) in rows)
+        return {
+            purl
+            for purl, purl_string in purl_strings.items()
+            if purl_string in not_found
+        }
+
+    def remember_many(self, purls: list[PackageURL], timestamp: datetime) -> None:
+        if len(purls) == 0:
+            return
+        with self.connection_pool.writer() as connection:
+            connection.executemany(
+                """
+                INSERT OR REPLACE INTO component_not_found (componentPurl, source, checkedAt)
+                VALUES (?, ?, ?)
+                """,
+                [
+                    (purl_string, self.source, timestamp.isoformat())
+                    for purl_string in dict.fromkeys(purl.to_string() for purl in purls)
+                ],
+            )
+
+
+class SqliteProjectStateStore:
+
+    connection_pool: SqliteConnectionPool
+
+    def __init__(self, connection_pool: SqliteConnectionPool):
+        self.connection_pool = connection_pool
+
+    def get_fingerprint(self, project_uuid: str) -> ProjectFingerprint | None:
+        with self.connection_pool.reader() as connection:
+            row = connection.execute(
+                """
+                SELECT digest, componentCount, updatedAt, fullRunAt
+                FROM project_fingerprint
+                WHERE projectUuid = ?
+                """,
+                (project_uuid,),
+            ).fetchone()
+        if row is None:
+            return None
+        digest, component_count, updated_at, full_run_at = row
+        return ProjectFingerprint(
+            digest=digest,
+            component_count=component_count,
+            updated_at=datetime.fromisoformat(updated_at),
+            full_run_at=datetime.fromisoformat(full_run_at),
         )
-        source_urls = cursor.fetchall()
 
-        return ComponentLicenseDetails(
-            license_expressions=expressions,
-            attributions=attributions,
-            source_urls=source_urls,
+    def get_components(self, project_uuid: str) -> ProjectComponentRows:
+        with self.connection_pool.reader() as connection:
+            rows = connection.execute(
+                """
+                SELECT componentUuid, componentPurl, licenseExpression
+                FROM project_component
+                WHERE projectUuid = ?
+                """,
+                (project_uuid,),
+            ).fetchall()
+        return {
+            component_uuid: (purl, license_expression)
+            for component_uuid, purl, license_expression in rows
+        }
+
+    def save_snapshot(
+        self,
+        project_uuid: str,
+        components: ProjectComponentRows,
+        timestamp: datetime,
+        full_run_at: datetime,
+    ) -> None:
+        digest = project_digest(components)
+        with self.connection_pool.writer() as connection:
+            previous = connection.execute(
+                "SELECT digest FROM project_fingerprint WHERE projectUuid = ?",
+                (project_uuid,),
+            ).fetchone()
+            connection.execute(
+                """
+                INSERT OR REPLACE INTO project_fingerprint (projectUuid, digest, componentCount, updatedAt, fullRunAt)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (
+                    project_uuid,
+                    digest,
+                    len(components),
+                    timestamp.isoformat(),
+                    full_run_at.isoformat(),
+                ),
+            )
+            # Same digest, same rows: only the timestamp needs to move
+            if previous is not None and previous[0] == digest:
+                return
+            connection.execute(
+                "DELETE FROM project_component WHERE projectUuid = ?",
+                (project_uuid,),
+            )
+            connection.executemany(
+                """
+                INSERT INTO project_component (projectUuid, componentUuid, componentPurl, licenseExpression)
+                VALUES (?, ?, ?, ?)
+                """,
+                [
+                    (project_uuid, component_uuid, purl, license_expression)
+                    for component_uuid, (purl, license_expression) in components.items()
+                ],
+            )
+
+
+class SqliteRunReportStore:
+
+    _COLUMNS = "id, projectUuid, projectName, projectVersion, startedAt, finishedAt, status, stats, error"
+
+    connection_pool: SqliteConnectionPool
+
+    def __init__(self, connection_pool: SqliteConnectionPool):
+        self.connection_pool = connection_pool
+
+    def save_run(self, report: EnrichmentRunReport) -> None:
+        with self.connection_pool.writer() as connection:
+            connection.execute(
+                """
+                INSERT OR REPLACE INTO enrichment_run (id, projectUuid, projectName, projectVersion, startedAt, finishedAt, status, stats, error)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    report.id,
+                    report.project_uuid,
+                    report.project_name,
+                    report.project_version,
+                    report.started_at.isoformat(),
+                    report.finished_at.isoformat(),
+                    "succeeded" if report.succeeded else "failed",
+                    json.dumps(report.stats),
+                    report.error,
+                ),
+            )
+
+    def get_run(self, run_id: str) -> EnrichmentRunReport | None:
+        with self.connection_pool.reader() as connection:
+            row = connection.execute(
+                f"SELECT {self._COLUMNS} FROM enrichment_run WHERE id = ?",
+                (run_id,),
+            ).fetchone()
+        return self._parse_run(row) if row else None
+
+    def list_runs(
+        self, project_uuid: str | None = None, limit: int = 50
+    ) -> list[EnrichmentRunReport]:
+        # Separate queries so each can walk its own index in order
+        if project_uuid is None:
+            query = f"""
+                SELECT {self._COLUMNS}
+                FROM enrichment_run
+                ORDER BY startedAt DESC
+                LIMIT ?
+                """
+            parameters = (limit,)
+        else:
+            query = f"""
+                SELECT {self._COLUMNS}
+                FROM enrichment_run
+                WHERE projectUuid = ?
+                ORDER BY startedAt DESC
+                LIMIT ?
+                """
+            parameters = (project_uuid, limit)
+        with self.connection_pool.reader() as connection:
+            rows = connection.execute(query, parameters).fetchall()
+        return [self._parse_run(row) for row in rows]
+
+    @staticmethod
+    def _parse_run(row: tuple) -> EnrichmentRunReport:
+        (
+            run_id,
+            project_uuid,
+            project_name,
+            project_version,
+            started_at,
+            finished_at,
+            status,
+            stats,
+            error,
+        ) = row
+        return EnrichmentRunReport(
+            id=run_id,
+            project_uuid=project_uuid,
+            project_name=project_name,
+            project_version=project_version,
+            started_at=datetime.fromisoformat(started_at),
+            finished_at=datetime.fromisoformat(finished_at),
+            succeeded=status == "succeeded",
+            stats=json.loads(stats),
+            error=error,
         )
@@ -0,0 +1,95 @@
+from collections.abc import Callable, Mapping
+from contextlib import AbstractContextManager
+from typing import Protocol, TypeVar
+import functools
+import inspect
+
+AttributeValue = str | bool | int | float
+
+TracingAttributes = Mapping[str, AttributeValue]
+
+F = TypeVar("F", bound=Callable)
+
+
+class Span(Protocol):
+    def set_attribute(self, key: str, value: AttributeValue) -> None:
+        pass
+
+    def record_exception(self, exception: BaseException) -> None:
+        pass
+
+
+# Spans nest through context variables, so a span opened in a task is the
+# parent of spans opened in the tasks it starts
+class Tracer(Protocol):
+    def span(
+        self, name: str, attributes: TracingAttributes | None = None
+    ) -> AbstractContextManager[Span]:
+        pass
+
+
+class _NoopSpan:
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        return None
+
+    def set_attribute(self, key: str, value: AttributeValue) -> None:
+        pass
+
+    def record_exception(self, exception: BaseException) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+# The default; hands out one shared span object so tracing costs a method
+# call per span when it is off
+class NoopTracer:
+    def span(
+        self, name: str, attributes: TracingAttributes | None = None
+    ) -> AbstractContextManager[Span]:
+        return _NOOP_SPAN
+
+
+# Exports through whatever OpenTelemetry SDK and exporter the process was set
+# up with, e.g. by opentelemetry-instrument. The API package is only needed
+# when this tracer is chosen.
+class OpenTelemetryTracer:
+    def __init__(self, instrumentation_name: str = "license_enrichment_processor"):
+        try:
+            from opentelemetry import trace
+        except ImportError as e:
+            raise ImportError(
+                "OpenTelemetry tracing needs the opentelemetry-api package"
+            ) from e
+        self._tracer = trace.get_tracer(instrumentation_name)
+
+    def span(
+        self, name: str, attributes: TracingAttributes | None = None
+    ) -> AbstractContextManager[Span]:
+        return self._tracer.start_as_current_span(name, attributes=attributes)
+
+
+# Runs a method, sync or async, in a span from the instance's tracer
+def traced(name: str) -> Callable[[F], F]:
+    def decorate(method: F) -> F:
+        if inspect.iscoroutinefunction(method):
+
+            @functools.wraps(method)
+            async def traced_coroutine(self, *args, **kwargs):
+                with self.tracer.span(name):
+                    return await method(self, *args, **kwargs)
+
+            return traced_coroutine
+
+        @functools.wraps(method)
+        def traced_method(self, *args, **kwargs):
+            with self.tracer.span(name):
+                return method(self, *args, **kwargs)
+
+        return traced_method
+
+    return decorate
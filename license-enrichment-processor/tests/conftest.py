@@ -0,0 +1,81 @@
+import os
+
+# config reads these when the package is imported; tests never reach either
+os.environ.setdefault("DEPENDENCY_TRACK_API_URL", "http://dependency-track.invalid")
+os.environ.setdefault("DEPENDENCY_TRACK_API_KEY", "test")
+os.environ.setdefault("DB_PATH", ":memory:")
+
+import asyncio
+import heapq
+import itertools
+import pytest
+from collections.abc import Coroutine
+from typing import Any, TypeVar
+from alembic import command
+from alembic.config import Config
+from license_enrichment_processor.lib.sqlite import SqliteConnectionPool
+
+T = TypeVar("T")
+
+ALEMBIC_SCRIPT_LOCATION = os.path.join(
+    os.path.dirname(__file__), "..", "license_enrichment_processor", "alembic"
+)
+
+
+@pytest.fixture
+def database_path(tmp_path) -> str:
+    path = str(tmp_path / "app.db")
+    alembic_config = Config()
+    alembic_config.set_main_option("script_location", ALEMBIC_SCRIPT_LOCATION)
+    alembic_config.set_main_option("sqlalchemy.url", f"sqlite:///{path}")
+    command.upgrade(alembic_config, "head")
+    return path
+
+
+@pytest.fixture
+def connection_pool(database_path):
+    connection_pool = SqliteConnectionPool(path=database_path, reader_count=2)
+    yield connection_pool
+    connection_pool.close()
+
+
+# Virtual time: once every task is waiting, time jumps to the earliest
+# sleeper's deadline and wakes it. Coroutines that sleep on the clock must be
+# driven with run().
+class FakeClock:
+    def __init__(self, now: float = 1000.0) -> None:
+        self.now = now
+        self._sleepers: list[tuple[float, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+
+    def monotonic(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float) -> None:
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(
+            self._sleepers, (self.now + seconds, next(self._sequence), future)
+        )
+        await future
+
+    def run(self, coroutine: Coroutine[Any, Any, T]) -> T:
+        return asyncio.run(self._drive(coroutine))
+
+    async def _drive(self, coroutine: Coroutine[Any, Any, T]) -> T:
+        task = asyncio.ensure_future(coroutine)
+        while True:
+            for _ in range(20):
+                await asyncio.sleep(0)
+            if task.done():
+                return task.result()
+            if len(self._sleepers) == 0:
+                raise RuntimeError("Every task is waiting, but none on the clock")
+            wake_at, _, future = heapq.heappop(self._sleepers)
+            self.now = max(self.now, wake_at)
+            if not future.done():
+                future.set_result(None)
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    return FakeClock()
@@ -0,0 +1,122 @@
+import asyncio
+import datetime
+import logging
+from packageurl import PackageURL
+from license_enrichment_processor.config import (
+    create_cache_refresher,
+    create_rate_limiter,
+)
+from license_enrichment_processor.lib.cache_refresh import (
+    CacheFreshness,
+    CacheRefresher,
+)
+from license_enrichment_processor.lib.date import DatetimeProvider
+from license_enrichment_processor.lib.http import HostCircuitBreakers
+from license_enrichment_processor.lib.license_data_source import (
+    LicenseDataSource,
+    RetrieveLicenseResult,
+)
+from license_enrichment_processor.lib.metrics import MetricsRegistry
+from license_enrichment_processor.lib.sbom import Component, ComponentLicenseDetails
+from license_enrichment_processor.lib.sqlite import SqliteDatabase
+
+NOW = datetime.datetime(2026, 10, 18, tzinfo=datetime.timezone.utc)
+
+FRESHNESS = CacheFreshness(
+    max_age_by_source={
+        "ClearlyDefined Declared": datetime.timedelta(days=7),
+        "Snyk": datetime.timedelta(days=30),
+    },
+    default_max_age=datetime.timedelta(days=14),
+)
+
+
+class RecordingSource(LicenseDataSource):
+    SOURCE_NAME = "RECORDING"
+
+    def __init__(self) -> None:
+        self.asked: list[str] = []
+
+    async def retrieve(self, component: Component) -> RetrieveLicenseResult:
+        self.asked.append(component.purl.to_string())
+        return ComponentLicenseDetails(license_expressions=[("MIT", "Snyk")])
+
+
+def cache(database: SqliteDatabase, purl: str, *sources: str) -> None:
+    database.cache_components(
+        [
+            Component(
+                uuid="",
+                purl=PackageURL.from_string(purl),
+                license_details=ComponentLicenseDetails(
+                    license_expressions=[("MIT", source) for source in sources]
+                ),
+            )
+        ]
+    )
+
+
+def create_refresher(database: SqliteDatabase, source: LicenseDataSource):
+    return CacheRefresher(
+        components_cache=database,
+        license_data_source=source,
+        freshness=FRESHNESS,
+        datetime_provider=DatetimeProvider.FromFunc(lambda: NOW),
+        logger=logging.getLogger("test"),
+        batch_size=2,
+    )
+
+
+def test_refresh_picks_entries_stale_for_one_of_their_sources(connection_pool):
+    now = NOW - datetime.timedelta(days=10)
+    database = SqliteDatabase(connection_pool, DatetimeProvider.FromFunc(lambda: now))
+    cache(database, "pkg:npm/snyk-only@1.0.0", "Snyk")
+    cache(database, "pkg:npm/clearly-defined@1.0.0", "ClearlyDefined Declared")
+    cache(database, "pkg:npm/both@1.0.0", "Snyk", "ClearlyDefined Declared")
+    cache(database, "pkg:npm/no-source-recent@1.0.0")
+    cache(database, "pkg:npm/other-source@1.0.0", "Elsewhere")
+    now = NOW - datetime.timedelta(days=20)
+    cache(database, "pkg:npm/no-source-old@1.0.0")
+    now = NOW
+    source = RecordingSource()
+    refresher = create_refresher(database, source)
+
+    async def sweep() -> list[int]:
+        examined = [await refresher.refresh_once()]
+        while examined[-1] > 0:
+            examined.append(await refresher.refresh_once())
+        return examined
+
+    assert asyncio.run(sweep()) == [2, 1, 0]
+    assert source.asked == [
+        "pkg:npm/no-source-old@1.0.0",
+        "pkg:npm/both@1.0.0",
+        "pkg:npm/clearly-defined@1.0.0",
+    ]
+    refreshed = database.get_components([PackageURL.from_string("pkg:npm/both@1.0.0")])
+    assert list(refreshed.values())[0].license_expressions == [("MIT", "Snyk")]
+
+
+def test_sweep_over_fresh_entries_ends_in_one_read(connection_pool):
+    now = NOW - datetime.timedelta(days=10)
+    database = SqliteDatabase(connection_pool, DatetimeProvider.FromFunc(lambda: now))
+    for i in range(50):
+        cache(database, f"pkg:npm/package-{i}@1.0.0", "Snyk")
+    source = RecordingSource()
+
+    assert asyncio.run(create_refresher(database, source).refresh_once()) == 0
+    assert source.asked == []
+
+
+def test_refresher_bypasses_the_in_memory_cache(connection_pool):
+    refresher = create_cache_refresher(
+        client_session=None,
+        circuit_breakers=HostCircuitBreakers(),
+        rate_limiter=create_rate_limiter(),
+        metrics=MetricsRegistry(),
+        connection_pool=connection_pool,
+        datetime_provider=DatetimeProvider.FromFunc(lambda: NOW),
+        logger=logging.getLogger("test"),
+    )
+
+    assert isinstance(refresher.components_cache, SqliteDatabase)
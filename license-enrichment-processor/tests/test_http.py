@@ -0,0 +1,194 @@
+import asyncio
+import logging
+import pytest
+import random
+from aiohttp import ClientConnectorError
+from aiohttp.client_reqrep import ConnectionKey
+from license_enrichment_processor.lib.http import (
+    CircuitBreaker,
+    CircuitOpenError,
+    HostCircuitBreakers,
+    HttpStatusError,
+    ResilientHttpClient,
+    RetryPolicy,
+)
+from license_enrichment_processor.lib.rate_limit import HostRateLimiter
+
+logger = logging.getLogger(__name__)
+
+URL = "https://api.clearlydefined.io/definitions"
+
+
+def connection_refused() -> ClientConnectorError:
+    return ClientConnectorError(
+        ConnectionKey("api.clearlydefined.io", 443, True, None, None, None, None),
+        OSError(111, "Connection refused"),
+    )
+
+
+class StubResponse:
+    def __init__(self, status: int, headers: dict[str, str] | None = None) -> None:
+        self.status = status
+        self.headers = headers or {}
+
+
+class _StubRequest:
+    def __init__(self, outcome: StubResponse | Exception) -> None:
+        self.outcome = outcome
+
+    async def __aenter__(self) -> StubResponse:
+        if isinstance(self.outcome, Exception):
+            raise self.outcome
+        return self.outcome
+
+    async def __aexit__(self, *exc_info) -> None:
+        pass
+
+
+# Plays back one scripted response or error per request
+class StubSession:
+    def __init__(self, *outcomes: StubResponse | Exception) -> None:
+        self.outcomes = list(outcomes)
+        self.requests: list[str] = []
+
+    def request(self, method: str, url, **kwargs) -> _StubRequest:
+        self.requests.append(method)
+        return _StubRequest(self.outcomes.pop(0))
+
+
+async def read_status(response: StubResponse) -> int:
+    return response.status
+
+
+def create_client(session, clock, rate_limiter=None) -> ResilientHttpClient:
+    return ResilientHttpClient(
+        session=session,
+        logger=logger,
+        retry_policy=RetryPolicy(
+            max_attempts=3, base_delay_seconds=1.0, max_delay_seconds=4.0
+        ),
+        circuit_breakers=HostCircuitBreakers(
+            failure_threshold=5, reset_timeout_seconds=30, clock=clock
+        ),
+        rate_limiter=rate_limiter,
+        clock=clock,
+    )
+
+
+def test_half_open_circuit_lets_a_single_probe_through(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout_seconds=10, clock=clock)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    clock.now += 10
+    assert breaker.allow()
+    assert breaker.state == "half-open"
+    assert not breaker.allow()
+
+    # A failed probe opens the circuit for another full period
+    breaker.record_failure()
+    assert breaker.state == "open"
+    clock.now += 9
+    assert not breaker.allow()
+    clock.now += 1
+    assert breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow() and breaker.allow()
+
+
+def test_open_circuit_fails_fast_without_a_request(clock):
+    session = StubSession(*[StubResponse(503)] * 5)
+    client = create_client(session, clock)
+
+    with pytest.raises(HttpStatusError):
+        clock.run(client.get(URL, read_status))
+    assert len(session.requests) == 3
+    # The fifth failure opens the circuit, so the last retry is never sent
+    with pytest.raises(CircuitOpenError):
+        clock.run(client.get(URL, read_status))
+    assert len(session.requests) == 5
+
+    with pytest.raises(CircuitOpenError):
+        clock.run(client.get(URL, read_status))
+    assert len(session.requests) == 5
+
+
+def test_idempotent_request_is_retried_on_server_errors(clock):
+    session = StubSession(StubResponse(503), StubResponse(502), StubResponse(200))
+
+    assert clock.run(create_client(session, clock).get(URL, read_status)) == 200
+    assert session.requests == ["GET", "GET", "GET"]
+
+
+@pytest.mark.parametrize(
+    "outcome",
+    [StubResponse(503), asyncio.TimeoutError()],
+    ids=["server error", "timeout"],
+)
+def test_post_is_not_retried_when_the_upstream_may_have_acted(clock, outcome):
+    session = StubSession(outcome, StubResponse(200))
+
+    with pytest.raises((HttpStatusError, asyncio.TimeoutError)):
+        clock.run(create_client(session, clock).post(URL, read_status))
+    assert session.requests == ["POST"]
+
+
+def test_post_is_retried_when_the_connection_was_never_made(clock):
+    session = StubSession(connection_refused(), StubResponse(200))
+
+    assert clock.run(create_client(session, clock).post(URL, read_status)) == 200
+    assert session.requests == ["POST", "POST"]
+
+
+def test_post_is_retried_after_429_once_retry_after_passes(clock):
+    session = StubSession(StubResponse(429, {"Retry-After": "7"}), StubResponse(200))
+    started = clock.now
+
+    assert clock.run(create_client(session, clock).post(URL, read_status)) == 200
+    assert session.requests == ["POST", "POST"]
+    assert clock.now - started >= 7
+
+
+def test_429_blocks_the_host_on_the_rate_limiter(clock):
+    rate_limiter = HostRateLimiter({"api.clearlydefined.io": (100, 1)}, clock=clock)
+    session = StubSession(StubResponse(429, {"Retry-After": "20"}), StubResponse(200))
+    client = create_client(session, clock, rate_limiter)
+    started = clock.now
+
+    async def post_and_queue_behind() -> list[float]:
+        finished = []
+
+        async def post() -> None:
+            await client.post(URL, read_status)
+            finished.append(clock.now - started)
+
+        async def acquire_later() -> None:
+            await clock.sleep(1)
+            await rate_limiter.acquire(URL)
+            finished.append(clock.now - started)
+
+        await asyncio.gather(post(), acquire_later())
+        return finished
+
+    # The retry's own backoff is at most a second; the 20s come from the
+    # block, which other callers for the host wait out as well
+    finished = clock.run(post_and_queue_behind())
+    assert len(finished) == 2 and min(finished) >= 20
+    assert session.requests == ["POST", "POST"]
+    assert client.circuit_breakers.get(URL).state == "closed"
+
+
+def test_retry_delay_stays_within_the_jitter_bounds():
+    policy = RetryPolicy(base_delay_seconds=0.5, max_delay_seconds=10.0)
+    random.seed(1234)
+    for attempt, bound in [(1, 0.5), (2, 1.0), (3, 2.0), (5, 8.0), (6, 10.0)]:
+        delays = [policy.delay(attempt) for _ in range(500)]
+        assert all(0 <= delay <= bound for delay in delays)
+        # Full jitter spreads over the whole range
+        assert min(delays) < bound * 0.1
+        assert max(delays) > bound * 0.9
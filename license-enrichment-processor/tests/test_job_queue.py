@@ -0,0 +1,83 @@
+import asyncio
+import datetime
+import logging
+from license_enrichment_processor.lib.date import DatetimeProvider
+from license_enrichment_processor.lib.job_queue import EnrichmentJobQueue, JobStatus
+from license_enrichment_processor.lib.license_enrichment_processor import (
+    BomProcessedEvent,
+    EnrichmentRunStats,
+)
+
+
+class BlockingProcessor:
+    def __init__(self) -> None:
+        self.started: list[str] = []
+        self.releases: dict[str, asyncio.Event] = dict()
+
+    async def enrich_from_bom_processed_event(
+        self, event: BomProcessedEvent
+    ) -> EnrichmentRunStats:
+        self.started.append(event.content)
+        release = self.releases.setdefault(event.project.uuid, asyncio.Event())
+        await release.wait()
+        release.clear()
+        return EnrichmentRunStats()
+
+    def release(self, project_uuid: str) -> None:
+        self.releases[project_uuid].set()
+
+
+def bom_processed_event(project_uuid: str, content: str) -> BomProcessedEvent:
+    return BomProcessedEvent(
+        timestamp=datetime.datetime.now(),
+        content=content,
+        project=BomProcessedEvent.Project(
+            uuid=project_uuid, name=project_uuid, version="1.0"
+        ),
+    )
+
+
+async def settle() -> None:
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+def test_waiting_run_of_a_busy_project_does_not_hold_a_worker():
+    async def scenario():
+        processor = BlockingProcessor()
+        job_queue = EnrichmentJobQueue(
+            processor=processor,
+            datetime_provider=DatetimeProvider.FromOffsetHours(7),
+            logger=logging.getLogger(__name__),
+            worker_count=2,
+        )
+        await job_queue.start()
+        first = await job_queue.enqueue(bom_processed_event("a", "a1"))
+        await settle()
+        second = await job_queue.enqueue(bom_processed_event("a", "a2"))
+        await settle()
+        other = await job_queue.enqueue(bom_processed_event("b", "b1"))
+        await settle()
+
+        # Both workers were free for b while a2 waited on a1
+        assert processor.started == ["a1", "b1"]
+        assert second.status == JobStatus.QUEUED
+        assert job_queue.queue_depth() == 1
+        coalesced = await job_queue.enqueue(bom_processed_event("a", "a3"))
+        assert coalesced is second
+
+        processor.release("a")
+        await settle()
+        assert first.status == JobStatus.SUCCEEDED
+        assert second.status == JobStatus.RUNNING
+        assert processor.started == ["a1", "b1", "a3"]
+        assert job_queue.queue_depth() == 0
+
+        processor.release("a")
+        processor.release("b")
+        await settle()
+        assert second.status == JobStatus.SUCCEEDED
+        assert other.status == JobStatus.SUCCEEDED
+        await job_queue.stop()
+
+    asyncio.run(scenario())
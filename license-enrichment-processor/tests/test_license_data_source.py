@@ -0,0 +1,296 @@
+import asyncio
+import logging
+import os
+import pytest
+from aiohttp import ClientSession, web
+from aiohttp.test_utils import TestServer
+from packageurl import PackageURL
+from license_enrichment_processor.config import DEFAULT_LICENSE_DATA_SOURCES
+from license_enrichment_processor.lib.http import ResilientHttpClient
+from license_enrichment_processor.lib.license_data_source import (
+    LicenseDataSource,
+    LicenseDataSourceClearlyDefined,
+    LicenseDataSourceComposite,
+    LicenseDataSourceSnyk,
+    RetrieveLicenseResult,
+)
+from license_enrichment_processor.lib.license_enrichment_processor import (
+    LicenseEnrichmentProcessor,
+)
+from license_enrichment_processor.lib.sbom import Component, ComponentLicenseDetails
+
+logger = logging.getLogger(__name__)
+
+
+def component(purl: str) -> Component:
+    return Component(
+        uuid=purl,
+        purl=PackageURL.from_string(purl),
+        license_details=ComponentLicenseDetails(),
+    )
+
+
+def definition(license_expression: str) -> dict:
+    return {"licensed": {"declared": license_expression}}
+
+
+# Knows definitions by their literal coordinates, like ClearlyDefined
+class ClearlyDefinedStub:
+    def __init__(self, definitions: dict[str, dict]) -> None:
+        self.definitions = definitions
+        self.batch_bodies: list[list[str]] = []
+        self.requested_paths: list[str] = []
+        self.app = web.Application()
+        self.app.router.add_post("/definitions", self.post_definitions)
+        self.app.router.add_get("/definitions/{coordinates:.+}", self.get_definition)
+
+    async def post_definitions(self, request: web.Request) -> web.Response:
+        coordinates = await request.json()
+        self.batch_bodies.append(coordinates)
+        return web.json_response(
+            {it: self.definitions.get(it, {}) for it in coordinates}
+        )
+
+    async def get_definition(self, request: web.Request) -> web.Response:
+        self.requested_paths.append(request.raw_path)
+        definition = self.definitions.get(request.match_info["coordinates"])
+        if definition is None:
+            return web.json_response({}, status=404)
+        return web.json_response(definition)
+
+
+def with_clearly_defined(stub: ClearlyDefinedStub, scenario):
+    async def run():
+        async with TestServer(stub.app) as server, ClientSession() as session:
+            source = LicenseDataSourceClearlyDefined(
+                http_client=ResilientHttpClient(session, logger),
+                logger=logger,
+                api_url=str(server.make_url("")).rstrip("/"),
+            )
+            return await scenario(source)
+
+    return asyncio.run(run())
+
+
+def test_batch_sends_scoped_npm_coordinates_literally():
+    stub = ClearlyDefinedStub(
+        {
+            "npm/npmjs/@babel/core/7.0.0": definition("MIT"),
+            "maven/mavencentral/org.apache.commons/commons-lang3/3.12.0": definition(
+                "Apache-2.0"
+            ),
+        }
+    )
+    scoped = component("pkg:npm/%40babel/core@7.0.0")
+    unscoped = component("pkg:maven/org.apache.commons/commons-lang3@3.12.0")
+
+    results = with_clearly_defined(
+        stub, lambda source: source.retrieve_many([scoped, unscoped])
+    )
+
+    assert stub.batch_bodies == [
+        [
+            "npm/npmjs/@babel/core/7.0.0",
+            "maven/mavencentral/org.apache.commons/commons-lang3/3.12.0",
+        ]
+    ]
+    assert results[scoped.purl].license_expressions == [
+        ("MIT", "ClearlyDefined Declared")
+    ]
+    assert results[unscoped.purl].license_expressions == [
+        ("Apache-2.0", "ClearlyDefined Declared")
+    ]
+
+
+def test_single_lookup_percent_encodes_the_url():
+    stub = ClearlyDefinedStub({"npm/npmjs/@babel/core/7.0.0": definition("MIT")})
+    scoped = component("pkg:npm/%40babel/core@7.0.0")
+
+    result = with_clearly_defined(stub, lambda source: source.retrieve(scoped))
+
+    assert stub.requested_paths == ["/definitions/npm/npmjs/%40babel/core/7.0.0"]
+    assert result.license_expressions == [("MIT", "ClearlyDefined Declared")]
+
+
+class StubSource(LicenseDataSource):
+    def __init__(self, name: str, results: dict[str, RetrieveLicenseResult]) -> None:
+        self.SOURCE_NAME = name
+        self.results = results
+        self.asked: list[str] = []
+
+    async def retrieve(self, component: Component) -> RetrieveLicenseResult:
+        self.asked.append(component.purl.to_string())
+        return self.results.get(component.purl.to_string())
+
+
+def details(*license_expressions: tuple[str, str], **kwargs) -> ComponentLicenseDetails:
+    return ComponentLicenseDetails(
+        license_expressions=list(license_expressions), **kwargs
+    )
+
+
+def test_composite_asks_fallbacks_only_about_unanswered_components():
+    answered = component("pkg:npm/answered@1.0.0")
+    attribution_only = component("pkg:npm/attribution-only@1.0.0")
+    failed = component("pkg:npm/failed@1.0.0")
+    missing = component("pkg:npm/missing@1.0.0")
+    error = Exception("ClearlyDefined is down")
+    primary = StubSource(
+        "PRIMARY",
+        {
+            "pkg:npm/answered@1.0.0": details(("MIT", "ClearlyDefined Declared")),
+            "pkg:npm/attribution-only@1.0.0": details(
+                attributions=[("Jane Doe", "ClearlyDefined Discovered")]
+            ),
+            "pkg:npm/failed@1.0.0": error,
+        },
+    )
+    fallback = StubSource(
+        "FALLBACK",
+        {
+            "pkg:npm/answered@1.0.0": details(("GPL-3.0", "Snyk")),
+            "pkg:npm/attribution-only@1.0.0": details(("ISC", "Snyk")),
+        },
+    )
+    last_resort = StubSource("LAST_RESORT", {})
+    composite = LicenseDataSourceComposite([primary, fallback, last_resort])
+
+    results = asyncio.run(
+        composite.retrieve_many([answered, attribution_only, failed, missing])
+    )
+
+    assert fallback.asked == [
+        "pkg:npm/attribution-only@1.0.0",
+        "pkg:npm/failed@1.0.0",
+        "pkg:npm/missing@1.0.0",
+    ]
+    assert last_resort.asked == ["pkg:npm/failed@1.0.0", "pkg:npm/missing@1.0.0"]
+    assert results[answered.purl] == details(("MIT", "ClearlyDefined Declared"))
+    assert results[attribution_only.purl] == details(
+        ("ISC", "Snyk"), attributions=[("Jane Doe", "ClearlyDefined Discovered")]
+    )
+    assert results[failed.purl] is error
+    assert results[missing.purl] is None
+
+
+SNYK_PACKAGE_PAGE = os.path.join(
+    os.path.dirname(__file__), "fixtures", "snyk_package_page.html"
+)
+
+
+def test_default_sources_are_asked_in_priority_order():
+    # The label each source puts on the license expressions it returns
+    expression_sources = {
+        "snyk": "Snyk",
+        "clearlydefined": "ClearlyDefined Declared",
+    }
+    priorities = [
+        LicenseEnrichmentProcessor.SOURCE_PRIORITY_ORDER[expression_sources[name]]
+        for name in DEFAULT_LICENSE_DATA_SOURCES.split(",")
+    ]
+
+    assert priorities == sorted(priorities, reverse=True)
+
+
+def test_composite_keeps_the_higher_priority_answer():
+    both = component("pkg:npm/both@1.0.0")
+    snyk = StubSource("SNYK", {"pkg:npm/both@1.0.0": details(("MIT", "Snyk"))})
+    clearly_defined = StubSource(
+        "CLEARLY_DEFINED",
+        {
+            "pkg:npm/both@1.0.0": details(
+                ("MIT OR Apache-2.0", "ClearlyDefined Declared")
+            )
+        },
+    )
+    composite = LicenseDataSourceComposite([snyk, clearly_defined])
+
+    results = asyncio.run(composite.retrieve_many([both]))
+
+    assert clearly_defined.asked == []
+    assert results[both.purl].license_expressions == [("MIT", "Snyk")]
+
+
+def snyk_source(api_url: str = "https://security.snyk.io", session=None):
+    return LicenseDataSourceSnyk(
+        http_client=ResilientHttpClient(session, logger), logger=logger, api_url=api_url
+    )
+
+
+@pytest.mark.parametrize(
+    "purl, url",
+    [
+        (
+            "pkg:maven/org.apache.commons/commons-lang3@3.12.0",
+            "https://security.snyk.io/package/maven/org.apache.commons%3Acommons-lang3/3.12.0",
+        ),
+        (
+            "pkg:npm/%40babel/core@7.0.0",
+            "https://security.snyk.io/package/npm/%40babel%2Fcore/7.0.0",
+        ),
+        (
+            "pkg:npm/lodash@4.17.21",
+            "https://security.snyk.io/package/npm/lodash/4.17.21",
+        ),
+        (
+            "pkg:golang/github.com/gorilla/mux@v1.8.0",
+            "https://security.snyk.io/package/golang/github.com%2Fgorilla%2Fmux/v1.8.0",
+        ),
+        (
+            "pkg:pypi/requests@2.31.0",
+            "https://security.snyk.io/package/pip/requests/2.31.0",
+        ),
+        (
+            "pkg:gem/rails@7.1.0",
+            "https://security.snyk.io/package/rubygems/rails/7.1.0",
+        ),
+    ],
+)
+def test_snyk_url(purl, url):
+    assert str(snyk_source()._create_snyk_url(component(purl))) == url
+
+
+@pytest.mark.parametrize("purl", ["pkg:deb/debian/curl@7.88.1", "pkg:npm/lodash"])
+def test_snyk_url_without_ecosystem_or_version(purl):
+    assert snyk_source()._create_snyk_url(component(purl)) is None
+
+
+def test_snyk_page_is_read_only_up_to_the_license():
+    with open(SNYK_PACKAGE_PAGE, "rb") as f:
+        page = f.read()
+
+    async def chunks():
+        for i in range(0, len(page), LicenseDataSourceSnyk._READ_CHUNK_SIZE):
+            yield page[i : i + LicenseDataSourceSnyk._READ_CHUNK_SIZE]
+
+    license_expression, bytes_read = asyncio.run(
+        snyk_source()._read_license_expression(chunks())
+    )
+
+    assert license_expression == "(MIT)"
+    # The span sits about 44 KB into the 180 KB page
+    assert bytes_read == 3 * LicenseDataSourceSnyk._READ_CHUNK_SIZE
+    assert bytes_read < len(page)
+
+
+def test_snyk_retrieve_from_page():
+    with open(SNYK_PACKAGE_PAGE, "rb") as f:
+        page = f.read()
+    requested_paths = []
+
+    async def get_package(request: web.Request) -> web.Response:
+        requested_paths.append(request.raw_path)
+        return web.Response(body=page, content_type="text/html")
+
+    app = web.Application()
+    app.router.add_get("/package/{tail:.+}", get_package)
+
+    async def run():
+        async with TestServer(app) as server, ClientSession() as session:
+            source = snyk_source(str(server.make_url("")).rstrip("/"), session)
+            return await source.retrieve(component("pkg:npm/lodash@4.17.21"))
+
+    result = asyncio.run(run())
+
+    assert requested_paths == ["/package/npm/lodash/4.17.21"]
+    assert result == ComponentLicenseDetails(license_expressions=[("MIT", "Snyk")])
@@ -0,0 +1,120 @@
+import asyncio
+import datetime
+import logging
+from packageurl import PackageURL
+from license_enrichment_processor.lib.concurrency import AdaptiveConcurrencyLimiter
+from license_enrichment_processor.lib.date import DatetimeProvider
+from license_enrichment_processor.lib.dependency_track import DependencyTrack
+from license_enrichment_processor.lib.license_enrichment_processor import (
+    BomProcessedEvent,
+    LicenseEnrichmentProcessor,
+)
+from license_enrichment_processor.lib.sbom import Component, ComponentLicenseDetails
+
+NOW = datetime.datetime(2026, 10, 18, 12, 0, tzinfo=datetime.timezone.utc)
+PROJECT = BomProcessedEvent.Project(uuid="project", name="project", version="1")
+
+
+def listed_component(i: int) -> Component:
+    return Component(
+        uuid=f"component-{i}",
+        purl=PackageURL.from_string(f"pkg:npm/package-{i}@1.0.{i}"),
+        license_details=ComponentLicenseDetails(
+            license_expressions=[("ISC", DependencyTrack.SOURCE_NAME)],
+            attributions=[],
+            source_urls=[],
+        ),
+    )
+
+
+class DependencyTrackStub:
+    def __init__(self, components: list[Component]) -> None:
+        self.components = components
+        self.updated: list[tuple[str, str]] = []
+
+    async def iter_components(self, project_uuid: str):
+        yield self.components
+
+    async def update_component_license_expression(
+        self, component_uuid: str, license_expression: str, component_payload=None
+    ) -> None:
+        self.updated.append((component_uuid, license_expression))
+
+
+# Every PURL is cached with a license Dependency-Track does not hold yet
+class ComponentsCacheStub:
+    def get_components(self, purls: list[PackageURL]):
+        return {
+            purl: ComponentLicenseDetails(
+                license_expressions=[("MIT", "ClearlyDefined Declared")],
+                attributions=[],
+                source_urls=[],
+            )
+            for purl in purls
+        }
+
+
+class NothingRemembered:
+    def recall_many(self, purls, **kwargs):
+        return set()
+
+
+def create_processor(dependency_track, update_limiter):
+    return LicenseEnrichmentProcessor(
+        dependency_track=dependency_track,
+        components_cache=ComponentsCacheStub(),
+        retry_memory=NothingRemembered(),
+        negative_cache=NothingRemembered(),
+        license_data_source=None,
+        datetime_provider=DatetimeProvider.FromFunc(lambda: NOW),
+        not_found_ttl=datetime.timedelta(days=1),
+        logger=logging.getLogger("test"),
+        update_limiter=update_limiter,
+    )
+
+
+def enrich(processor: LicenseEnrichmentProcessor, task_factory=None):
+    event = BomProcessedEvent(timestamp=NOW, content="", project=PROJECT)
+
+    async def run():
+        if task_factory is not None:
+            asyncio.get_running_loop().set_task_factory(task_factory)
+        return await processor.enrich_from_bom_processed_event(event)
+
+    return asyncio.run(run())
+
+
+def test_updates_release_their_slots():
+    dependency_track = DependencyTrackStub([listed_component(i) for i in range(3)])
+    update_limiter = AdaptiveConcurrencyLimiter(max_limit=2)
+
+    stats = enrich(create_processor(dependency_track, update_limiter))
+
+    assert stats.updated == 3
+    assert sorted(dependency_track.updated) == [
+        (f"component-{i}", "MIT") for i in range(3)
+    ]
+    assert update_limiter.in_flight == 0
+
+
+def test_update_cancelled_before_it_starts_gives_its_slot_back():
+    dependency_track = DependencyTrackStub([listed_component(i) for i in range(3)])
+    update_limiter = AdaptiveConcurrencyLimiter(max_limit=4)
+
+    # Cancels every update task before its first step, as write_back does
+    # when a failing run reaches it before the task was scheduled
+    def cancel_updates_on_creation(loop, coro):
+        task = asyncio.Task(coro, loop=loop)
+        if coro.__qualname__.endswith("update_and_record"):
+            task.cancel()
+        return task
+
+    stats = enrich(
+        create_processor(dependency_track, update_limiter),
+        cancel_updates_on_creation,
+    )
+
+    assert stats.updated == 0
+    assert dependency_track.updated == []
+    assert update_limiter.in_flight == 0
+    assert update_limiter.limit == 4
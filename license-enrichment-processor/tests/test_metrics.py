@@ -0,0 +1,64 @@
+import pytest
+from license_enrichment_processor.lib.metrics import MetricsRegistry
+
+
+def test_render_escapes_label_values_and_help():
+    metrics = MetricsRegistry()
+    counter = metrics.counter(
+        "requests_total", 'Requests by "path" under C:\\\nsecond line', ["path"]
+    )
+    counter.labels('C:\\temp\n"quoted"').inc()
+    counter.labels("/plain").inc(2)
+
+    assert metrics.render() == (
+        '# HELP requests_total Requests by "path" under C:\\\\\\nsecond line\n'
+        "# TYPE requests_total counter\n"
+        'requests_total{path="/plain"} 2\n'
+        'requests_total{path="C:\\\\temp\\n\\"quoted\\""} 1\n'
+    )
+
+
+def test_histogram_buckets_are_cumulative():
+    metrics = MetricsRegistry()
+    histogram = metrics.histogram(
+        "duration_seconds", "Duration", ["stage"], buckets=[1, 0.1, 0.5]
+    )
+    for value in (0.05, 0.1, 0.3, 0.7, 4):
+        histogram.labels("fetch").observe(value)
+
+    assert metrics.render().splitlines() == [
+        "# HELP duration_seconds Duration",
+        "# TYPE duration_seconds histogram",
+        'duration_seconds_bucket{stage="fetch",le="0.1"} 2',
+        'duration_seconds_bucket{stage="fetch",le="0.5"} 3',
+        'duration_seconds_bucket{stage="fetch",le="1"} 4',
+        'duration_seconds_bucket{stage="fetch",le="+Inf"} 5',
+        'duration_seconds_sum{stage="fetch"} 5.15',
+        'duration_seconds_count{stage="fetch"} 5',
+    ]
+
+
+def test_gauges_and_collectors():
+    metrics = MetricsRegistry()
+    depth = metrics.gauge("queue_depth", "Jobs waiting")
+    queue = ["a", "b", "c"]
+    metrics.on_collect(lambda: depth.set(len(queue)))
+
+    assert "queue_depth 3\n" in metrics.render()
+    queue.pop()
+    assert "queue_depth 2\n" in metrics.render()
+
+
+def test_registering_twice_shares_the_metric():
+    metrics = MetricsRegistry()
+    first = metrics.counter("runs_total", "Runs", ["outcome"])
+    second = metrics.counter("runs_total", "Runs", ["outcome"])
+    first.labels("ok").inc()
+    second.labels("ok").inc()
+
+    assert first is second
+    assert 'runs_total{outcome="ok"} 2\n' in metrics.render()
+    with pytest.raises(ValueError):
+        metrics.gauge("runs_total", "Runs", ["outcome"])
+    with pytest.raises(ValueError):
+        first.labels("ok", "extra")
@@ -0,0 +1,257 @@
+import asyncio
+import datetime
+import logging
+from packageurl import PackageURL
+from license_enrichment_processor.lib.concurrency import AdaptiveConcurrencyLimiter
+from license_enrichment_processor.lib.date import DatetimeProvider
+from license_enrichment_processor.lib.dependency_track import DependencyTrack
+from license_enrichment_processor.lib.license_enrichment_processor import (
+    BomProcessedEvent,
+    LicenseEnrichmentProcessor,
+)
+from license_enrichment_processor.lib.project_state import project_digest
+from license_enrichment_processor.lib.sbom import Component, ComponentLicenseDetails
+from license_enrichment_processor.lib.sqlite import SqliteProjectStateStore
+
+NOW = datetime.datetime(2026, 10, 18, 12, 0, tzinfo=datetime.timezone.utc)
+PROJECT = BomProcessedEvent.Project(uuid="project", name="project", version="1")
+
+
+def listed_component(i: int, license_expression: str = "MIT") -> Component:
+    return Component(
+        uuid=f"component-{i}",
+        purl=PackageURL.from_string(f"pkg:npm/package-{i}@1.0.{i}"),
+        license_details=ComponentLicenseDetails(
+            license_expressions=[(license_expression, DependencyTrack.SOURCE_NAME)],
+            attributions=[],
+            source_urls=[],
+        ),
+    )
+
+
+class DependencyTrackStub:
+    def __init__(self, pages: list[list[Component]], events: list | None = None):
+        self.pages = pages
+        self.events = [] if events is None else events
+
+    async def iter_components(self, project_uuid: str):
+        for i, page in enumerate(self.pages):
+            # Each page is a request, which lets other stages run
+            await asyncio.sleep(0)
+            self.events.append(("list", i))
+            yield page
+
+
+# Knows every PURL but the missing ones, with the license Dependency-Track
+# already holds
+class ComponentsCacheStub:
+    def __init__(self, missing: set[str] = set(), events: list | None = None):
+        self.missing = missing
+        self.events = [] if events is None else events
+        self.looked_up: list[PackageURL] = []
+
+    def get_components(self, purls: list[PackageURL]):
+        self.looked_up += purls
+        self.events.append(("look_up", len(purls)))
+        return {
+            purl: ComponentLicenseDetails(
+                license_expressions=[("MIT", "clearlydefined")],
+                attributions=[],
+                source_urls=[],
+            )
+            for purl in purls
+            if purl.to_string() not in self.missing
+        }
+
+    def cache_components(self, components: list[Component]) -> None:
+        pass
+
+
+class NothingRemembered:
+    def recall_many(self, purls, **kwargs):
+        return set()
+
+    def remember_many(self, purls, timestamp) -> None:
+        pass
+
+    def forget_many(self, purls) -> None:
+        pass
+
+
+class KnownMissing(NothingRemembered):
+    def __init__(self, purls: set[str]) -> None:
+        self.purls = purls
+
+    def recall_many(self, purls, **kwargs):
+        return {purl for purl in purls if purl.to_string() in self.purls}
+
+
+class NothingFound:
+    SOURCE_NAME = "NOTHING"
+
+    async def retrieve_many(self, components: list[Component]):
+        return {component.purl: None for component in components}
+
+
+class CountingProjectStateStore(SqliteProjectStateStore):
+    def __init__(self, connection_pool) -> None:
+        super().__init__(connection_pool)
+        self.component_loads = 0
+
+    def get_components(self, project_uuid: str):
+        self.component_loads += 1
+        return super().get_components(project_uuid)
+
+
+def create_processor(
+    pages,
+    components_cache,
+    project_state,
+    negative_cache=NothingRemembered(),
+    events=None,
+    now=NOW,
+):
+    return LicenseEnrichmentProcessor(
+        dependency_track=DependencyTrackStub(pages, events),
+        components_cache=components_cache,
+        retry_memory=NothingRemembered(),
+        negative_cache=negative_cache,
+        license_data_source=NothingFound(),
+        datetime_provider=DatetimeProvider.FromFunc(lambda: now),
+        not_found_ttl=datetime.timedelta(days=1),
+        logger=logging.getLogger("test"),
+        update_limiter=AdaptiveConcurrencyLimiter(max_limit=1),
+        project_state=project_state,
+    )
+
+
+def enrich(processor: LicenseEnrichmentProcessor):
+    event = BomProcessedEvent(
+        timestamp=processor.datetime_provider.now(), content="", project=PROJECT
+    )
+    return asyncio.run(processor.enrich_from_bom_processed_event(event))
+
+
+def test_snapshot_round_trip(connection_pool):
+    store = SqliteProjectStateStore(connection_pool)
+    rows = {"a": ("pkg:npm/a@1", "MIT"), "b": ("pkg:npm/b@1", None)}
+
+    assert store.get_fingerprint("project") is None
+    store.save_snapshot("project", rows, NOW, full_run_at=NOW)
+
+    fingerprint = store.get_fingerprint("project")
+    assert fingerprint.digest == project_digest(rows)
+    assert fingerprint.component_count == 2
+    assert fingerprint.updated_at == NOW
+    assert fingerprint.full_run_at == NOW
+    assert store.get_components("project") == rows
+
+    later = NOW + datetime.timedelta(hours=1)
+    store.save_snapshot("project", rows, later, full_run_at=NOW)
+    assert store.get_fingerprint("project").updated_at == later
+    assert store.get_fingerprint("project").full_run_at == NOW
+    assert store.get_components("project") == rows
+
+    changed = {"a": ("pkg:npm/a@1", "MIT")}
+    store.save_snapshot("project", changed, later, full_run_at=later)
+    assert store.get_fingerprint("project").digest == project_digest(changed)
+    assert store.get_components("project") == changed
+
+
+def test_matching_digest_skips_the_per_component_comparison(connection_pool):
+    pages = [[listed_component(i) for i in range(page, page + 3)] for page in (0, 3)]
+    project_state = CountingProjectStateStore(connection_pool)
+
+    first_cache = ComponentsCacheStub()
+    first = enrich(create_processor(pages, first_cache, project_state))
+    assert first.unchanged == 0
+    assert len(first_cache.looked_up) == 6
+
+    second_cache = ComponentsCacheStub()
+    second = enrich(create_processor(pages, second_cache, project_state))
+    assert second.unchanged == 6
+    assert second_cache.looked_up == []
+    assert project_state.component_loads == 0
+
+
+def test_changed_digest_compares_each_component(connection_pool):
+    project_state = CountingProjectStateStore(connection_pool)
+    pages = [[listed_component(i) for i in range(4)]]
+    enrich(create_processor(pages, ComponentsCacheStub(), project_state))
+
+    pages = [[listed_component(0, "Apache-2.0")] + pages[0][1:]]
+    components_cache = ComponentsCacheStub()
+    stats = enrich(create_processor(pages, components_cache, project_state))
+
+    assert stats.unchanged == 3
+    assert components_cache.looked_up == [pages[0][0].purl]
+    assert project_state.component_loads == 1
+
+
+def test_settled_misses_keep_the_digest_stable(connection_pool):
+    pages = [[listed_component(i) for i in range(6)]]
+    fetched_miss = pages[0][4].purl.to_string()
+    known_miss = pages[0][5].purl.to_string()
+    project_state = CountingProjectStateStore(connection_pool)
+
+    first = enrich(
+        create_processor(
+            pages,
+            ComponentsCacheStub(missing={fetched_miss, known_miss}),
+            project_state,
+            negative_cache=KnownMissing({known_miss}),
+        )
+    )
+    assert (first.not_found, first.known_not_found) == (1, 1)
+    assert project_state.get_fingerprint(PROJECT.uuid).component_count == 6
+
+    components_cache = ComponentsCacheStub()
+    second = enrich(create_processor(pages, components_cache, project_state))
+    assert second.unchanged == 6
+    assert components_cache.looked_up == []
+    assert project_state.component_loads == 0
+
+
+def test_pages_go_on_once_the_project_outgrows_the_snapshot(connection_pool):
+    project_state = CountingProjectStateStore(connection_pool)
+    enrich(
+        create_processor(
+            [[listed_component(i) for i in range(2)]],
+            ComponentsCacheStub(),
+            project_state,
+        )
+    )
+
+    events = []
+    pages = [[listed_component(i) for i in range(page, page + 3)] for page in (0, 3)]
+    stats = enrich(
+        create_processor(
+            pages, ComponentsCacheStub(events=events), project_state, events=events
+        )
+    )
+
+    assert stats.unchanged == 2
+    assert events == [("list", 0), ("look_up", 1), ("list", 1), ("look_up", 3)]
+    assert project_state.component_loads == 1
+
+
+def test_frequent_uploads_still_get_a_full_run_once_a_day(connection_pool):
+    pages = [[listed_component(i) for i in range(3)]]
+    project_state = CountingProjectStateStore(connection_pool)
+    looked_up_by_hour = {}
+    for hours in (0, 12, 23, 26, 30):
+        components_cache = ComponentsCacheStub()
+        enrich(
+            create_processor(
+                pages,
+                components_cache,
+                project_state,
+                now=NOW + datetime.timedelta(hours=hours),
+            )
+        )
+        looked_up_by_hour[hours] = len(components_cache.looked_up)
+
+    assert looked_up_by_hour == {0: 3, 12: 0, 23: 0, 26: 3, 30: 0}
+    fingerprint = project_state.get_fingerprint(PROJECT.uuid)
+    assert fingerprint.updated_at == NOW + datetime.timedelta(hours=30)
+    assert fingerprint.full_run_at == NOW + datetime.timedelta(hours=26)
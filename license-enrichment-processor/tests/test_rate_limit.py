@@ -0,0 +1,160 @@
+import asyncio
+import pytest
+from license_enrichment_processor.lib.rate_limit import (
+    BackgroundRateLimiter,
+    HostRateLimiter,
+    TokenBucket,
+    parse_retry_after,
+)
+
+
+def acquire_all(bucket: TokenBucket, count: int) -> list[float]:
+    async def scenario():
+        return await asyncio.gather(*(bucket.acquire() for _ in range(count)))
+
+    return bucket.clock.run(scenario())
+
+
+def test_burst_is_served_without_waiting(clock):
+    bucket = TokenBucket(rate=5, capacity=10, clock=clock)
+    started = clock.monotonic()
+
+    waits = acquire_all(bucket, 10)
+
+    assert waits == [0.0] * 10
+    assert clock.monotonic() == started
+
+
+def test_steady_state_rate_matches_configured_rate(clock):
+    bucket = TokenBucket(rate=5, capacity=10, clock=clock)
+    started = clock.monotonic()
+
+    acquire_all(bucket, 10 + 500)
+
+    # The burst is free; the other 500 requests are paced at 5 per second
+    elapsed = clock.monotonic() - started
+    assert elapsed == pytest.approx(100)
+    assert 500 / elapsed == pytest.approx(5)
+
+
+def test_refills_up_to_capacity_while_idle(clock):
+    bucket = TokenBucket(rate=5, capacity=10, clock=clock)
+    acquire_all(bucket, 10)
+    clock.now += 60
+    started = clock.monotonic()
+
+    acquire_all(bucket, 10)
+    assert clock.monotonic() == started
+    acquire_all(bucket, 1)
+    assert clock.monotonic() - started == pytest.approx(0.2)
+
+
+def test_block_for_stops_requests_and_accrual(clock):
+    bucket = TokenBucket(rate=5, capacity=10, clock=clock)
+    acquire_all(bucket, 3)
+    started = clock.monotonic()
+
+    bucket.block_for(30)
+    waits = acquire_all(bucket, 2)
+
+    # Remaining tokens are dropped and none accrue during the block
+    assert waits[0] == pytest.approx(30.2)
+    assert clock.monotonic() - started == pytest.approx(30.4)
+
+
+def test_host_rate_limiter_keeps_hosts_apart(clock):
+    rate_limiter = HostRateLimiter(
+        {"api.clearlydefined.io": (5, 1), "security.snyk.io": (1, 1)}, clock=clock
+    )
+
+    async def scenario():
+        await rate_limiter.acquire("https://api.clearlydefined.io/definitions")
+        rate_limiter.block_for("https://security.snyk.io/package/npm/a", None)
+        started = clock.monotonic()
+        await rate_limiter.acquire("https://api.clearlydefined.io/definitions")
+        clearly_defined_wait = clock.monotonic() - started
+        await rate_limiter.acquire("https://example.com/")
+        assert clock.monotonic() - started == clearly_defined_wait
+        await rate_limiter.acquire("https://security.snyk.io/package/npm/a")
+        return clearly_defined_wait, clock.monotonic() - started
+
+    clearly_defined_wait, snyk_wait = clock.run(scenario())
+
+    assert not rate_limiter.limits("https://example.com/")
+    assert clearly_defined_wait == pytest.approx(0.2)
+    assert snyk_wait == pytest.approx(HostRateLimiter.DEFAULT_RETRY_AFTER_SECONDS + 1)
+
+
+def test_parse_retry_after():
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("120") == 120
+    assert parse_retry_after("-5") == 0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0
+    assert parse_retry_after("soon") is None
+
+
+CLEARLY_DEFINED_URL = "https://api.clearlydefined.io/definitions"
+
+
+def shared_and_background_limiters(clock, background_rate: float = 50):
+    shared = HostRateLimiter({"api.clearlydefined.io": (5, 10)}, clock=clock)
+    background = BackgroundRateLimiter(
+        shared, {"api.clearlydefined.io": (background_rate, 1)}, clock=clock
+    )
+    return shared, background
+
+
+def test_background_requests_stay_within_the_shared_rate(clock):
+    shared, background = shared_and_background_limiters(clock)
+    started = clock.monotonic()
+    grants: list[tuple[str, float]] = []
+
+    async def request(rate_limiter, kind: str) -> None:
+        await rate_limiter.acquire(CLEARLY_DEFINED_URL)
+        grants.append((kind, clock.monotonic() - started))
+
+    async def background_requests() -> None:
+        for _ in range(100):
+            await request(background, "background")
+
+    async def scenario():
+        live = asyncio.gather(*(request(shared, "live") for _ in range(60)))
+        await asyncio.sleep(0)
+        background_task = asyncio.ensure_future(background_requests())
+        await live
+        live_finished = clock.monotonic() - started
+        await background_task
+        return live_finished
+
+    live_finished = clock.run(scenario())
+
+    # Live traffic finishes as if it had the bucket to itself
+    assert live_finished == pytest.approx((60 - 10) / 5)
+    assert len(grants) == 160
+    for i, (_, elapsed) in enumerate(grants):
+        assert i + 1 <= 10 + 5 * elapsed + 1e-6
+
+
+def test_background_requests_leave_part_of_the_burst(clock):
+    shared, background = shared_and_background_limiters(clock, background_rate=1000)
+
+    async def scenario():
+        for _ in range(5):
+            await background.acquire(CLEARLY_DEFINED_URL)
+        started = clock.monotonic()
+        await asyncio.gather(*(shared.acquire(CLEARLY_DEFINED_URL) for _ in range(5)))
+        return clock.monotonic() - started
+
+    assert clock.run(scenario()) == 0
+
+
+def test_background_retry_after_blocks_live_requests(clock):
+    shared, background = shared_and_background_limiters(clock)
+
+    async def scenario():
+        background.block_for(CLEARLY_DEFINED_URL, 30)
+        started = clock.monotonic()
+        await shared.acquire(CLEARLY_DEFINED_URL)
+        return clock.monotonic() - started
+
+    assert clock.run(scenario()) == pytest.approx(30.2)
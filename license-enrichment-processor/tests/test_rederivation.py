@@ -0,0 +1,64 @@
+import datetime
+from packageurl import PackageURL
+from license_enrichment_processor.lib.date import DatetimeProvider
+from license_enrichment_processor.lib.rederivation import (
+    rederive_clearly_defined_license_details,
+)
+from license_enrichment_processor.lib.sbom import Component, ComponentLicenseDetails
+from license_enrichment_processor.lib.sqlite import (
+    SqliteDatabase,
+    SqliteDefinitionStore,
+)
+
+FETCHED_AT = datetime.datetime(2026, 10, 1, tzinfo=datetime.timezone.utc)
+REDERIVED_AT = datetime.datetime(2026, 10, 18, tzinfo=datetime.timezone.utc)
+
+
+def updated_at(database: SqliteDatabase, purl: str) -> datetime.datetime | None:
+    with database.connection_pool.reader() as connection:
+        row = connection.execute(
+            "SELECT updatedAt FROM component WHERE purl = ?", (purl,)
+        ).fetchone()
+    return None if row is None else datetime.datetime.fromisoformat(row[0])
+
+
+def test_rederivation_keeps_the_cached_age(connection_pool):
+    now = FETCHED_AT
+    datetime_provider = DatetimeProvider.FromFunc(lambda: now)
+    database = SqliteDatabase(connection_pool, datetime_provider)
+    definition_store = SqliteDefinitionStore(connection_pool, datetime_provider)
+    cached = PackageURL.from_string("pkg:npm/cached@1.0.0")
+    uncached = PackageURL.from_string("pkg:npm/uncached@1.0.0")
+    database.cache_components(
+        [
+            Component(
+                uuid="",
+                purl=cached,
+                license_details=ComponentLicenseDetails(
+                    license_expressions=[
+                        ("GPL-3.0", "ClearlyDefined Declared"),
+                        ("MIT", "Snyk"),
+                    ]
+                ),
+            )
+        ]
+    )
+    definition_store.store_definitions(
+        {
+            cached: {"licensed": {"declared": "Apache-2.0"}},
+            uncached: {"licensed": {"declared": "ISC"}},
+        }
+    )
+
+    now = REDERIVED_AT
+    rederived = rederive_clearly_defined_license_details(definition_store, database)
+
+    assert rederived == 2
+    details = database.get_components([cached, uncached])
+    assert details[cached].license_expressions == [
+        ("Apache-2.0", "ClearlyDefined Declared"),
+        ("MIT", "Snyk"),
+    ]
+    assert details[uncached].license_expressions == [("ISC", "ClearlyDefined Declared")]
+    assert updated_at(database, cached.to_string()) == FETCHED_AT
+    assert updated_at(database, uncached.to_string()) == REDERIVED_AT
@@ -0,0 +1,59 @@
+import datetime
+from license_enrichment_processor.lib.run_report import EnrichmentRunReport
+from license_enrichment_processor.lib.sqlite import SqliteRunReportStore
+
+STARTED_AT = datetime.datetime(
+    2026, 10, 18, 12, 0, tzinfo=datetime.timezone(datetime.timedelta(hours=7))
+)
+
+
+def run_report(i: int, project_uuid: str, error: str | None = None):
+    started_at = STARTED_AT + datetime.timedelta(minutes=i)
+    return EnrichmentRunReport(
+        id=f"run-{i}",
+        project_uuid=project_uuid,
+        project_name=f"name of {project_uuid}",
+        project_version="1.0.0",
+        started_at=started_at,
+        finished_at=started_at + datetime.timedelta(seconds=12.5),
+        succeeded=error is None,
+        stats={"components": i, "stage_seconds": {"fetch": 1.5}},
+        error=error,
+    )
+
+
+def test_run_report_round_trip(connection_pool):
+    store = SqliteRunReportStore(connection_pool)
+    succeeded = run_report(1, "project-a")
+    failed = run_report(2, "project-a", error="TimeoutError()")
+    store.save_run(succeeded)
+    store.save_run(failed)
+
+    assert store.get_run("run-1") == succeeded
+    assert store.get_run("run-2") == failed
+    assert store.get_run("run-3") is None
+    assert failed.to_dict() | {"stats": None} == {
+        "id": "run-2",
+        "project": {
+            "uuid": "project-a",
+            "name": "name of project-a",
+            "version": "1.0.0",
+        },
+        "startedAt": "2026-10-18T12:02:00+07:00",
+        "finishedAt": "2026-10-18T12:02:12.500000+07:00",
+        "durationSeconds": 12.5,
+        "status": "failed",
+        "stats": None,
+        "error": "TimeoutError()",
+    }
+
+
+def test_list_runs_most_recent_first(connection_pool):
+    store = SqliteRunReportStore(connection_pool)
+    for i, project_uuid in enumerate(["project-a", "project-b", "project-a"]):
+        store.save_run(run_report(i, project_uuid))
+
+    assert [run.id for run in store.list_runs()] == ["run-2", "run-1", "run-0"]
+    assert [run.id for run in store.list_runs(limit=1)] == ["run-2"]
+    assert [run.id for run in store.list_runs("project-a")] == ["run-2", "run-0"]
+    assert store.list_runs("project-c") == []
@@ -0,0 +1,60 @@
+import copy
+import pickle
+import pytest
+from packageurl import PackageURL
+from license_enrichment_processor.lib.sbom import (
+    CanonicalPackageURL,
+    ComponentLicenseDetails,
+)
+
+PURL = "pkg:npm/%40babel/core@7.0.0?arch=x64#lib"
+
+
+def test_canonical_purl_behaves_like_package_url():
+    purl = CanonicalPackageURL.from_string(PURL)
+    plain = PackageURL.from_string(PURL)
+
+    assert purl.to_string() == plain.to_string() == PURL
+    assert purl.to_string(encode=False) == plain.to_string(encode=False)
+    assert purl == plain and plain == purl
+    assert not purl != plain
+    assert hash(purl) == hash(plain)
+    assert {plain: 1}[purl] == 1
+    assert tuple(purl) == tuple(plain)
+    assert len(purl) == 6
+    assert purl.to_dict() == plain.to_dict()
+    assert repr(purl) == repr(plain).replace("PackageURL", "CanonicalPackageURL", 1)
+    assert purl != CanonicalPackageURL.from_string("pkg:npm/%40babel/core@7.0.1")
+
+
+@pytest.mark.parametrize(
+    "rebuild",
+    [
+        lambda purl: purl._replace(version="7.1.0"),
+        lambda purl: CanonicalPackageURL._make([*purl[:3], "7.1.0", *purl[4:6]]),
+        lambda purl: copy.copy(purl)._replace(version="7.1.0"),
+        lambda purl: pickle.loads(pickle.dumps(purl))._replace(version="7.1.0"),
+    ],
+)
+def test_rebuilt_canonical_purl_keeps_its_string(rebuild):
+    purl = rebuild(CanonicalPackageURL.from_string(PURL))
+
+    assert isinstance(purl, CanonicalPackageURL)
+    assert purl.to_string() == PURL.replace("7.0.0", "7.1.0")
+    assert hash(purl) == hash(PackageURL.from_string(purl.to_string()))
+
+
+def test_license_details_compare_and_merge_without_order():
+    left = ComponentLicenseDetails(
+        license_expressions=[("MIT", "Snyk"), ("ab", "c")],
+        attributions=[("Jane Doe", "ClearlyDefined Discovered")],
+    )
+    right = ComponentLicenseDetails(license_expressions=[("a", "bc"), ("MIT", "Snyk")])
+
+    assert left.merge(right).license_expressions == [
+        ("MIT", "Snyk"),
+        ("ab", "c"),
+        ("a", "bc"),
+    ]
+    assert left.merge(right) == right.merge(left)
+    assert left != right
@@ -0,0 +1,69 @@
+from packageurl import PackageURL
+from license_enrichment_processor.lib.date import DatetimeProvider
+from license_enrichment_processor.lib.sbom import Component, ComponentLicenseDetails
+from license_enrichment_processor.lib.sqlite import SqliteDatabase
+
+
+def cached_component(i: int) -> Component:
+    return Component(
+        uuid=str(i),
+        purl=PackageURL.from_string(f"pkg:npm/package-{i}@1.0.{i}"),
+        license_details=ComponentLicenseDetails(
+            license_expressions=[("MIT", "clearlydefined")]
+            + ([("Apache-2.0", "snyk")] if i % 2 else []),
+            attributions=[(f"Copyright {i}", "clearlydefined")] if i % 3 else [],
+            source_urls=[(f"https://example.com/{i}", "clearlydefined")],
+        ),
+    )
+
+
+def get_component_by_purl(database: SqliteDatabase, purl: PackageURL):
+    with database.connection_pool.reader() as connection:
+        purl_string = purl.to_string()
+        if (
+            connection.execute(
+                "SELECT 1 FROM component WHERE purl = ?", (purl_string,)
+            ).fetchone()
+            is None
+        ):
+            return None
+        return ComponentLicenseDetails(
+            license_expressions=connection.execute(
+                "SELECT expression, source FROM component_license_expression WHERE componentPurl = ?",
+                (purl_string,),
+            ).fetchall(),
+            attributions=connection.execute(
+                "SELECT attribution, source FROM component_attribution WHERE componentPurl = ?",
+                (purl_string,),
+            ).fetchall(),
+            source_urls=connection.execute(
+                "SELECT sourceCodeUrl, source FROM component_source_code_url WHERE componentPurl = ?",
+                (purl_string,),
+            ).fetchall(),
+        )
+
+
+def test_get_components_matches_per_purl_lookups_across_chunks(connection_pool):
+    database = SqliteDatabase(connection_pool, DatetimeProvider.FromOffsetHours(7))
+    database.cache_components([cached_component(i) for i in range(1200) if i % 4])
+    # Spans three chunks, with misses and a repeated PURL in the mix
+    purls = [
+        PackageURL.from_string(f"pkg:npm/package-{i}@1.0.{i}") for i in range(1300)
+    ]
+    purls.append(PackageURL.from_string("pkg:npm/package-1@1.0.1"))
+
+    results = database.get_components(purls)
+
+    expected = {
+        purl: details
+        for purl in purls
+        if (details := get_component_by_purl(database, purl)) is not None
+    }
+    assert len(expected) == 900
+    assert results == expected
+
+
+def test_get_components_without_purls(connection_pool):
+    database = SqliteDatabase(connection_pool, DatetimeProvider.FromOffsetHours(7))
+
+    assert database.get_components([]) == {}
@@ -0,0 +1,97 @@
+import asyncio
+import sys
+import pytest
+from contextlib import contextmanager
+from types import ModuleType, SimpleNamespace
+from license_enrichment_processor.lib.tracing import (
+    NoopTracer,
+    OpenTelemetryTracer,
+    traced,
+)
+
+
+class RecordingTracer:
+    def __init__(self) -> None:
+        self.spans: list[str] = []
+
+    @contextmanager
+    def span(self, name: str, attributes=None):
+        self.spans.append(name)
+        yield SimpleNamespace(set_attribute=lambda *_: None)
+
+
+class Store:
+    def __init__(self, tracer) -> None:
+        self.tracer = tracer
+
+    @traced("store.read")
+    def read(self, key: str) -> str:
+        return f"value of {key}"
+
+    @traced("store.fetch")
+    async def fetch(self, key: str) -> str:
+        await asyncio.sleep(0)
+        return f"fetched {key}"
+
+    @traced("store.fail")
+    def fail(self) -> None:
+        raise KeyError("missing")
+
+
+def test_traced_opens_a_span_around_sync_and_async_methods():
+    tracer = RecordingTracer()
+    store = Store(tracer)
+
+    assert store.read("a") == "value of a"
+    assert asyncio.run(store.fetch("b")) == "fetched b"
+    with pytest.raises(KeyError):
+        store.fail()
+
+    assert tracer.spans == ["store.read", "store.fetch", "store.fail"]
+    assert Store.fetch.__name__ == "fetch"
+    assert asyncio.iscoroutinefunction(Store.fetch)
+
+
+def test_noop_tracer_hands_out_one_shared_span():
+    tracer = NoopTracer()
+    store = Store(tracer)
+
+    with tracer.span("a") as first, tracer.span("b", {"key": 1}) as second:
+        first.set_attribute("key", "value")
+        first.record_exception(ValueError())
+    assert first is second
+    assert store.read("a") == "value of a"
+    assert asyncio.run(store.fetch("b")) == "fetched b"
+
+
+def test_opentelemetry_tracer_needs_the_api_package(monkeypatch):
+    # A None entry makes the import fail as if the package were not installed
+    monkeypatch.setitem(sys.modules, "opentelemetry", None)
+
+    with pytest.raises(ImportError, match="opentelemetry-api"):
+        OpenTelemetryTracer()
+
+
+def test_opentelemetry_tracer_starts_current_spans(monkeypatch):
+    started = []
+
+    @contextmanager
+    def start_as_current_span(name, attributes=None):
+        started.append((name, attributes))
+        yield SimpleNamespace(set_attribute=lambda *_: None)
+
+    trace = ModuleType("opentelemetry.trace")
+    trace.get_tracer = lambda name: SimpleNamespace(
+        start_as_current_span=start_as_current_span
+    )
+    opentelemetry = ModuleType("opentelemetry")
+    opentelemetry.trace = trace
+    monkeypatch.setitem(sys.modules, "opentelemetry", opentelemetry)
+    monkeypatch.setitem(sys.modules, "opentelemetry.trace", trace)
+
+    store = Store(OpenTelemetryTracer())
+    store.read("a")
+    with store.tracer.span("enrichment.run", {"project.uuid": "p"}):
+        pass
+
+    assert started == [("store.read", None), ("enrichment.run", {"project.uuid": "p"})]